@@ -1,18 +1,29 @@
 import sys
 import os
+import argparse
 import logging
+import mimetypes
 import socket
 import struct
-import json as json_lib
-import urllib.request
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for
+from flask import Flask, render_template, request, jsonify, session, redirect, url_for, send_file, g, has_request_context
+from flask_socketio import SocketIO, join_room
+from werkzeug.security import safe_join
 import pyvjoy
 import time
 import threading
 import math
 from SimConnect import SimConnect, AircraftRequests
-from profiles import get_profile
-from backend.fsuipc_wapi_reader import write_lvar_value, step_lvar_value
+from profiles import PROFILES
+from backend.fsuipc_wapi_reader import queue_lvar_write, queue_lvar_step, start_lvar_warmup, lvar_warmup_status, lvar_snapshot, lvar_state, lvar_writer, mobiflight_pump_stats
+from backend.udp_input import UdpControlListener, new_token
+from backend.device_output import DeviceWriter, ShadowDevice
+from backend.command_table import CommandContext, compile_profiles, execute, execute_batch
+from backend.sim_snapshot import SimSnapshot
+from backend.flight_data import FlightDataService, OfpPdfCache, UpstreamError
+from backend.asset_cache import AssetCache
+from backend.serving import SERVER_THREADS, ensure_certificate, make_production_server
+from backend.metrics import metrics, REQUEST_SECONDS, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from backend.latency_trace import LatencyTracer
 
 if getattr(sys, 'frozen', False):
     BASE_DIR = sys._MEIPASS
@@ -26,11 +37,28 @@ app = Flask(__name__,
 app.secret_key = 'ipad_joy_secret_key'
 app.config['SESSION_TYPE'] = 'filesystem'
 logging.getLogger('werkzeug').setLevel(logging.ERROR)
+socketio = SocketIO(app, async_mode='threading')
 device_1 = None
 device_2 = None
+device_writer = None
 aq = None
-current_wheel_brake = 0
+command_context = CommandContext()
+sim_snapshot = SimSnapshot()
+flight_data = FlightDataService()
+ofp_pdfs = OfpPdfCache(flight_data)
+assets = AssetCache()
+latency_tracer = LatencyTracer()
+socket_profiles = {}
+udp_clients = {}
+udp_listener = None
+lvar_push_thread = None
+lvar_push_lock = threading.Lock()
 PIN = '1234'
+# /metrics needs a PIN session or an "Authorization: Bearer <PIN>" header
+# unless the server was started with --public-metrics.
+METRICS_PUBLIC = False
+DEVICE_FLUSH_HZ = 200
+LVAR_PUSH_INTERVAL = 0.05
 PROFILE_JSON_DATA = {
     'fenix_a320': {
         'name': 'Fenix A320',
@@ -222,6 +250,20 @@ PROFILE_JSON_DATA = {
     }
 }
 
+COMMAND_TABLES = compile_profiles(PROFILES, command_context, PROFILE_JSON_DATA)
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.get('request_started')
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        REQUEST_SECONDS.labels(route, request.method, str(response.status_code)).observe(time.perf_counter() - started)
+    return response
+
 @app.before_request
 def require_pin():
     allowed = {'index', 'verify_pin', 'set_session'}
@@ -231,16 +273,24 @@ def require_pin():
         return
     if session.get('authed') is True:
         return
+    if request.endpoint == 'get_metrics':
+        if METRICS_PUBLIC or request.headers.get('Authorization', '') == 'Bearer ' + PIN:
+            return
+        return jsonify({'error': 'unauthorized'}), 401
     return redirect(url_for('index'))
 
 def init_systems():
-    global device_1, device_2, aq
+    global device_1, device_2, device_writer, aq
     try:
         device_1 = pyvjoy.VJoyDevice(1)
         device_2 = pyvjoy.VJoyDevice(2)
+        device_writer = DeviceWriter({1: ShadowDevice(device_1), 2: ShadowDevice(device_2)}, rate_hz=DEVICE_FLUSH_HZ).start()
         sm = SimConnect()
         sm.connect()
         aq = AircraftRequests(sm)
+        sim_snapshot.aq = aq
+        sim_snapshot.start()
+        command_context.aq = sim_snapshot
     except Exception as e:
         pass
 
@@ -249,87 +299,94 @@ def should_init_systems(debug_enabled):
         return True
     return os.environ.get("WERKZEUG_RUN_MAIN") == "true"
 
+def render_page(page, status=200, **context):
+    context.setdefault('debug_ui', app.debug)
+    key = ('page', page, context.get('profile_name'), context['debug_ui'])
+    source = os.path.join(app.template_folder, f"{page}.html")
+    asset = assets.get(key, lambda: render_template(f"{page}.html", **context), 'text/html', (source,))
+    return assets.respond(asset, request, status)
+
+def serve_static(filename):
+    path = safe_join(app.static_folder, filename)
+    if path is None or not os.path.isfile(path):
+        return '', 404
+    mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    asset = assets.get(('static', filename), lambda: _read_bytes(path), mimetype, (path,))
+    return assets.respond(asset, request)
+
+app.view_functions['static'] = serve_static
+
+def _read_bytes(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+def warm_assets():
+    with app.test_request_context():
+        for root, dirs, files in os.walk(app.static_folder):
+            for name in files:
+                serve_static(os.path.relpath(os.path.join(root, name), app.static_folder).replace(os.sep, '/'))
+        render_page('index')
+        for profile_name in PROFILE_JSON_DATA:
+            serve_profile(profile_name)
+            serve_profile_json(profile_name)
+            render_page(profile_name, profile_name=profile_name)
+
 @app.route('/')
 def index():
-    return render_template('index.html', debug_ui=app.debug)
+    return render_page('index')
 
 @app.route('/ofp', methods=['GET'])
 def get_ofp_pdf():
-    api_url = 'https://www.simbrief.com/api/xml.fetcher.php?userid=193599&json=1'
     try:
-        with urllib.request.urlopen(api_url, timeout=10) as response:
-            payload = response.read().decode('utf-8')
-        data = json_lib.loads(payload)
-        files = data.get('files') or {}
-        directory = files.get('directory') or ''
-        pdf = files.get('pdf') or {}
-        link = pdf.get('link') or ''
-        if not directory or not link:
+        data = flight_data.ofp(refresh=request.args.get('refresh') == '1')
+        data['local_pdf_url'] = url_for('get_ofp_pdf_file', v=data['plan_id'])
+        return jsonify(data)
+    except UpstreamError as e:
+        if str(e) == 'missing_ofp_link':
             return jsonify({"error": "missing_ofp_link"}), 502
-        pdf_url = directory.rstrip('/') + '/' + link.lstrip('/')
-        
-        origin = data.get('origin', {})
-        destination = data.get('destination', {})
-        origin_icao = origin.get('icao_code', '')
-        dest_icao = destination.get('icao_code', '')
-        
-        metars = {}
-        if origin_icao:
-            try:
-                metar_url = f'https://aviationweather.gov/api/data/metar?ids={origin_icao}&format=json'
-                with urllib.request.urlopen(metar_url, timeout=5) as metar_resp:
-                    metar_data = json_lib.loads(metar_resp.read().decode('utf-8'))
-                    if metar_data and len(metar_data) > 0:
-                        metars['origin'] = metar_data[0].get('rawOb', '')
-            except Exception:
-                metars['origin'] = ''
-        
-        if dest_icao:
-            try:
-                metar_url = f'https://aviationweather.gov/api/data/metar?ids={dest_icao}&format=json'
-                with urllib.request.urlopen(metar_url, timeout=5) as metar_resp:
-                    metar_data = json_lib.loads(metar_resp.read().decode('utf-8'))
-                    if metar_data and len(metar_data) > 0:
-                        metars['destination'] = metar_data[0].get('rawOb', '')
-            except Exception:
-                metars['destination'] = ''
-        
-        return jsonify({
-            "pdf_url": pdf_url,
-            "metars": metars,
-            "origin_icao": origin_icao,
-            "destination_icao": dest_icao
-        })
+        return jsonify({"error": "ofp_fetch_failed"}), 502
+    except Exception:
+        return jsonify({"error": "ofp_fetch_failed"}), 502
+
+@app.route('/ofp/pdf', methods=['GET'])
+def get_ofp_pdf_file():
+    try:
+        path, plan_id = ofp_pdfs.current()
     except Exception:
         return jsonify({"error": "ofp_fetch_failed"}), 502
+    return send_file(path, mimetype='application/pdf', conditional=True, etag=plan_id)
+
+@app.route('/ofp/pdf/stats', methods=['GET'])
+def get_ofp_pdf_stats():
+    return jsonify(dict(ofp_pdfs.stats, plan_id=ofp_pdfs.plan_id, **flight_data.snapshot()))
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    return metrics.render(), 200, {'Content-Type': METRICS_CONTENT_TYPE}
+
+def _stats_gauges():
+    sources = [('lvar_writer', lvar_writer.snapshot()), ('flight_data', flight_data.snapshot()), ('assets', assets.snapshot())]
+    if device_writer is not None:
+        sources.append(('device_writer', device_writer.snapshot()))
+    for prefix, stats in sources:
+        for name, value in stats.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                yield f'vc_{prefix}_{name}', f'{prefix} {name} counter.', value
+
+metrics.add_collector(_stats_gauges)
 
 @app.route('/metar', methods=['GET'])
 def get_metar():
     origin_icao = request.args.get('origin', '')
     dest_icao = request.args.get('destination', '')
-    metars = {}
-    
-    if origin_icao:
-        try:
-            metar_url = f'https://aviationweather.gov/api/data/metar?ids={origin_icao}&format=json'
-            with urllib.request.urlopen(metar_url, timeout=5) as metar_resp:
-                metar_data = json_lib.loads(metar_resp.read().decode('utf-8'))
-                if metar_data and len(metar_data) > 0:
-                    metars['origin'] = metar_data[0].get('rawOb', '')
-        except Exception:
-            metars['origin'] = ''
-    
-    if dest_icao:
-        try:
-            metar_url = f'https://aviationweather.gov/api/data/metar?ids={dest_icao}&format=json'
-            with urllib.request.urlopen(metar_url, timeout=5) as metar_resp:
-                metar_data = json_lib.loads(metar_resp.read().decode('utf-8'))
-                if metar_data and len(metar_data) > 0:
-                    metars['destination'] = metar_data[0].get('rawOb', '')
-        except Exception:
-            metars['destination'] = ''
-    
-    return jsonify({"metars": metars})
+    refresh = request.args.get('refresh') == '1'
+    return jsonify({"metars": flight_data.airport_metars(origin_icao, dest_icao, refresh=refresh)})
+
+@app.route('/lvars', methods=['GET'])
+def get_lvars():
+    profile_name = request.args.get('profile') or session.get('active_profile', 'pmdg_777')
+    start_lvar_warmup(profile_name)
+    return jsonify(lvar_snapshot(profile_name))
 
 @app.route('/lvars', methods=['POST'])
 def set_lvar():
@@ -344,10 +401,10 @@ def set_lvar():
         val = float(value)
     except Exception:
         return jsonify({"error": "invalid_value"}), 400
-    result = write_lvar_value(profile_name, key, val)
+    result = queue_lvar_write(profile_name, key, val)
     if "error" in result:
         return jsonify(result), 503
-    return jsonify(result)
+    return jsonify(result), 202
 
 @app.route('/lvars/step', methods=['POST'])
 def step_lvar():
@@ -362,19 +419,54 @@ def step_lvar():
         delta_val = float(delta)
     except Exception:
         return jsonify({"error": "invalid_delta"}), 400
-    result = step_lvar_value(profile_name, key, delta_val)
+    result = queue_lvar_step(profile_name, key, delta_val)
+    if "error" in result:
+        return jsonify(result), 503
+    return jsonify(result), 202
+
+@app.route('/lvars/writer', methods=['GET'])
+def lvar_writer_stats():
+    return jsonify(lvar_writer.snapshot())
+
+@app.route('/lvars/pump', methods=['GET'])
+def lvar_pump_stats():
+    result = mobiflight_pump_stats()
     if "error" in result:
         return jsonify(result), 503
     return jsonify(result)
 
+@app.route('/lvars/warmup', methods=['GET'])
+def lvar_warmup():
+    profile_name = request.args.get('profile') or session.get('active_profile', 'pmdg_777')
+    result = lvar_warmup_status(profile_name)
+    if "error" in result:
+        return jsonify(result), 404
+    return jsonify(result)
+
 @app.route('/verify_pin', methods=['POST'])
 def verify_pin():
     data = request.json or {}
     if str(data.get('pin', '')) == PIN:
         session['authed'] = True
-        return jsonify({'ok': True})
+        token = udp_token()
+        udp_clients[token] = session.get('active_profile', 'pmdg_777')
+        return jsonify({'ok': True, 'udp_token': token.hex()})
     return jsonify({'ok': False}), 401
 
+def udp_token():
+    # UDP frames carry this token instead of relying on the source address,
+    # which anyone else on the network can send from.
+    token = session.get('udp_token')
+    if token is None:
+        token = new_token().hex()
+        session['udp_token'] = token
+    return bytes.fromhex(token)
+
+def select_profile(profile_name):
+    udp_clients[udp_token()] = profile_name
+    start_lvar_warmup(profile_name)
+    sim_snapshot.activate(profile_name, PROFILES.get(profile_name, {}).get('backend', {}).get('sim_vars', []))
+
 @app.route('/session', methods=['POST'])
 def set_session():
     data = request.json or {}
@@ -386,16 +478,17 @@ def set_session():
         return jsonify({"error": "missing_profile"}), 400
     session['authed'] = True
     session['active_profile'] = profile_name
-    return jsonify({'ok': True, 'profile': profile_name})
+    select_profile(profile_name)
+    return jsonify({'ok': True, 'profile': profile_name, 'udp_token': session['udp_token']})
 
 @app.route('/profiles/<profile_name>')
 def serve_profile(profile_name):
     if not profile_name.endswith('.js'):
         profile_name = f'{profile_name}.js'
-    profile_path = os.path.join(BASE_DIR, 'profiles', profile_name)
-    if os.path.exists(profile_path):
-        with open(profile_path, 'r') as f:
-            return f.read(), 200, {'Content-Type': 'application/javascript'}
+    profile_path = safe_join(os.path.join(BASE_DIR, 'profiles'), profile_name)
+    if profile_path and os.path.exists(profile_path):
+        asset = assets.get(('profile', profile_name), lambda: _read_bytes(profile_path), 'application/javascript', (profile_path,))
+        return assets.respond(asset, request)
     return '', 404
 
 @app.route('/profiles/<profile_name>.json')
@@ -406,7 +499,8 @@ def serve_profile_json(profile_name):
     data = PROFILE_JSON_DATA.get(name)
     if not data:
         return '', 404
-    return jsonify(data)
+    asset = assets.get(('profile_json', name), lambda: app.json.dumps(data), 'application/json')
+    return assets.respond(asset, request)
 
 @app.route('/<page>.html')
 def serve_page(page):
@@ -414,8 +508,9 @@ def serve_page(page):
     if page in allowed:
         profile_name = page if page != 'index' else 'pmdg_777'
         session['active_profile'] = profile_name
-        return render_template(f"{page}.html", profile_name=profile_name, debug_ui=app.debug)
-    return render_template('index.html'), 404
+        select_profile(profile_name)
+        return render_page(page, profile_name=profile_name)
+    return render_page('index', 404)
 
 @app.route('/debug/orientation', methods=['POST'])
 def debug_orientation():
@@ -431,108 +526,201 @@ def debug_orientation():
         print(f"ORIENTATION DEBUG [{status}]: {message}")
     return jsonify({"status": "logged"})
 
+def get_command_table(profile_name):
+    return COMMAND_TABLES.get(profile_name) or COMMAND_TABLES['pmdg_777']
+
+def apply_command(data, profile_name):
+    return run_command(data, get_command_table(profile_name))
+
+def _trace_client(data):
+    # Sequence numbers are per page, so key them on the page id the client
+    # stamps rather than the address several tabs or devices can share.
+    page = data.get('page')
+    if isinstance(page, str) and page:
+        return page
+    if not has_request_context():
+        return None
+    return getattr(request, 'sid', None)
+
+def _begin_trace(data, table):
+    if not isinstance(data, dict) or data.get('ts') is None or data.get('type') not in table:
+        return None
+    return latency_tracer.begin(data, _trace_client(data))
+
+def apply_commands(commands, profile_name):
+    if device_writer is None:
+        return [({"error": "No vJoy"}, 500) for _ in commands]
+    table = get_command_table(profile_name)
+    traces = [trace for trace in (_begin_trace(data, table) for data in commands) if trace is not None]
+    results = execute_batch(table, commands, device_writer.device(1), device_writer.device(2))
+    for trace in traces:
+        latency_tracer.dispatched(trace, device_writer)
+    return results
+
+def run_command(data, table):
+    if device_writer is None:
+        return {"error": "No vJoy"}, 500
+    trace = _begin_trace(data, table)
+    result = execute(table, data, device_writer.device(1), device_writer.device(2))
+    if trace is not None:
+        latency_tracer.dispatched(trace, device_writer)
+    return result
+
 @app.route('/update_sim', methods=['POST'])
 def update_sim():
-    global device_1, device_2, current_wheel_brake
-    if device_1 is None:
-        return jsonify({"error": "No vJoy"}), 500
     data = request.json or {}
-    t = data.get('type')
-    val = float(data.get('value', 0))
-    rev = data.get('reverse', False)
-    profile_override = data.get('profile')
-    profile_name = profile_override or session.get('active_profile', 'pmdg_777')
-    profile = get_profile(profile_name)
+    profile_name = data.get('profile') or session.get('active_profile', 'pmdg_777')
+    result = apply_command(data, profile_name)
+    if isinstance(result[0], dict):
+        return (jsonify(result[0]),) + tuple(result[1:])
+    return result
+
+@app.route('/update_sim/batch', methods=['POST'])
+def update_sim_batch():
+    data = request.json or {}
+    if isinstance(data, list):
+        data = {'commands': data}
+    commands = data.get('commands')
+    if not isinstance(commands, list):
+        return jsonify({"error": "missing_commands"}), 400
+    profile_name = data.get('profile') or session.get('active_profile', 'pmdg_777')
+    results = apply_commands(commands, profile_name)
+    errors = []
+    for index, result in enumerate(results):
+        body = result[0] if isinstance(result[0], dict) else {}
+        status = result[1] if len(result) > 1 else 200
+        if status >= 400 or 'error' in body:
+            errors.append({'index': index, 'error': body.get('error', status)})
+    if data.get('report'):
+        return jsonify({'results': [r[0] if isinstance(r[0], dict) else {} for r in results], 'errors': errors})
+    if errors:
+        return jsonify({'errors': errors}), 207
+    return '', 204
+
+@socketio.on('connect')
+def control_connect(auth=None):
+    if not isinstance(auth, dict):
+        auth = {}
+    if session.get('authed') is not True and str(auth.get('pin', '')) != PIN:
+        return False
+    profile_name = auth.get('profile') or session.get('active_profile', 'pmdg_777')
+    socket_profiles[request.sid] = profile_name
+    join_room(profile_name)
+    start_lvar_push()
+
+@socketio.on('disconnect')
+def control_disconnect(*args):
+    socket_profiles.pop(request.sid, None)
+    latency_tracer.forget(request.sid)
+
+@socketio.on('control')
+def control_message(data):
+    profile_name = socket_profiles.get(request.sid)
+    if profile_name is None or not isinstance(data, dict):
+        return
+    result = apply_command(data, data.get('profile') or profile_name)
+    if isinstance(result[0], dict) and 'error' in result[0]:
+        logging.debug("control %s failed: %s", data.get('type'), result[0]['error'])
+
+@socketio.on('control_batch')
+def control_batch_message(commands):
+    profile_name = socket_profiles.get(request.sid)
+    if profile_name is None or not isinstance(commands, list):
+        return
+    for data, result in zip(commands, apply_commands(commands, profile_name)):
+        if isinstance(result[0], dict) and 'error' in result[0]:
+            logging.debug("control %s failed: %s", data.get('type') if isinstance(data, dict) else None, result[0]['error'])
+
+@app.route('/sim/snapshot', methods=['GET'])
+def sim_snapshot_values():
+    profile_name = request.args.get('profile') or session.get('active_profile', 'pmdg_777')
+    names = sim_snapshot.profile_vars(profile_name)
+    return jsonify({'profile': profile_name, 'values': sim_snapshot.snapshot(names), 'stats': sim_snapshot.stats})
+
+@app.route('/clock', methods=['GET'])
+def clock():
+    return jsonify({'server_ms': time.time() * 1000.0})
+
+@app.route('/latency', methods=['GET'])
+def latency_stats():
+    return jsonify(latency_tracer.snapshot())
+
+@app.route('/device/stats', methods=['GET'])
+def device_stats():
+    if device_writer is None:
+        return jsonify({"error": "No vJoy"}), 500
+    return jsonify(device_writer.snapshot())
 
-    try:
-        handler = profile.get('handlers', {}).get(t)
-        if handler:
-            result = handler(data, device_1, device_2, current_wheel_brake, aq)
-            if isinstance(result, tuple):
-                return result
-            if isinstance(result, dict):
-                return jsonify(result)
-            return jsonify({"status": "success"})
-
-        if t == 'throttle':
-            device_1.set_button(2, 1 if rev else 0)
-            device_1.set_axis(pyvjoy.HID_USAGE_Z, int(val * 32767))
-
-        elif t == 'rudder':
-            device_1.set_axis(pyvjoy.HID_USAGE_RX, int(val * 32767))
-
-        elif t == 'brakes':
-            current_wheel_brake = val
-            device_1.set_axis(pyvjoy.HID_USAGE_X, int(val * 32767))
-
-        elif t == 'spoilers':
-            f = profile['backend']['spoiler_formula'](val)
-            device_1.set_axis(pyvjoy.HID_USAGE_Y, int(f * 32767))
-
-        elif t == 'arm_spoilers':
-            device_1.set_axis(pyvjoy.HID_USAGE_Y, int(profile['backend']['arm_spoiler_value'] * 32767))
-
-        elif t == 'flaps_axis':
-            mapped_val = profile['backend']['flap_axis_mapping'](val)
-            device_1.set_axis(pyvjoy.HID_USAGE_SL0, int(mapped_val))
-
-        elif t == 'flap_command':
-            btn = 20 if val == 0 else 21
-            device_1.set_button(btn, 1)
-            time.sleep(0.1)
-            device_1.set_button(btn, 0)
-
-        elif t == 'camera':
-            btn = 9 + int(data.get('cam_id'))
-            device_1.set_button(btn, 1)
-            time.sleep(0.05)
-            device_1.set_button(btn, 0)
-
-        elif t == 'flight_controls':
-            val_x = float(data.get('val_x', 0.5))
-            val_y = float(data.get('val_y', 0.5))
-            device_1.set_axis(pyvjoy.HID_USAGE_RZ, int(val_x * 32767))
-            device_1.set_axis(pyvjoy.HID_USAGE_RY, int(val_y * 32767))
-
-        elif t == 'gear_command':
-            btn = 4
-            device_1.set_button(btn, 1)
-            time.sleep(0.1)
-            device_1.set_button(btn, 0)
-
-        elif t == 'idle_command':
-            device_1.set_axis(pyvjoy.HID_USAGE_Z, 0)
-            device_1.set_button(3, 1)
-            time.sleep(0.1)
-            device_1.set_button(3, 0)
-
-        elif t == 'vjoy_button':
-            btn = int(data.get('button', 0))
-            if btn > 0:
-                device_1.set_button(btn, 1)
-                time.sleep(0.05)
-                device_1.set_button(btn, 0)
-
-        return jsonify({"status": "success"})
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+def _lvar_push_loop():
+    while True:
+        socketio.sleep(LVAR_PUSH_INTERVAL)
+        try:
+            diffs = lvar_state.drain(set(socket_profiles.values()))
+            for profile_name, diff in diffs.items():
+                socketio.emit('lvars', diff, to=profile_name)
+        except Exception as e:
+            logging.debug("lvar push failed: %s", e)
+
+def start_lvar_push():
+    global lvar_push_thread
+    with lvar_push_lock:
+        if lvar_push_thread is None:
+            lvar_push_thread = socketio.start_background_task(_lvar_push_loop)
+
+def start_udp_listener(port):
+    global udp_listener
+    udp_listener = UdpControlListener(apply_command, udp_clients.get, port=port).start()
+    return udp_listener
 
 def _debug_sim_print_loop():
     pass
 
-if __name__ == '__main__':
-    debug_enabled = len(sys.argv) > 1 and sys.argv[1] == "1"
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Virtual cockpit backend')
+    parser.add_argument('debug', nargs='?', default='0', help='1 enables debug mode and the reloader (dev server)')
+    parser.add_argument('https', nargs='?', default='0', help='1 serves HTTPS')
+    parser.add_argument('udp_port', nargs='?', type=int, default=0, help='UDP control port, 0 disables it')
+    parser.add_argument('--server', choices=['dev', 'production'], default='dev')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--threads', type=int, default=SERVER_THREADS, help='worker threads (production server)')
+    parser.add_argument('--cert', help='TLS certificate file, generated once under ~/.virtual_cockpit when omitted')
+    parser.add_argument('--key', help='TLS private key file')
+    parser.add_argument('--public-metrics', action='store_true', help='serve /metrics without a PIN (only on a trusted network)')
+    return parser.parse_args(argv)
 
-    if should_init_systems(debug_enabled):
+if __name__ == '__main__':
+    args = parse_args()
+    METRICS_PUBLIC = args.public_metrics
+    debug_enabled = args.debug == "1"
+    production = args.server == 'production'
+    use_reloader = debug_enabled and not production
+    init_enabled = should_init_systems(use_reloader)
+
+    if init_enabled:
         init_systems()
+        ofp_pdfs.start()
+    warm_assets()
 
-    use_reloader = debug_enabled
     if debug_enabled and (not use_reloader or os.environ.get("WERKZEUG_RUN_MAIN") == "true"):
         daemon = threading.Thread(target=_debug_sim_print_loop, daemon=True)
         daemon.start()
 
-    use_https = len(sys.argv) > 2 and sys.argv[2] == "1"
-    if use_https:
-        app.run(host='0.0.0.0', port=5000, debug=debug_enabled, use_reloader=debug_enabled, ssl_context='adhoc')
+    ssl_files = None
+    if args.https == "1":
+        ssl_files = (args.cert, args.key) if args.cert and args.key else ensure_certificate()
+    if args.udp_port and init_enabled:
+        start_udp_listener(args.udp_port)
+    if production:
+        app.debug = debug_enabled
+        try:
+            server = make_production_server(app, args.host, args.port, threads=args.threads, ssl_files=ssl_files)
+        except ImportError:
+            logging.error("--server production needs cheroot (pip install cheroot)")
+            sys.exit(1)
+        try:
+            server.start()
+        except KeyboardInterrupt:
+            server.stop()
     else:
-        app.run(host='0.0.0.0', port=5000, debug=debug_enabled, use_reloader=debug_enabled)
+        socketio.run(app, host=args.host, port=args.port, debug=debug_enabled, use_reloader=use_reloader, allow_unsafe_werkzeug=True, ssl_context=ssl_files)
@@ -0,0 +1,105 @@
+import gzip
+import hashlib
+import logging
+import os
+import threading
+
+from flask import Response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_MIN_BYTES = 512
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+
+
+class Asset:
+
+    def __init__(self, body, mimetype, mtimes):
+        self.body = body
+        self.mimetype = mimetype
+        self.mtimes = mtimes
+        digest = hashlib.sha1(body).hexdigest()[:20]
+        self.etags = {None: '"%s"' % digest}
+        self.bodies = {None: body}
+        if len(body) >= COMPRESS_MIN_BYTES and mimetype.startswith(COMPRESSIBLE_TYPES):
+            self.bodies["gzip"] = gzip.compress(body, compresslevel=9, mtime=0)
+            self.etags["gzip"] = '"%s-gz"' % digest
+            if brotli is not None:
+                self.bodies["br"] = brotli.compress(body)
+                self.etags["br"] = '"%s-br"' % digest
+
+    def encoding_for(self, accept_encodings):
+        for encoding in ("br", "gzip"):
+            if encoding in self.bodies and accept_encodings.quality(encoding) > 0:
+                return encoding
+        return None
+
+
+class AssetCache:
+
+    def __init__(self):
+        self.assets = {}
+        self.lock = threading.Lock()
+        self.stats = {
+            "hits": 0,
+            "builds": 0,
+            "not_modified": 0,
+            "bytes_saved": 0,
+        }
+
+    def _mtimes(self, sources):
+        mtimes = []
+        for path in sources:
+            try:
+                mtimes.append(os.stat(path).st_mtime_ns)
+            except OSError:
+                mtimes.append(None)
+        return tuple(mtimes)
+
+    def get(self, key, build, mimetype, sources=()):
+        mtimes = self._mtimes(sources)
+        asset = self.assets.get(key)
+        if asset is not None and asset.mtimes == mtimes:
+            self.stats["hits"] += 1
+            return asset
+        with self.lock:
+            asset = self.assets.get(key)
+            if asset is not None and asset.mtimes == mtimes:
+                return asset
+            body = build()
+            if isinstance(body, str):
+                body = body.encode("utf-8")
+            asset = Asset(body, mimetype, mtimes)
+            self.assets[key] = asset
+            self.stats["builds"] += 1
+            logging.debug("asset %s built: %d bytes (%s)", key, len(body),
+                ", ".join("%s %d" % (encoding, len(data)) for encoding, data in asset.bodies.items() if encoding))
+        return asset
+
+    def respond(self, asset, request, status=200):
+        encoding = asset.encoding_for(request.accept_encodings)
+        etag = asset.etags[encoding]
+        headers = {
+            "ETag": etag,
+            "Cache-Control": "no-cache",
+            "Vary": "Accept-Encoding",
+        }
+        if status == 200 and request.if_none_match.contains(etag.strip('"')):
+            self.stats["not_modified"] += 1
+            self.stats["bytes_saved"] += len(asset.bodies[encoding])
+            return Response(status=304, headers=headers)
+        body = asset.bodies[encoding]
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+            self.stats["bytes_saved"] += len(asset.body) - len(body)
+        return Response(body, status=status, mimetype=asset.mimetype, headers=headers)
+
+    def snapshot(self):
+        stats = dict(self.stats)
+        stats["entries"] = len(self.assets)
+        stats["bytes"] = sum(len(data) for asset in self.assets.values() for data in asset.bodies.values())
+        stats["brotli"] = brotli is not None
+        return stats
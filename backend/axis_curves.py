@@ -0,0 +1,63 @@
+import numpy as np
+
+HID_MAX = 32767
+INPUTS = np.arange(HID_MAX + 1, dtype=np.float64) / HID_MAX
+
+
+def _to_hid(values):
+    return np.clip(np.floor(values + 1e-6), 0, HID_MAX).astype(np.int32)
+
+
+def _response_curve(response, sensitivity):
+    delta = INPUTS - 0.5
+    if response != 1:
+        magnitude = np.power(np.abs(delta) * 2, response) / 2
+        return 0.5 + np.sign(delta) * magnitude
+    return 0.5 + delta * sensitivity
+
+
+def _lookup(table):
+    def lookup(value):
+        index = int(value * HID_MAX)
+        return table[0 if index < 0 else HID_MAX if index > HID_MAX else index]
+    return lookup
+
+
+class AxisCurves:
+
+    # Tables are sampled at HID steps, so they only serve curves whose input
+    # is quantized the same way (int(value * HID_MAX)). The profile's spoiler
+    # and flap formulas see the unquantized value and stay formulas.
+    def __init__(self, luts, formulas=None):
+        self.luts = luts
+        self.formulas = formulas or {}
+        self.tables = {name: lut.tolist() for name, lut in luts.items()}
+        self.mappers = {name: _lookup(table) for name, table in self.tables.items()}
+        self.mappers.update(self.formulas)
+
+    def map(self, name, value):
+        return self.mappers[name](value)
+
+    def map_many(self, name, values):
+        formula = self.formulas.get(name)
+        if formula is not None:
+            return [formula(float(value)) for value in values]
+        index = np.clip((np.asarray(values, dtype=np.float64) * HID_MAX).astype(np.int64), 0, HID_MAX)
+        return self.luts[name][index]
+
+
+def build_axis_curves(backend, ui=None):
+    ui = ui or {}
+    spoiler_formula = backend['spoiler_formula']
+    flap_axis_mapping = backend['flap_axis_mapping']
+    response = ui.get('control_response', 1)
+    sensitivity = ui.get('control_sensitivity', 1)
+    luts = {
+        'linear': _to_hid(INPUTS * HID_MAX),
+        'stick': _to_hid(_response_curve(response, sensitivity) * HID_MAX),
+    }
+    formulas = {
+        'spoilers': lambda value: int(spoiler_formula(value) * HID_MAX),
+        'flaps_axis': lambda value: int(flap_axis_mapping(value)),
+    }
+    return AxisCurves(luts, formulas)
@@ -0,0 +1,148 @@
+import collections
+import ctypes
+import logging
+import threading
+import time
+
+from SimConnect.Enum import SIMCONNECT_RECV_CLIENT_DATA
+
+
+class ClientDataPump:
+
+    def __init__(self, drain_hz=None):
+        self.drain_hz = drain_hz
+        self.routes = {}
+        self.fallback = []
+        self.queue = collections.deque()
+        self.thread = None
+        self.running = False
+        self.wake_event = threading.Event()
+        self.handler_stats = {}
+        self.rate_started = time.perf_counter()
+        self.rate_messages = 0
+        self.stats = {
+            "received": 0,
+            "dispatched": 0,
+            "unrouted": 0,
+            "batches": 0,
+            "batch_max": 0,
+            "lag_ms": 0.0,
+            "lag_max_ms": 0.0,
+            "messages_per_sec": 0.0,
+        }
+
+    def register(self, handler, define_ids=None):
+        if define_ids is None:
+            if handler not in self.fallback:
+                self.fallback.append(handler)
+            return
+        for define_id in define_ids:
+            self.routes[define_id] = handler
+
+    def unregister(self, handler):
+        self.routes = {define_id: h for define_id, h in self.routes.items() if h != handler}
+        if handler in self.fallback:
+            self.fallback.remove(handler)
+
+    def handlers(self):
+        return list(dict.fromkeys(list(self.routes.values()) + self.fallback))
+
+    def submit(self, data):
+        self.stats["received"] += 1
+        self.queue.append((time.perf_counter(), data))
+        self.wake_event.set()
+
+    def dispatch(self, client_data):
+        handler = self.routes.get(client_data.dwDefineID)
+        if handler is None:
+            if not self.fallback:
+                self.stats["unrouted"] += 1
+                return
+            for fallback in self.fallback:
+                self._call(fallback, client_data)
+        else:
+            self._call(handler, client_data)
+        self.stats["dispatched"] += 1
+
+    def _call(self, handler, client_data):
+        start = time.perf_counter()
+        try:
+            handler(client_data)
+        except Exception as e:
+            logging.warning("client data handler for DefinitionID %s failed: %s", client_data.dwDefineID, e)
+        elapsed = time.perf_counter() - start
+        stats = self.handler_stats.get(handler)
+        if stats is None:
+            stats = self.handler_stats[handler] = [0, 0.0, 0.0]
+        stats[0] += 1
+        stats[1] += elapsed
+        if elapsed > stats[2]:
+            stats[2] = elapsed
+
+    def drain(self):
+        queue = self.queue
+        count = 0
+        while queue:
+            received_at, data = queue.popleft()
+            frame = ctypes.create_string_buffer(data, max(len(data), ctypes.sizeof(SIMCONNECT_RECV_CLIENT_DATA)))
+            self.dispatch(SIMCONNECT_RECV_CLIENT_DATA.from_buffer(frame))
+            lag_ms = (time.perf_counter() - received_at) * 1000.0
+            self.stats["lag_ms"] = lag_ms
+            if lag_ms > self.stats["lag_max_ms"]:
+                self.stats["lag_max_ms"] = lag_ms
+            count += 1
+        if count:
+            self.stats["batches"] += 1
+            if count > self.stats["batch_max"]:
+                self.stats["batch_max"] = count
+        return count
+
+    def start(self):
+        if self.drain_hz is None or self.thread is not None:
+            return self
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="simconnect-pump", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        self.wake_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
+            self.thread = None
+        self.drain()
+
+    def snapshot(self):
+        stats = dict(self.stats)
+        stats["pending"] = len(self.queue)
+        stats["drain_hz"] = self.drain_hz
+        stats["handlers"] = {
+            getattr(handler, "__qualname__", repr(handler)): {
+                "calls": calls,
+                "total_ms": round(total * 1000.0, 3),
+                "avg_us": round(total / calls * 1e6, 2) if calls else 0.0,
+                "max_us": round(longest * 1e6, 2),
+            }
+            for handler, (calls, total, longest) in list(self.handler_stats.items())
+        }
+        return stats
+
+    def _run(self):
+        period = 1.0 / self.drain_hz
+        while self.running:
+            self.wake_event.wait(1.0)
+            self.wake_event.clear()
+            started = time.perf_counter()
+            try:
+                self.rate_messages += self.drain()
+            except Exception as e:
+                logging.debug("client data pump drain failed: %s", e)
+            now = time.perf_counter()
+            if now - self.rate_started >= 1.0:
+                self.stats["messages_per_sec"] = round(self.rate_messages / (now - self.rate_started), 1)
+                self.rate_started = now
+                self.rate_messages = 0
+            delay = period - (now - started)
+            if delay > 0:
+                time.sleep(delay)
@@ -0,0 +1,214 @@
+import time
+
+import pyvjoy
+
+from backend.axis_curves import build_axis_curves
+from backend.metrics import COMMAND_ERRORS, COMMAND_SECONDS
+
+AXIS_SCALE = 32767
+
+
+class CommandContext:
+
+    def __init__(self):
+        self.wheel_brake = 0
+        self.aq = None
+
+
+class CommandTable(dict):
+
+    def __init__(self, commands, curves, axes):
+        super().__init__(commands)
+        self.curves = curves
+        self.axes = axes
+
+
+def _hold(profile, btn):
+    holds = profile['backend'].get('button_hold_ms', {})
+    return holds.get(btn, holds.get('default', 50)) / 1000.0
+
+
+def _builtin_commands(profile, context, curves):
+    arm_spoiler_axis = int(profile['backend']['arm_spoiler_value'] * AXIS_SCALE)
+    holds = {btn: _hold(profile, btn) for btn in range(1, 129)}
+    default_hold = _hold(profile, 0)
+    mappers = curves.mappers
+    linear = mappers['linear']
+    stick = mappers['stick']
+
+    def axis_command(usage, name, raw_name=None, on_value=None):
+        mapper = mappers[name]
+        raw_mapper = mappers[raw_name] if raw_name else mapper
+
+        def call(data, vjoy_1, vjoy_2):
+            val = float(data.get('value', 0))
+            if on_value is not None:
+                on_value(val)
+            vjoy_1.set_axis(usage, (raw_mapper if data.get('raw') else mapper)(val))
+
+        def inputs(data):
+            return [(raw_name if raw_name and data.get('raw') else name, float(data.get('value', 0)))]
+
+        def write(data, vjoy_1, hids):
+            if on_value is not None:
+                on_value(float(data.get('value', 0)))
+            vjoy_1.set_axis(usage, hids[0])
+
+        return call, inputs, write
+
+    def set_wheel_brake(val):
+        context.wheel_brake = val
+
+    def throttle(data, vjoy_1, vjoy_2):
+        vjoy_1.set_button(2, 1 if data.get('reverse', False) else 0)
+        vjoy_1.set_axis(pyvjoy.HID_USAGE_Z, linear(float(data.get('value', 0))))
+
+    def throttle_inputs(data):
+        return [('linear', float(data.get('value', 0)))]
+
+    def throttle_write(data, vjoy_1, hids):
+        vjoy_1.set_button(2, 1 if data.get('reverse', False) else 0)
+        vjoy_1.set_axis(pyvjoy.HID_USAGE_Z, hids[0])
+
+    def flight_controls(data, vjoy_1, vjoy_2):
+        mapper = stick if data.get('raw') else linear
+        vjoy_1.set_axis(pyvjoy.HID_USAGE_RZ, mapper(float(data.get('val_x', 0.5))))
+        vjoy_1.set_axis(pyvjoy.HID_USAGE_RY, mapper(float(data.get('val_y', 0.5))))
+
+    def flight_controls_inputs(data):
+        name = 'stick' if data.get('raw') else 'linear'
+        return [(name, float(data.get('val_x', 0.5))), (name, float(data.get('val_y', 0.5)))]
+
+    def flight_controls_write(data, vjoy_1, hids):
+        vjoy_1.set_axis(pyvjoy.HID_USAGE_RZ, hids[0])
+        vjoy_1.set_axis(pyvjoy.HID_USAGE_RY, hids[1])
+
+    def arm_spoilers(data, vjoy_1, vjoy_2):
+        vjoy_1.set_axis(pyvjoy.HID_USAGE_Y, arm_spoiler_axis)
+
+    def flap_command(data, vjoy_1, vjoy_2):
+        btn = 20 if float(data.get('value', 0)) == 0 else 21
+        vjoy_1.pulse_button(btn, holds[btn])
+
+    def camera(data, vjoy_1, vjoy_2):
+        btn = 9 + int(data.get('cam_id'))
+        vjoy_1.pulse_button(btn, holds.get(btn, default_hold))
+
+    def gear_command(data, vjoy_1, vjoy_2):
+        vjoy_1.pulse_button(4, holds[4])
+
+    def idle_command(data, vjoy_1, vjoy_2):
+        vjoy_1.set_axis(pyvjoy.HID_USAGE_Z, 0)
+        vjoy_1.pulse_button(3, holds[3])
+
+    def vjoy_button(data, vjoy_1, vjoy_2):
+        btn = int(data.get('button', 0))
+        if btn > 0:
+            vjoy_1.pulse_button(btn, holds.get(btn, default_hold))
+
+    axes = {
+        'throttle': (throttle, throttle_inputs, throttle_write),
+        'rudder': axis_command(pyvjoy.HID_USAGE_RX, 'linear', 'stick'),
+        'brakes': axis_command(pyvjoy.HID_USAGE_X, 'linear', on_value=set_wheel_brake),
+        'spoilers': axis_command(pyvjoy.HID_USAGE_Y, 'spoilers'),
+        'flaps_axis': axis_command(pyvjoy.HID_USAGE_SL0, 'flaps_axis'),
+        'flight_controls': (flight_controls, flight_controls_inputs, flight_controls_write),
+    }
+    commands = {name: call for name, (call, inputs, write) in axes.items()}
+    commands.update({
+        'arm_spoilers': arm_spoilers,
+        'flap_command': flap_command,
+        'camera': camera,
+        'gear_command': gear_command,
+        'idle_command': idle_command,
+        'vjoy_button': vjoy_button,
+    })
+    return CommandTable(commands, curves, {name: (inputs, write) for name, (call, inputs, write) in axes.items()})
+
+
+def _wrap_handler(handler, context):
+    def command(data, vjoy_1, vjoy_2):
+        return handler(data, vjoy_1, vjoy_2, context.wheel_brake, context.aq)
+    return command
+
+
+def _result(result):
+    if isinstance(result, tuple):
+        return result
+    if isinstance(result, dict):
+        return result, 200
+    return {"status": "success"}, 200
+
+
+def execute(table, data, vjoy_1, vjoy_2):
+    t = data.get('type')
+    command = table.get(t)
+    if command is None:
+        t = 'unknown'
+    started = time.perf_counter()
+    try:
+        return _result(command(data, vjoy_1, vjoy_2) if command else None)
+    except Exception as e:
+        COMMAND_ERRORS.labels(t).inc()
+        return {"error": str(e)}, 500
+    finally:
+        COMMAND_SECONDS.labels(t).observe(time.perf_counter() - started)
+
+
+def execute_batch(table, commands, vjoy_1, vjoy_2):
+    results = [None] * len(commands)
+    pending = {}
+    samples = {}
+    for index, data in enumerate(commands):
+        if not isinstance(data, dict):
+            results[index] = ({"error": "invalid_command"}, 400)
+            continue
+        t = data.get('type')
+        axis = table.axes.get(t)
+        if axis is None:
+            continue
+        try:
+            inputs = axis[0](data)
+        except Exception as e:
+            results[index] = ({"error": str(e)}, 500)
+            continue
+        slots = []
+        for name, value in inputs:
+            group = samples.setdefault(name, [])
+            slots.append((name, len(group)))
+            group.append(value)
+        pending[index] = slots
+    mapped = {name: table.curves.map_many(name, values) for name, values in samples.items()}
+    for index, data in enumerate(commands):
+        if results[index] is not None:
+            continue
+        slots = pending.get(index)
+        if slots is None:
+            results[index] = execute(table, data, vjoy_1, vjoy_2)
+            continue
+        started = time.perf_counter()
+        try:
+            table.axes[data['type']][1](data, vjoy_1, [int(mapped[name][i]) for name, i in slots])
+            results[index] = _result(None)
+        except Exception as e:
+            COMMAND_ERRORS.labels(data['type']).inc()
+            results[index] = ({"error": str(e)}, 500)
+        COMMAND_SECONDS.labels(data['type']).observe(time.perf_counter() - started)
+    return results
+
+
+def compile_profile(profile, context, ui=None):
+    curves = build_axis_curves(profile['backend'], ui)
+    table = _builtin_commands(profile, context, curves)
+    for name, handler in profile.get('handlers', {}).items():
+        table[name] = _wrap_handler(handler, context)
+        table.axes.pop(name, None)
+    return table
+
+
+def compile_profiles(profiles, context, ui_data=None):
+    ui_data = ui_data or {}
+    return {
+        name: compile_profile(profile, context, ui_data.get(name, {}).get('ui'))
+        for name, profile in profiles.items()
+    }
@@ -0,0 +1,308 @@
+import heapq
+import logging
+import threading
+import time
+
+from backend.metrics import VJOY_SECONDS
+
+AXIS = 0
+BUTTON = 1
+
+AXIS_FIELDS = {
+    0x30: "wAxisX",
+    0x31: "wAxisY",
+    0x32: "wAxisZ",
+    0x33: "wAxisXRot",
+    0x34: "wAxisYRot",
+    0x35: "wAxisZRot",
+    0x36: "wSlider",
+    0x37: "wDial",
+    0x38: "wWheel",
+}
+BUTTON_FIELDS = ("lButtons", "lButtonsEx1", "lButtonsEx2", "lButtonsEx3")
+VJOY_UPDATE_SECONDS = VJOY_SECONDS.labels("update")
+VJOY_SET_AXIS_SECONDS = VJOY_SECONDS.labels("set_axis")
+VJOY_SET_BUTTON_SECONDS = VJOY_SECONDS.labels("set_button")
+
+# Neutral report for the controls the UI drives: centred stick/rudder, flaps
+# up (the SL0 mapping is inverted), everything else at zero.
+DEFAULT_AXES = {
+    0x33: 16383,
+    0x34: 16383,
+    0x35: 16383,
+    0x36: 32767,
+}
+
+
+def _signed32(value):
+    return value - (1 << 32) if value & 0x80000000 else value
+
+
+class ShadowDevice:
+
+    def __init__(self, device, initial_axes=None):
+        self.device = device
+        self.axes = dict(DEFAULT_AXES if initial_axes is None else initial_axes)
+        self.buttons = [0] * len(BUTTON_FIELDS)
+        self.dirty_axes = set(self.axes)
+        self.dirty_buttons = set()
+        self.dirty_report = True
+        self.bulk = hasattr(device, "data") and hasattr(device, "update")
+        self.stats = {
+            "suppressed": 0,
+            "changed": 0,
+            "driver_calls": 0,
+        }
+
+    def set_axis(self, AxisID, AxisValue):
+        value = int(AxisValue)
+        if self.axes.get(AxisID) == value:
+            self.stats["suppressed"] += 1
+            return False
+        self.axes[AxisID] = value
+        self.dirty_axes.add(AxisID)
+        self.stats["changed"] += 1
+        return True
+
+    def set_button(self, buttonID, state):
+        word, bit = divmod(buttonID - 1, 32)
+        mask = self.buttons[word]
+        value = mask | (1 << bit) if state else mask & ~(1 << bit)
+        if value == mask:
+            self.stats["suppressed"] += 1
+            return False
+        self.buttons[word] = value
+        self.dirty_buttons.add(buttonID)
+        self.stats["changed"] += 1
+        return True
+
+    def dirty(self):
+        return bool(self.dirty_report or self.dirty_axes or self.dirty_buttons)
+
+    def commit(self):
+        if not self.dirty():
+            return 0
+        if self.bulk:
+            data = self.device.data
+            for axis, value in self.axes.items():
+                field = AXIS_FIELDS.get(axis)
+                if field is not None:
+                    setattr(data, field, value)
+            for word, field in enumerate(BUTTON_FIELDS):
+                setattr(data, field, _signed32(self.buttons[word]))
+            started = time.perf_counter()
+            self.device.update()
+            VJOY_UPDATE_SECONDS.observe(time.perf_counter() - started)
+            calls = 1
+        else:
+            calls = 0
+            for axis in self.dirty_axes:
+                started = time.perf_counter()
+                self.device.set_axis(axis, self.axes[axis])
+                VJOY_SET_AXIS_SECONDS.observe(time.perf_counter() - started)
+                calls += 1
+            for buttonID in self.dirty_buttons:
+                word, bit = divmod(buttonID - 1, 32)
+                started = time.perf_counter()
+                self.device.set_button(buttonID, (self.buttons[word] >> bit) & 1)
+                VJOY_SET_BUTTON_SECONDS.observe(time.perf_counter() - started)
+                calls += 1
+        self.dirty_axes.clear()
+        self.dirty_buttons.clear()
+        self.dirty_report = False
+        self.stats["driver_calls"] += calls
+        return calls
+
+
+class DeviceProxy:
+
+    def __init__(self, writer, device_id):
+        self.writer = writer
+        self.device_id = device_id
+
+    def set_axis(self, AxisID, AxisValue):
+        self.writer.post_axis(self.device_id, AxisID, AxisValue)
+        return True
+
+    def set_button(self, buttonID, state):
+        self.writer.post_button(self.device_id, buttonID, state)
+        return True
+
+    def pulse_button(self, buttonID, hold):
+        self.writer.pulse(self.device_id, buttonID, hold)
+        return True
+
+
+class DeviceWriter:
+
+    def __init__(self, devices, rate_hz=200):
+        self.devices = devices
+        self.rate_hz = rate_hz
+        self.slots = {}
+        self.pulses = []
+        self.pulse_release = {}
+        self.pulse_lock = threading.Lock()
+        self.flushes_started = 0
+        self.flush_waiters = []
+        self.waiter_lock = threading.Lock()
+        self.thread = None
+        self.stop_event = threading.Event()
+        self.wake_event = threading.Event()
+        self.proxies = {device_id: DeviceProxy(self, device_id) for device_id in devices}
+        self.stats = {
+            "posted": 0,
+            "coalesced": 0,
+            "written": 0,
+            "dropped": 0,
+            "flushes": 0,
+            "pulses": 0,
+            "pulses_collapsed": 0,
+            "release_lag_max_ms": 0.0,
+        }
+
+    def device(self, device_id):
+        return self.proxies[device_id]
+
+    def post_axis(self, device_id, axis, value):
+        self._post((device_id, AXIS, axis), int(value))
+
+    def post_button(self, device_id, button, state):
+        self._post((device_id, BUTTON, button), 1 if state else 0)
+
+    def pulse(self, device_id, button, hold):
+        key = (device_id, button)
+        release_at = time.perf_counter() + hold
+        with self.pulse_lock:
+            self.stats["pulses"] += 1
+            current = self.pulse_release.get(key)
+            if current is not None:
+                self.stats["pulses_collapsed"] += 1
+                if release_at <= current[0]:
+                    return
+                self.pulse_release[key] = (release_at, current[1])
+            else:
+                self.post_button(device_id, button, 1)
+                self.pulse_release[key] = (release_at, self.flushes_started)
+            heapq.heappush(self.pulses, (release_at, device_id, button))
+        self.wake_event.set()
+
+    def release_due(self, now=None):
+        now = time.perf_counter() if now is None else now
+        released = 0
+        with self.pulse_lock:
+            while self.pulses and self.pulses[0][0] <= now:
+                release_at, device_id, button = self.pulses[0]
+                key = (device_id, button)
+                current = self.pulse_release.get(key)
+                if current is None or current[0] != release_at:
+                    heapq.heappop(self.pulses)
+                    continue
+                if self.stats["flushes"] <= current[1]:
+                    break
+                heapq.heappop(self.pulses)
+                del self.pulse_release[key]
+                self.post_button(device_id, button, 0)
+                lag_ms = (now - release_at) * 1000.0
+                if lag_ms > self.stats["release_lag_max_ms"]:
+                    self.stats["release_lag_max_ms"] = lag_ms
+                released += 1
+        return released
+
+    def next_release(self):
+        with self.pulse_lock:
+            return self.pulses[0][0] if self.pulses else None
+
+    def _post(self, key, value):
+        self.stats["posted"] += 1
+        if key in self.slots:
+            self.stats["coalesced"] += 1
+        self.slots[key] = value
+
+    def after_next_flush(self, callback):
+        with self.waiter_lock:
+            self.flush_waiters.append(callback)
+
+    def flush(self):
+        self.flushes_started += 1
+        # Waiters registered before this flush started are satisfied by it;
+        # later ones wait for the next. The swap and the append share a lock
+        # so a waiter cannot land in a list this flush has already run.
+        with self.waiter_lock:
+            waiters, self.flush_waiters = self.flush_waiters, []
+        slots = self.slots
+        written = 0
+        while True:
+            try:
+                (device_id, kind, index), value = slots.popitem()
+            except KeyError:
+                break
+            device = self.devices.get(device_id)
+            try:
+                if kind == AXIS:
+                    device.set_axis(index, value)
+                else:
+                    device.set_button(index, value)
+                written += 1
+            except Exception as e:
+                self.stats["dropped"] += 1
+                logging.debug("device %s write %s=%s failed: %s", device_id, index, value, e)
+        for device_id, device in self.devices.items():
+            if not hasattr(device, "commit"):
+                continue
+            try:
+                device.commit()
+            except Exception as e:
+                self.stats["dropped"] += 1
+                logging.debug("device %s commit failed: %s", device_id, e)
+        self.stats["written"] += written
+        self.stats["flushes"] += 1
+        if waiters:
+            done = time.perf_counter()
+            for callback in waiters:
+                callback(done)
+        return written
+
+    def start(self):
+        if self.thread is not None:
+            return self
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name="device-writer", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        self.wake_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
+            self.thread = None
+        self.flush()
+
+    def snapshot(self):
+        stats = dict(self.stats)
+        stats["pending"] = len(self.slots)
+        stats["pulses_active"] = len(self.pulse_release)
+        stats["rate_hz"] = self.rate_hz
+        for device in self.devices.values():
+            for name, value in getattr(device, "stats", {}).items():
+                stats[name] = stats.get(name, 0) + value
+        return stats
+
+    def _run(self):
+        period = 1.0 / self.rate_hz
+        next_tick = time.perf_counter()
+        while not self.stop_event.is_set():
+            self.flush()
+            if self.release_due():
+                self.flush()
+            next_tick += period
+            now = time.perf_counter()
+            delay = next_tick - now
+            if delay < 0:
+                next_tick = now
+                delay = 0
+            release_at = self.next_release()
+            if release_at is not None:
+                delay = min(delay, max(0.0, release_at - now))
+            self.wake_event.wait(delay)
+            self.wake_event.clear()
@@ -0,0 +1,326 @@
+import hashlib
+import http.client
+import json
+import logging
+import os
+import ssl
+import tempfile
+import threading
+import time
+from urllib.parse import urljoin, urlsplit
+
+from backend.metrics import UPSTREAM_SECONDS
+
+SIMBRIEF_URL = "https://www.simbrief.com/api/xml.fetcher.php?userid=193599&json=1"
+METAR_URL = "https://aviationweather.gov/api/data/metar?ids={ids}&format=json"
+OFP_TTL = 60.0
+METAR_TTL = 300.0
+MAX_IDLE_PER_HOST = 4
+MAX_REDIRECTS = 5
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+OFP_PDF_DIR = os.path.join(tempfile.gettempdir(), "virtual_cockpit_ofp")
+OFP_REFRESH_INTERVAL = 60.0
+OFP_PDF_KEEP = 3
+
+
+class UpstreamError(Exception):
+    pass
+
+
+class HttpPool:
+
+    def __init__(self, max_idle=MAX_IDLE_PER_HOST):
+        self.max_idle = max_idle
+        self.idle = {}
+        self.lock = threading.Lock()
+        self.ssl_context = ssl.create_default_context()
+        self.stats = {
+            "requests": 0,
+            "connections_opened": 0,
+            "connections_reused": 0,
+        }
+
+    def _connect(self, scheme, host, port, timeout):
+        self.stats["connections_opened"] += 1
+        if scheme == "https":
+            return http.client.HTTPSConnection(host, port, timeout=timeout, context=self.ssl_context)
+        return http.client.HTTPConnection(host, port, timeout=timeout)
+
+    def _acquire(self, key, timeout):
+        with self.lock:
+            connections = self.idle.get(key)
+            conn = connections.pop() if connections else None
+        if conn is None:
+            return self._connect(*key, timeout), False
+        self.stats["connections_reused"] += 1
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+        return conn, True
+
+    def _release(self, key, conn):
+        with self.lock:
+            connections = self.idle.setdefault(key, [])
+            if len(connections) < self.max_idle:
+                connections.append(conn)
+                return
+        conn.close()
+
+    def get(self, url, timeout=10, accept="application/json"):
+        # Follow redirects like urlopen did; each hop may go to another host
+        # and so takes its connection from that host's pool.
+        for _ in range(MAX_REDIRECTS + 1):
+            status, location, body = self._get_once(url, timeout, accept)
+            if status in REDIRECT_STATUSES and location:
+                url = urljoin(url, location)
+                if urlsplit(url).scheme not in ("http", "https"):
+                    raise UpstreamError(f"unsupported redirect to {url}")
+                continue
+            if status != 200:
+                raise UpstreamError(f"{urlsplit(url).hostname} returned {status}")
+            return body
+        raise UpstreamError(f"too many redirects fetching {urlsplit(url).hostname}")
+
+    def _get_once(self, url, timeout, accept):
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port)
+        path = parts.path + ("?" + parts.query if parts.query else "")
+        headers = {"Accept": accept, "User-Agent": "virtual-cockpit"}
+        self.stats["requests"] += 1
+        started = time.perf_counter()
+        conn, reused = self._acquire(key, timeout)
+        while True:
+            try:
+                conn.request("GET", path, headers=headers)
+                response = conn.getresponse()
+                body = response.read()
+                break
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                conn.close()
+                if not reused:
+                    UPSTREAM_SECONDS.labels(parts.hostname, "error").observe(time.perf_counter() - started)
+                    raise
+                # The server closed an idle keep-alive connection; retry once
+                # on a fresh one.
+                conn, reused = self._connect(*key, timeout), False
+            except Exception:
+                conn.close()
+                UPSTREAM_SECONDS.labels(parts.hostname, "error").observe(time.perf_counter() - started)
+                raise
+        if response.will_close:
+            conn.close()
+        else:
+            self._release(key, conn)
+        UPSTREAM_SECONDS.labels(parts.hostname, str(response.status)).observe(time.perf_counter() - started)
+        return response.status, response.getheader("Location"), body
+
+
+class SingleFlightCache:
+
+    def __init__(self):
+        self.values = {}
+        self.flights = {}
+        self.lock = threading.Lock()
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "shared": 0,
+        }
+
+    def get(self, key, ttl, loader, keep=True):
+        with self.lock:
+            entry = self.values.get(key)
+            if entry is not None and time.monotonic() - entry[1] < ttl:
+                self.stats["hits"] += 1
+                return entry[0]
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.flights[key] = {"done": threading.Event(), "value": None, "error": None}
+                self.stats["misses"] += 1
+            else:
+                self.stats["shared"] += 1
+        if not leader:
+            flight["done"].wait()
+            if flight["error"] is not None:
+                raise flight["error"]
+            return flight["value"]
+        try:
+            value = loader()
+            flight["value"] = value
+            if keep:
+                with self.lock:
+                    self.values[key] = (value, time.monotonic())
+            return value
+        except Exception as e:
+            flight["error"] = e
+            raise
+        finally:
+            with self.lock:
+                self.flights.pop(key, None)
+            flight["done"].set()
+
+    def invalidate(self, key):
+        with self.lock:
+            self.values.pop(key, None)
+
+
+class FlightDataService:
+
+    def __init__(self, simbrief_url=SIMBRIEF_URL, metar_url=METAR_URL, ofp_ttl=OFP_TTL, metar_ttl=METAR_TTL, pool=None):
+        self.simbrief_url = simbrief_url
+        self.metar_url = metar_url
+        self.ofp_ttl = ofp_ttl
+        self.metar_ttl = metar_ttl
+        self.pool = pool or HttpPool()
+        self.cache = SingleFlightCache()
+
+    def simbrief(self, refresh=False):
+        return self.cache.get("simbrief", 0.0 if refresh else self.ofp_ttl, self._load_simbrief)
+
+    def _load_simbrief(self):
+        return json.loads(self.pool.get(self.simbrief_url, timeout=10).decode("utf-8"))
+
+    def metars(self, stations, refresh=False):
+        stations = tuple(sorted({icao.upper() for icao in stations if icao}))
+        if not stations:
+            return {}
+        ttl = 0.0 if refresh else self.metar_ttl
+        try:
+            return self.cache.get(("metar", stations), ttl, lambda: self._load_metars(stations))
+        except Exception as e:
+            logging.debug("METAR fetch for %s failed: %s", ",".join(stations), e)
+            return {}
+
+    def _load_metars(self, stations):
+        data = json.loads(self.pool.get(self.metar_url.format(ids=",".join(stations)), timeout=5).decode("utf-8"))
+        metars = {}
+        for item in data or []:
+            icao = (item.get("icaoId") or "").upper()
+            if icao and icao not in metars:
+                metars[icao] = item.get("rawOb", "")
+        return metars
+
+    def plan(self, refresh=False):
+        data = self.simbrief(refresh)
+        files = data.get("files") or {}
+        directory = files.get("directory") or ""
+        pdf = files.get("pdf") or {}
+        link = pdf.get("link") or ""
+        if not directory or not link:
+            raise UpstreamError("missing_ofp_link")
+        pdf_url = directory.rstrip("/") + "/" + link.lstrip("/")
+        params = data.get("params") or {}
+        identity = "|".join(str(part) for part in (params.get("request_id"), params.get("time_generated"), pdf_url))
+        return data, pdf_url, hashlib.sha1(identity.encode("utf-8")).hexdigest()[:16]
+
+    def ofp(self, refresh=False):
+        data, pdf_url, plan_id = self.plan(refresh)
+        origin_icao = (data.get("origin") or {}).get("icao_code", "")
+        dest_icao = (data.get("destination") or {}).get("icao_code", "")
+        return {
+            "pdf_url": pdf_url,
+            "plan_id": plan_id,
+            "metars": self.airport_metars(origin_icao, dest_icao, refresh),
+            "origin_icao": origin_icao,
+            "destination_icao": dest_icao,
+        }
+
+    def airport_metars(self, origin_icao, dest_icao, refresh=False):
+        found = self.metars([origin_icao, dest_icao], refresh)
+        metars = {}
+        if origin_icao:
+            metars["origin"] = found.get(origin_icao.upper(), "")
+        if dest_icao:
+            metars["destination"] = found.get(dest_icao.upper(), "")
+        return metars
+
+    def snapshot(self):
+        stats = dict(self.pool.stats)
+        stats.update(self.cache.stats)
+        return stats
+
+
+class OfpPdfCache:
+
+    def __init__(self, service, directory=OFP_PDF_DIR, refresh_interval=OFP_REFRESH_INTERVAL, keep=OFP_PDF_KEEP):
+        self.service = service
+        self.directory = directory
+        self.refresh_interval = refresh_interval
+        self.keep = keep
+        self.plan_id = None
+        self.thread = None
+        self.running = False
+        self.wake_event = threading.Event()
+        self.stats = {
+            "downloads": 0,
+            "download_bytes": 0,
+            "refreshes": 0,
+            "refresh_errors": 0,
+            "plan_changes": 0,
+        }
+
+    def path_for(self, plan_id):
+        return os.path.join(self.directory, plan_id + ".pdf")
+
+    def current(self, refresh=False):
+        data, pdf_url, plan_id = self.service.plan(refresh)
+        path = self.path_for(plan_id)
+        if not os.path.exists(path):
+            # Concurrent misses share one download; the file on disk is the
+            # only copy kept afterwards.
+            self.service.cache.get(("pdf", plan_id), 0.0, lambda: self._download(pdf_url, path), keep=False)
+        if plan_id != self.plan_id:
+            if self.plan_id is not None:
+                self.stats["plan_changes"] += 1
+            self.plan_id = plan_id
+            self._prune(path)
+        return path, plan_id
+
+    def _download(self, url, path):
+        body = self.service.pool.get(url, timeout=30, accept="application/pdf")
+        os.makedirs(self.directory, exist_ok=True)
+        partial = path + ".part"
+        with open(partial, "wb") as f:
+            f.write(body)
+        os.replace(partial, path)
+        self.stats["downloads"] += 1
+        self.stats["download_bytes"] += len(body)
+        return path
+
+    def _prune(self, keep_path):
+        try:
+            paths = [os.path.join(self.directory, name) for name in os.listdir(self.directory) if name.endswith(".pdf")]
+        except OSError:
+            return
+        paths.sort(key=os.path.getmtime, reverse=True)
+        for path in [p for p in paths if p != keep_path][max(self.keep - 1, 0):]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def start(self):
+        if self.thread is not None:
+            return self
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="ofp-refresh", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        self.wake_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
+            self.thread = None
+
+    def _run(self):
+        while self.running:
+            try:
+                self.current(refresh=True)
+                self.stats["refreshes"] += 1
+            except Exception as e:
+                self.stats["refresh_errors"] += 1
+                logging.debug("OFP refresh failed: %s", e)
+            self.wake_event.wait(self.refresh_interval)
@@ -1,39 +1,143 @@
 import json
+import logging
 import os
 import sys
+import threading
+import time
+
+from backend.lvar_writer import LvarWriter
 
 try:
     from backend.simconnect_mobiflight import SimConnectMobiFlight
-    from backend.mobiflight_variable_requests import MobiFlightVariableRequests
+    from backend.mobiflight_variable_requests import MobiFlightVariableRequests, MobiFlightBulkVariableRequests
 except Exception:
     SimConnectMobiFlight = None
     MobiFlightVariableRequests = None
+    MobiFlightBulkVariableRequests = None
 
 if getattr(sys, 'frozen', False):
     _BASE_DIR = sys._MEIPASS
 else:
     _BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 MAPPING_PATH = os.path.join(_BASE_DIR, "data", "lvars.json")
+LVAR_GET_TIMEOUT = 0.5
+LVAR_WARMUP_TIMEOUT = 2.0
+LVAR_WARMUP_RETRY = 30.0
+LVAR_WRITE_WINDOW = 0.01
+LVAR_BULK_MODE = False
+LVAR_PUMP_HZ = 250
 _mf = None
 _vr = None
+_mapping_lock = threading.Lock()
+_mapping_mtime = None
+_mapping_profiles = {}
+_mf_lock = threading.Lock()
+_warmups = {}
+_warmup_lock = threading.Lock()
+
+class LvarState:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = {}
+        self.changed = set()
+        self.version = 0
+
+    def on_change(self, name, value):
+        with self.lock:
+            if name in self.values and self.values[name] == value:
+                return
+            self.values[name] = value
+            self.changed.add(name)
+            self.version += 1
+
+    def snapshot(self, profile_name):
+        targets = _get_mapping(profile_name)
+        with self.lock:
+            values = {key: self.values[target.expr] for key, target in targets.items()
+                      if target.readable and target.expr in self.values}
+            return values, self.version
+
+    def drain(self, profile_names):
+        with self.lock:
+            if not self.changed:
+                return {}
+            changed = self.changed
+            self.changed = set()
+            values = dict(self.values)
+        diffs = {}
+        for profile_name in profile_names:
+            diff = {key: values[target.expr] for key, target in _get_mapping(profile_name).items()
+                    if target.readable and target.expr in changed}
+            if diff:
+                diffs[profile_name] = diff
+        return diffs
+
+lvar_state = LvarState()
+lvar_writer = LvarWriter(lambda: _get_mf()[1], window=LVAR_WRITE_WINDOW)
+
+class LvarTarget:
+    def __init__(self, key, lvar):
+        self.key = key
+        self.lvar = lvar
+        self.is_expression = lvar.startswith("(")
+        self.readable = lvar.startswith("L:") or lvar.startswith("A:")
+        self.expr = _normalize_expr(lvar) if self.readable else None
+        self.target = lvar if lvar.startswith("L:") else f"L:{lvar}"
+        self.set_suffix = f" (>{self.target})"
+        self.step_prefix = f"{self.expr or '(' + self.target + ')'} "
+        self.step_suffix = f" + (>{self.target})"
+        self.step_commands = {}
 
-def _load_mapping(profile_name):
-    if not os.path.exists(MAPPING_PATH):
-        return []
-    with open(MAPPING_PATH, "r") as handle:
-        data = json.load(handle)
-    profiles = data.get("profiles", {})
-    profile = profiles.get(profile_name, {})
-    return profile.get("vars", [])
+    def set_command(self, value):
+        return f"{value}{self.set_suffix}"
+
+    def step_command(self, delta):
+        if self.is_expression:
+            return self.lvar
+        command = self.step_commands.get(delta)
+        if command is None:
+            command = f"{self.step_prefix}{delta}{self.step_suffix}"
+            if len(self.step_commands) < 64:
+                self.step_commands[delta] = command
+        return command
+
+def _compile_mapping(data):
+    compiled = {}
+    for profile_name, profile in data.get("profiles", {}).items():
+        targets = {}
+        for item in profile.get("vars", []):
+            key = item.get("key")
+            lvar = item.get("lvar")
+            if key and lvar and key not in targets:
+                targets[key] = LvarTarget(key, lvar)
+        compiled[profile_name] = targets
+    return compiled
+
+def _get_mapping(profile_name):
+    global _mapping_mtime, _mapping_profiles
+    try:
+        mtime = os.stat(MAPPING_PATH).st_mtime_ns
+    except OSError:
+        return {}
+    if mtime != _mapping_mtime:
+        with _mapping_lock:
+            if mtime != _mapping_mtime:
+                with open(MAPPING_PATH, "r") as handle:
+                    _mapping_profiles = _compile_mapping(json.load(handle))
+                _mapping_mtime = mtime
+    return _mapping_profiles.get(profile_name, {})
 
 def _get_mf():
     global _mf, _vr
     if SimConnectMobiFlight is None or MobiFlightVariableRequests is None:
         return None, None
-    if _mf is None or _vr is None:
-        _mf = SimConnectMobiFlight()
-        _vr = MobiFlightVariableRequests(_mf)
-        _vr.clear_sim_variables()
+    with _mf_lock:
+        if _mf is None or _vr is None:
+            _mf = SimConnectMobiFlight(pump_hz=LVAR_PUMP_HZ)
+            requests_class = MobiFlightBulkVariableRequests if LVAR_BULK_MODE else MobiFlightVariableRequests
+            _vr = requests_class(_mf, get_timeout=LVAR_GET_TIMEOUT)
+            _vr.clear_sim_variables()
+            _vr.add_listener(lvar_state.on_change)
     return _mf, _vr
 
 def _normalize_expr(lvar):
@@ -41,87 +145,188 @@ def _normalize_expr(lvar):
         return lvar
     return f"({lvar})"
 
-def _find_lvar(vars_list, key):
-    for item in vars_list:
-        if item.get("key") == key:
-            return item.get("lvar")
-    return None
-
 def read_lvars_payload(profile_name):
     if SimConnectMobiFlight is None or MobiFlightVariableRequests is None:
         return {"error": "mobiflight_module_not_installed"}
-    vars_list = _load_mapping(profile_name)
-    if not vars_list:
+    targets = _get_mapping(profile_name)
+    if not targets:
         return {"error": "no_vars_configured"}
     _, vr = _get_mf()
     if vr is None:
         return {"error": "mobiflight_init_failed"}
     result = {}
-    for item in vars_list:
-        key = item.get("key")
-        lvar = item.get("lvar")
-        if not key or not lvar:
-            continue
-        if not (lvar.startswith("L:") or lvar.startswith("A:")):
-            continue
-        expr = _normalize_expr(lvar)
-        result[key] = vr.get(expr)
+    for key, target in targets.items():
+        if target.readable:
+            result[key] = vr.get(target.expr)
     if not result:
         return {"error": "no_vars_configured"}
     return result
 
+def mobiflight_pump_stats():
+    pump = getattr(_mf, "pump", None)
+    if pump is None:
+        return {"error": "mobiflight_not_connected"}
+    return pump.snapshot()
+
+def lvar_snapshot(profile_name):
+    values, version = lvar_state.snapshot(profile_name)
+    return {"profile": profile_name, "version": version, "values": values}
+
 def write_lvar_value(profile_name, key, value):
     if SimConnectMobiFlight is None or MobiFlightVariableRequests is None:
         return {"error": "mobiflight_module_not_installed"}
-    vars_list = _load_mapping(profile_name)
-    lvar = _find_lvar(vars_list, key)
-    if not lvar:
+    target = _get_mapping(profile_name).get(key)
+    if target is None:
         return {"error": "unknown_key"}
     _, vr = _get_mf()
     if vr is None:
         return {"error": "mobiflight_init_failed"}
-    target = lvar if lvar.startswith("L:") else f"L:{lvar}"
-    cmd = f"{value} (>{target})"
-    vr.set(cmd)
+    vr.set(target.set_command(value))
     return {"status": "ok"}
 
 def read_lvar_value(profile_name, key):
     if SimConnectMobiFlight is None or MobiFlightVariableRequests is None:
         return {"error": "mobiflight_module_not_installed"}
-    vars_list = _load_mapping(profile_name)
-    lvar = _find_lvar(vars_list, key)
-    if not lvar:
+    target = _get_mapping(profile_name).get(key)
+    if target is None:
         return {"error": "unknown_key"}
     _, vr = _get_mf()
     if vr is None:
         return {"error": "mobiflight_init_failed"}
-    if not (lvar.startswith("L:") or lvar.startswith("A:")):
+    if not target.readable:
         return {"error": "not_readable"}
-    expr = _normalize_expr(lvar)
-    return {"value": vr.get(expr)}
+    return {"value": vr.get(target.expr)}
 
 def step_lvar_value(profile_name, key, delta):
     if SimConnectMobiFlight is None or MobiFlightVariableRequests is None:
         return {"error": "mobiflight_module_not_installed"}
-    vars_list = _load_mapping(profile_name)
-    lvar = _find_lvar(vars_list, key)
-    if not lvar:
+    target = _get_mapping(profile_name).get(key)
+    if target is None:
         return {"error": "unknown_key"}
     _, vr = _get_mf()
     if vr is None:
         return {"error": "mobiflight_init_failed"}
-    if lvar.startswith("("):
-        vr.set(lvar)
-        vr.send_command(lvar)
-        return {"status": "ok"}
-    expr = _normalize_expr(lvar)
-    current = vr.get(expr)
     try:
-        next_val = float(current) + float(delta)
+        delta = float(delta)
     except Exception:
         return {"error": "invalid_delta"}
-    target = lvar if lvar.startswith("L:") else f"L:{lvar}"
-    cmd = f"{next_val} (>{target})"
-    vr.set(cmd)
-    vr.send_command(cmd)
+    vr.set(target.step_command(delta))
     return {"status": "ok"}
+
+def _queue_target(profile_name, key):
+    if SimConnectMobiFlight is None or MobiFlightVariableRequests is None:
+        return None, {"error": "mobiflight_module_not_installed"}
+    target = _get_mapping(profile_name).get(key)
+    if target is None:
+        return None, {"error": "unknown_key"}
+    lvar_writer.start()
+    return target, None
+
+def queue_lvar_write(profile_name, key, value):
+    target, error = _queue_target(profile_name, key)
+    if error:
+        return error
+    lvar_writer.set(target, value)
+    return {"status": "queued"}
+
+def queue_lvar_step(profile_name, key, delta):
+    target, error = _queue_target(profile_name, key)
+    if error:
+        return error
+    lvar_writer.step(target, delta)
+    return {"status": "queued"}
+
+class LvarWarmup:
+    def __init__(self, profile_name, targets, timeout=LVAR_WARMUP_TIMEOUT, failures=0):
+        self.profile_name = profile_name
+        self.targets = [target for target in targets.values() if target.readable]
+        self.timeout = timeout
+        self.state = "pending"
+        self.error = None
+        self.failures = failures
+        self.ready = {target.key: False for target in self.targets}
+        self.started_at = None
+        self.finished_at = None
+        self.vr = None
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name=f"lvar-warmup-{self.profile_name}", daemon=True)
+        self.thread.start()
+        return self
+
+    def run(self):
+        self.started_at = time.monotonic()
+        self.state = "registering"
+        try:
+            _, self.vr = _get_mf()
+            if self.vr is None:
+                raise RuntimeError("mobiflight_init_failed")
+            for target in self.targets:
+                self.vr.register(target.expr)
+            self.state = "waiting"
+            deadline = self.started_at + self.timeout
+            for target in self.targets:
+                self.vr.get(target.expr, timeout=max(0.0, deadline - time.monotonic()))
+                self.ready[target.key] = self.vr.is_ready(target.expr)
+            self.state = "ready" if all(self.ready.values()) else "partial"
+        except Exception as e:
+            self.state = "failed"
+            self.error = str(e)
+            self.failures += 1
+            log = logging.warning if self.failures == 1 else logging.debug
+            log("LVar warm-up for %s failed (%d in a row): %s", self.profile_name, self.failures, e)
+        self.finished_at = time.monotonic()
+
+    def finished(self):
+        return self.finished_at is not None
+
+    def retry_due(self):
+        return time.monotonic() - self.finished_at >= LVAR_WARMUP_RETRY
+
+    def snapshot(self):
+        vr = self.vr
+        if vr is not None:
+            for target in self.targets:
+                if not self.ready[target.key]:
+                    self.ready[target.key] = vr.is_ready(target.expr)
+        end = self.finished_at if self.finished_at is not None else time.monotonic()
+        return {
+            "profile": self.profile_name,
+            "state": self.state,
+            "error": self.error,
+            "failures": self.failures,
+            "total": len(self.targets),
+            "ready": sum(1 for value in self.ready.values() if value),
+            "vars": dict(self.ready),
+            "elapsed_ms": round((end - self.started_at) * 1000.0, 1) if self.started_at else 0.0,
+        }
+
+def start_lvar_warmup(profile_name):
+    if SimConnectMobiFlight is None or MobiFlightVariableRequests is None:
+        return None
+    targets = _get_mapping(profile_name)
+    if not any(target.readable for target in targets.values()):
+        return None
+    with _warmup_lock:
+        warmup = _warmups.get(profile_name)
+        failures = 0
+        if warmup is not None:
+            if not warmup.finished() or warmup.state == "ready":
+                return warmup
+            if warmup.state == "failed":
+                # Page loads and /lvars polls land here constantly; without a
+                # backoff a sim that is not running would get a new warm-up
+                # thread for each of them.
+                if not warmup.retry_due():
+                    return warmup
+                failures = warmup.failures
+        warmup = LvarWarmup(profile_name, targets, failures=failures)
+        _warmups[profile_name] = warmup
+    return warmup.start()
+
+def lvar_warmup_status(profile_name):
+    warmup = _warmups.get(profile_name)
+    if warmup is None:
+        return {"error": "no_warmup"}
+    return warmup.snapshot()
@@ -0,0 +1,129 @@
+import collections
+import itertools
+import threading
+import time
+
+TRACE_SAMPLE_EVERY = 4
+TRACE_WINDOW = 512
+TRACE_CLIENTS = 64
+STAGES = ("network", "dispatch", "device", "total")
+
+
+class Trace:
+
+    __slots__ = ("type", "client_ms", "received_ms", "received", "dispatched")
+
+    def __init__(self, command_type, client_ms, received_ms, received):
+        self.type = command_type
+        self.client_ms = client_ms
+        self.received_ms = received_ms
+        self.received = received
+        self.dispatched = None
+
+
+def _percentiles(values):
+    if not values:
+        return None
+    ordered = sorted(values)
+    last = len(ordered) - 1
+    return {
+        "p50": round(ordered[int(round(0.50 * last))], 3),
+        "p99": round(ordered[int(round(0.99 * last))], 3),
+        "max": round(ordered[last], 3),
+        "count": len(ordered),
+    }
+
+
+class LatencyTracer:
+
+    def __init__(self, sample_every=TRACE_SAMPLE_EVERY, window=TRACE_WINDOW, max_clients=TRACE_CLIENTS):
+        self.sample_every = sample_every
+        self.window = window
+        self.max_clients = max_clients
+        self.counter = itertools.count()
+        self.samples = {}
+        self.last_seq = {}
+        self.lock = threading.Lock()
+        self.stats = {
+            "stamped": 0,
+            "sampled": 0,
+            "completed": 0,
+            "seq_gaps": 0,
+            "seq_reordered": 0,
+        }
+
+    def begin(self, data, client=None):
+        client_ms = data.get("ts")
+        if client_ms is None:
+            return None
+        self.stats["stamped"] += 1
+        seq = data.get("seq")
+        if client is not None and isinstance(seq, int):
+            last = self.last_seq.get(client)
+            if last is not None:
+                if seq <= last:
+                    self.stats["seq_reordered"] += 1
+                elif seq > last + 1:
+                    self.stats["seq_gaps"] += seq - last - 1
+            if last is None and len(self.last_seq) >= self.max_clients:
+                # Every page load brings a new client id; forget the oldest.
+                self.last_seq.pop(next(iter(self.last_seq)), None)
+            if last is None or seq > last:
+                self.last_seq[client] = seq
+        if next(self.counter) % self.sample_every:
+            return None
+        try:
+            client_ms = float(client_ms)
+        except (TypeError, ValueError):
+            return None
+        self.stats["sampled"] += 1
+        return Trace(str(data.get("type")), client_ms, time.time() * 1000.0, time.perf_counter())
+
+    def dispatched(self, trace, writer=None):
+        trace.dispatched = time.perf_counter()
+        if writer is None:
+            self.complete(trace, None)
+        else:
+            writer.after_next_flush(lambda written: self.complete(trace, written))
+
+    def complete(self, trace, written):
+        network = trace.received_ms - trace.client_ms
+        dispatch = (trace.dispatched - trace.received) * 1000.0
+        stages = {"network": network, "dispatch": dispatch}
+        if written is not None:
+            stages["device"] = (written - trace.dispatched) * 1000.0
+            stages["total"] = network + dispatch + stages["device"]
+        for stage, value in stages.items():
+            self._series(trace.type, stage).append(value)
+            self._series(None, stage).append(value)
+        self.stats["completed"] += 1
+
+    def _series(self, command_type, stage):
+        key = (command_type, stage)
+        series = self.samples.get(key)
+        if series is None:
+            with self.lock:
+                series = self.samples.setdefault(key, collections.deque(maxlen=self.window))
+        return series
+
+    def forget(self, client):
+        self.last_seq.pop(client, None)
+
+    def snapshot(self):
+        stages = {}
+        types = {}
+        for (command_type, stage), series in list(self.samples.items()):
+            summary = _percentiles(list(series))
+            if summary is None:
+                continue
+            if command_type is None:
+                stages[stage] = summary
+            else:
+                types.setdefault(command_type, {})[stage] = summary
+        return {
+            "unit": "ms",
+            "sample_every": self.sample_every,
+            "stages": stages,
+            "types": types,
+            "stats": dict(self.stats),
+        }
@@ -0,0 +1,154 @@
+import itertools
+import logging
+import threading
+import time
+
+SET = 0
+STEP = 1
+EXPRESSION = 2
+
+# A write that matches the cached sim value is only skipped once the last
+# write to that LVar is older than this; the ON_SET callback for our own
+# write may not have arrived yet (e.g. ap_disconnect 1 -> 0).
+UNCHANGED_SETTLE_SECONDS = 0.5
+
+
+class LvarWriter:
+
+    def __init__(self, get_variable_requests, window=0.01):
+        self.get_variable_requests = get_variable_requests
+        self.window = window
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.last_written = {}
+        self.expression_seq = itertools.count()
+        self.thread = None
+        self.stop_event = threading.Event()
+        self.wake_event = threading.Event()
+        self.stats = {
+            "enqueued": 0,
+            "coalesced": 0,
+            "sent": 0,
+            "frames": 0,
+            "skipped_unchanged": 0,
+            "dropped": 0,
+            "flushes": 0,
+            "max_depth": 0,
+        }
+
+    def set(self, target, value):
+        self._enqueue(target.target, target, SET, float(value))
+
+    def step(self, target, delta):
+        if target.is_expression:
+            self._enqueue(None, target, EXPRESSION, None)
+        else:
+            self._enqueue(target.target, target, STEP, float(delta))
+
+    def _enqueue(self, name, target, kind, value):
+        with self.lock:
+            self.stats["enqueued"] += 1
+            if name is None:
+                # Expression steps are never coalesced; each gets its own key.
+                name = (EXPRESSION, next(self.expression_seq))
+            # pop so a coalesced write moves behind anything queued since,
+            # e.g. an expression step on the same LVar.
+            current = self.pending.pop(name, None)
+            if current is not None:
+                self.stats["coalesced"] += 1
+                if kind == STEP:
+                    kind, value = current[1], current[2] + value
+            self.pending[name] = (target, kind, value)
+            if len(self.pending) > self.stats["max_depth"]:
+                self.stats["max_depth"] = len(self.pending)
+        self.wake_event.set()
+
+    def _unchanged(self, vr, name, target, value, now):
+        if not target.readable:
+            return False
+        last = self.last_written.get(name)
+        if last is not None and now - last < UNCHANGED_SETTLE_SECONDS:
+            return False
+        cached, age = vr.get_cached(target.expr)
+        return cached is not None and cached == value
+
+    def flush(self):
+        with self.lock:
+            batch = self.pending
+            self.pending = {}
+        if not batch:
+            return 0
+        self.stats["flushes"] += 1
+        try:
+            vr = self.get_variable_requests()
+        except Exception as e:
+            logging.warning("LVar writer could not reach MobiFlight: %s", e)
+            vr = None
+        if vr is None:
+            self.stats["dropped"] += len(batch)
+            return 0
+        now = time.perf_counter()
+        expressions = []
+        for name, (target, kind, value) in batch.items():
+            if kind == EXPRESSION:
+                expressions.append(target.step_command(None))
+                continue
+            if kind == STEP:
+                if value == 0:
+                    self.stats["skipped_unchanged"] += 1
+                    continue
+                expressions.append(target.step_command(value))
+            elif self._unchanged(vr, name, target, value, now):
+                self.stats["skipped_unchanged"] += 1
+                continue
+            else:
+                expressions.append(target.set_command(value))
+            self.last_written[name] = now
+        if not expressions:
+            return 0
+        try:
+            frames, sent = vr.set_many(expressions)
+        except Exception as e:
+            self.stats["dropped"] += len(expressions)
+            logging.debug("LVar write of %s expressions failed: %s", len(expressions), e)
+            return 0
+        self.stats["frames"] += frames
+        self.stats["sent"] += sent
+        self.stats["dropped"] += len(expressions) - sent
+        return sent
+
+    def start(self):
+        if self.thread is not None:
+            return self
+        with self.lock:
+            if self.thread is None:
+                self.stop_event.clear()
+                self.thread = threading.Thread(target=self._run, name="lvar-writer", daemon=True)
+                self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        self.wake_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
+            self.thread = None
+        self.flush()
+
+    def snapshot(self):
+        stats = dict(self.stats)
+        stats["depth"] = len(self.pending)
+        stats["window_ms"] = self.window * 1000.0
+        stats["coalescing_ratio"] = round(stats["coalesced"] / stats["enqueued"], 3) if stats["enqueued"] else 0.0
+        return stats
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            self.wake_event.wait()
+            self.wake_event.clear()
+            if self.window:
+                self.stop_event.wait(self.window)
+            try:
+                self.flush()
+            except Exception as e:
+                logging.debug("LVar writer flush failed: %s", e)
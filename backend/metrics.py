@@ -0,0 +1,127 @@
+import bisect
+import threading
+
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=None):
+    pairs = ["%s=\"%s\"" % (name, _escape(value)) for name, value in zip(names, values)]
+    if extra is not None:
+        pairs.append("%s=\"%s\"" % extra)
+    return "{%s}" % ",".join(pairs) if pairs else ""
+
+
+class Histogram:
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        # Unlocked like the other stats counters in the backend: a racing
+        # increment can be lost, which a scrape will not notice.
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+
+class Counter:
+
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+
+class MetricFamily:
+
+    def __init__(self, name, kind, help_text, label_names, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.kind = kind
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = buckets
+        self.children = {}
+        self.lock = threading.Lock()
+
+    def labels(self, *values):
+        child = self.children.get(values)
+        if child is not None:
+            return child
+        with self.lock:
+            child = self.children.get(values)
+            if child is None:
+                child = Histogram(self.buckets) if self.kind == "histogram" else Counter()
+                self.children[values] = child
+        return child
+
+    def render(self, lines):
+        lines.append("# HELP %s %s" % (self.name, self.help_text))
+        lines.append("# TYPE %s %s" % (self.name, self.kind))
+        for values, child in sorted(self.children.items()):
+            if self.kind == "counter":
+                lines.append("%s%s %d" % (self.name, _format_labels(self.label_names, values), child.value))
+                continue
+            cumulative = 0
+            for bound, count in zip(self.buckets, child.counts):
+                cumulative += count
+                lines.append("%s_bucket%s %d" % (self.name, _format_labels(self.label_names, values, ("le", repr(bound))), cumulative))
+            lines.append("%s_bucket%s %d" % (self.name, _format_labels(self.label_names, values, ("le", "+Inf")), child.count))
+            labels = _format_labels(self.label_names, values)
+            lines.append("%s_sum%s %r" % (self.name, labels, child.sum))
+            lines.append("%s_count%s %d" % (self.name, labels, child.count))
+
+
+class MetricsRegistry:
+
+    def __init__(self):
+        self.families = {}
+        self.collectors = []
+
+    def histogram(self, name, help_text, label_names=(), buckets=LATENCY_BUCKETS):
+        return self._family(name, "histogram", help_text, label_names, buckets)
+
+    def counter(self, name, help_text, label_names=()):
+        return self._family(name, "counter", help_text, label_names)
+
+    def _family(self, name, kind, help_text, label_names, buckets=LATENCY_BUCKETS):
+        family = self.families.get(name)
+        if family is None:
+            family = self.families[name] = MetricFamily(name, kind, help_text, label_names, buckets)
+        return family
+
+    def add_collector(self, collector):
+        self.collectors.append(collector)
+
+    def render(self):
+        lines = []
+        for name in sorted(self.families):
+            self.families[name].render(lines)
+        for collector in self.collectors:
+            for name, help_text, value in collector():
+                lines.append("# HELP %s %s" % (name, help_text))
+                lines.append("# TYPE %s gauge" % name)
+                lines.append("%s %r" % (name, float(value)))
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+REQUEST_SECONDS = metrics.histogram("vc_http_request_duration_seconds", "Flask request handling time by route.", ("route", "method", "status"))
+COMMAND_SECONDS = metrics.histogram("vc_command_duration_seconds", "Control command handler time by command type.", ("type",))
+COMMAND_ERRORS = metrics.counter("vc_command_errors_total", "Control commands that failed, by command type.", ("type",))
+VJOY_SECONDS = metrics.histogram("vc_vjoy_driver_call_duration_seconds", "vJoy driver call time.", ("call",))
+MOBIFLIGHT_SECONDS = metrics.histogram("vc_mobiflight_call_duration_seconds", "MobiFlight WASM variable request time.", ("op",))
+UPSTREAM_SECONDS = metrics.histogram("vc_upstream_request_duration_seconds", "Outbound HTTP request time by host.", ("host", "outcome"))
@@ -1,9 +1,20 @@
+import itertools
 import logging
 import struct
-from time import sleep
-from ctypes import sizeof
+import threading
+from time import monotonic, perf_counter
+from ctypes import addressof, c_char, create_string_buffer, sizeof
 from ctypes.wintypes import FLOAT
-from SimConnect.Enum import SIMCONNECT_CLIENT_DATA_PERIOD, SIMCONNECT_UNUSED
+import numpy as np
+from SimConnect.Enum import SIMCONNECT_CLIENT_DATA_PERIOD, SIMCONNECT_RECV_CLIENT_DATA, SIMCONNECT_UNUSED
+from backend.metrics import MOBIFLIGHT_SECONDS
+
+COMMAND_BUFFER_COUNT = 8
+LVARS_AREA_SIZE = 4096
+LVARS_BLOCK_DEFINITION_ID = 0x1000
+GET_SECONDS = MOBIFLIGHT_SECONDS.labels("get")
+SET_SECONDS = MOBIFLIGHT_SECONDS.labels("set")
+SET_MANY_SECONDS = MOBIFLIGHT_SECONDS.labels("set_many")
 
 
 class SimVariable:
@@ -12,17 +23,22 @@ class SimVariable:
         self.name = name
         self.float_value = float_value
         self.initialized = False
+        self.updated_at = None
+        self.updated = threading.Event()
     def __str__(self):
         return f"Id={self.id}, value={self.float_value}, name={self.name}"
 
 
 class MobiFlightVariableRequests:
 
-    def __init__(self, simConnect):
+    def __init__(self, simConnect, get_timeout=0.5):
         logging.info("MobiFlightVariableRequests __init__")
         self.sm = simConnect
         self.sim_vars = {}
         self.sim_var_name_to_id = {}
+        self.get_timeout = get_timeout
+        self.register_lock = threading.Lock()
+        self.listeners = []
         self.CLIENT_DATA_AREA_LVARS = 0
         self.CLIENT_DATA_AREA_CMD = 1
         self.CLIENT_DATA_AREA_RESPONSE = 2
@@ -31,10 +47,17 @@ class MobiFlightVariableRequests:
         self.DATA_STRING_SIZE = 256
         self.DATA_STRING_OFFSET = 0
         self.DATA_STRING_DEFINITION_ID = 0
-        self.sm.register_client_data_handler(self.client_data_callback_handler)
+        self.command_buffers = [create_string_buffer(self.DATA_STRING_SIZE) for _ in range(COMMAND_BUFFER_COUNT)]
+        self.command_views = [memoryview(frame).cast("B") for frame in self.command_buffers]
+        self.command_index = itertools.count()
+        self.sm.register_client_data_handler(self.client_data_callback_handler, self.client_data_define_ids())
         self.initialize_client_data_areas()
 
 
+    def client_data_define_ids(self):
+        return range(self.DATA_STRING_DEFINITION_ID, LVARS_AREA_SIZE // sizeof(FLOAT) + 1)
+
+
     def add_to_client_data_definition(self, definition_id, offset, size):
         logging.info("add_to_client_data_definition definition_id=%s, offset=%s, size=%s", definition_id, offset, size)
         self.sm.dll.AddToClientDataDefinition(
@@ -61,7 +84,8 @@ class MobiFlightVariableRequests:
 
 
     def send_data(self, data_area_id, definition_id, size, dataBytes):
-        logging.info("send_data data_area_id=%s, definition_id=%s, size=%s, dataBytes=%s", data_area_id, definition_id, size, dataBytes)
+        if logging.root.isEnabledFor(logging.INFO):
+            logging.info("send_data data_area_id=%s, definition_id=%s, size=%s, dataBytes=%s", data_area_id, definition_id, size, getattr(dataBytes, "value", dataBytes))
         self.sm.dll.SetClientData(
             self.sm.hSimConnect,
             data_area_id,
@@ -73,16 +97,27 @@ class MobiFlightVariableRequests:
 
 
     def send_command(self, command):
-        logging.info("send_command command=%s", command)
-        data_byte_array = bytearray(command, "ascii")
-        data_byte_array.extend(bytearray(self.DATA_STRING_SIZE - len(data_byte_array)))
-        self.send_data(self.CLIENT_DATA_AREA_CMD, self.DATA_STRING_DEFINITION_ID, self.DATA_STRING_SIZE, bytes(data_byte_array))
+        if logging.root.isEnabledFor(logging.INFO):
+            logging.info("send_command command=%s", command)
+        data = command.encode("ascii") if isinstance(command, str) else command
+        size = len(data)
+        if size >= self.DATA_STRING_SIZE:
+            raise ValueError(f"command longer than {self.DATA_STRING_SIZE - 1} bytes")
+        # SetClientData copies the frame before returning; the ring only keeps
+        # concurrent senders (writer, warm-up, request threads) apart. The WASM
+        # module reads the command up to the first NUL, so stale bytes past
+        # the terminator are never seen.
+        slot = next(self.command_index) % COMMAND_BUFFER_COUNT
+        view = self.command_views[slot]
+        view[:size] = data
+        view[size] = 0
+        self.send_data(self.CLIENT_DATA_AREA_CMD, self.DATA_STRING_DEFINITION_ID, self.DATA_STRING_SIZE, self.command_buffers[slot])
 
         
     def initialize_client_data_areas(self):
         logging.info("initialize_client_data_areas")
         self.sm.dll.MapClientDataNameToID(self.sm.hSimConnect, "MobiFlight.LVars".encode("ascii"), self.CLIENT_DATA_AREA_LVARS)
-        self.sm.dll.CreateClientData(self.sm.hSimConnect, self.CLIENT_DATA_AREA_LVARS, 4096, self.FLAG_DEFAULT)
+        self.sm.dll.CreateClientData(self.sm.hSimConnect, self.CLIENT_DATA_AREA_LVARS, LVARS_AREA_SIZE, self.FLAG_DEFAULT)
         self.sm.dll.MapClientDataNameToID(self.sm.hSimConnect, "MobiFlight.Command".encode("ascii"), self.CLIENT_DATA_AREA_CMD)
         self.sm.dll.CreateClientData(self.sm.hSimConnect, self.CLIENT_DATA_AREA_CMD, self.DATA_STRING_SIZE, self.FLAG_DEFAULT)
         self.sm.dll.MapClientDataNameToID(self.sm.hSimConnect, "MobiFlight.Response".encode("ascii"), self.CLIENT_DATA_AREA_RESPONSE)
@@ -97,46 +132,246 @@ class MobiFlightVariableRequests:
             float_data = struct.unpack('<f', data_bytes)[0]
             float_value = round(float_data, 5)
             sim_var = self.sim_vars[client_data.dwDefineID]
-            if not sim_var.initialized and float_value == 0.0:
-                sim_var.initialized = True
-            else:
-                self.sim_vars[client_data.dwDefineID].float_value = float_value
-            logging.debug("client_data_callback_handler %s, raw=%s", sim_var, float_value)
+            if sim_var.initialized or float_value != 0.0:
+                self._store(sim_var, float_value)
+            sim_var.initialized = True
+            if logging.root.isEnabledFor(logging.DEBUG):
+                logging.debug("client_data_callback_handler %s, raw=%s", sim_var, float_value)
         else:
             logging.warning("client_data_callback_handler DefinitionID %s not found!", client_data.dwDefineID)
 
 
-    def get(self, variableString):
-        if variableString not in self.sim_var_name_to_id:
+    def _store(self, sim_var, float_value):
+        sim_var.float_value = float_value
+        sim_var.updated_at = monotonic()
+        sim_var.updated.set()
+        for listener in self.listeners:
+            try:
+                listener(sim_var.name, float_value)
+            except Exception as e:
+                logging.warning("LVar listener failed for %s: %s", sim_var.name, e)
+
+
+    def add_listener(self, listener):
+        if listener not in self.listeners:
+            self.listeners.append(listener)
+
+
+    def register(self, variableString):
+        with self.register_lock:
+            variable_id = self.sim_var_name_to_id.get(variableString)
+            if variable_id is not None:
+                return self.sim_vars[variable_id]
             id = len(self.sim_vars) + 1
-            self.sim_vars[id] = SimVariable(id, variableString)
+            sim_var = SimVariable(id, variableString)
+            self.sim_vars[id] = sim_var
             self.sim_var_name_to_id[variableString] = id
             offset = (id - 1) * sizeof(FLOAT)
             self.add_to_client_data_definition(id, offset, sizeof(FLOAT))
             self.subscribe_to_data_change(self.CLIENT_DATA_AREA_LVARS, id, id)
             self.send_command("MF.SimVars.Add." + variableString)
-        variable_id = self.sim_var_name_to_id[variableString]
-        sim_var = self.sim_vars[variable_id]
-        wait_counter = 0
-        while wait_counter < 50:
-            if sim_var.float_value is None:
-                sleep(0.01)
-                wait_counter = wait_counter + 1
-            else:
-                break
+            return sim_var
+
+
+    def get(self, variableString, timeout=None):
+        started = perf_counter()
+        sim_var = self.register(variableString)
+        if sim_var.float_value is None:
+            sim_var.updated.wait(self.get_timeout if timeout is None else timeout)
         if sim_var.float_value is None and sim_var.initialized:
-            sim_var.float_value = 0.0
-        logging.debug("get %s. wait_counter=%s, Return=%s", variableString, wait_counter, sim_var.float_value)
+            self._store(sim_var, 0.0)
+        if logging.root.isEnabledFor(logging.DEBUG):
+            logging.debug("get %s. Return=%s", variableString, sim_var.float_value)
+        GET_SECONDS.observe(perf_counter() - started)
         return sim_var.float_value
 
 
+    def is_ready(self, variableString):
+        variable_id = self.sim_var_name_to_id.get(variableString)
+        return variable_id is not None and self.sim_vars[variable_id].float_value is not None
+
+
+    def get_cached(self, variableString):
+        variable_id = self.sim_var_name_to_id.get(variableString)
+        if variable_id is None:
+            return None, None
+        sim_var = self.sim_vars[variable_id]
+        if sim_var.updated_at is None:
+            return sim_var.float_value, None
+        return sim_var.float_value, monotonic() - sim_var.updated_at
+
+
     def set(self, variableString):
-        logging.debug("set: %s", variableString)
+        started = perf_counter()
+        if logging.root.isEnabledFor(logging.DEBUG):
+            logging.debug("set: %s", variableString)
         self.send_command("MF.SimVars.Set." + variableString)
+        SET_SECONDS.observe(perf_counter() - started)
+
+
+    def set_many(self, variableStrings):
+        started = perf_counter()
+        prefix = "MF.SimVars.Set."
+        limit = self.DATA_STRING_SIZE - 1 - len(prefix)
+        frames = 0
+        sent = 0
+        packed = []
+        size = 0
+        for expression in variableStrings:
+            if len(expression) > limit:
+                logging.debug("set_many: expression longer than %s characters dropped: %s", limit, expression)
+                continue
+            if packed and size + 1 + len(expression) > limit:
+                if self._send_packed(prefix, packed):
+                    frames += 1
+                    sent += len(packed)
+                packed = []
+            size = size + 1 + len(expression) if packed else len(expression)
+            packed.append(expression)
+        if packed and self._send_packed(prefix, packed):
+            frames += 1
+            sent += len(packed)
+        if logging.root.isEnabledFor(logging.DEBUG):
+            logging.debug("set_many: %s of %s expressions in %s frames", sent, len(variableStrings), frames)
+        SET_MANY_SECONDS.observe(perf_counter() - started)
+        return frames, sent
+
+
+    def _send_packed(self, prefix, packed):
+        # A failed frame only loses its own expressions; the rest of the batch
+        # still goes out in the following frames.
+        try:
+            self.send_command(prefix + " ".join(packed))
+        except Exception as e:
+            logging.debug("set_many: frame of %s expressions failed: %s", len(packed), e)
+            return False
+        return True
             
             
     def clear_sim_variables(self):
         logging.info("clear_sim_variables")
-        self.sim_vars.clear()
-        self.sim_var_name_to_id.clear()
+        with self.register_lock:
+            for sim_var in self.sim_vars.values():
+                sim_var.updated.set()
+            self.sim_vars.clear()
+            self.sim_var_name_to_id.clear()
+        self.send_command("MF.SimVars.Clear")
+
+
+class MobiFlightBulkVariableRequests(MobiFlightVariableRequests):
+
+    def __init__(self, simConnect, get_timeout=0.5):
+        self.capacity = LVARS_AREA_SIZE // sizeof(FLOAT)
+        self.names = []
+        self.values = np.full(self.capacity, np.nan)
+        self.seen = np.zeros(self.capacity, dtype=bool)
+        self.updated_at = np.zeros(self.capacity)
+        self.block_updated = threading.Condition()
+        self.block_updates = 0
+        super().__init__(simConnect, get_timeout)
+
+
+    def client_data_define_ids(self):
+        return (self.DATA_STRING_DEFINITION_ID, LVARS_BLOCK_DEFINITION_ID)
+
+
+    def initialize_client_data_areas(self):
+        super().initialize_client_data_areas()
+        self.add_to_client_data_definition(LVARS_BLOCK_DEFINITION_ID, 0, LVARS_AREA_SIZE)
+        self.subscribe_to_data_change(self.CLIENT_DATA_AREA_LVARS, LVARS_BLOCK_DEFINITION_ID, LVARS_BLOCK_DEFINITION_ID)
+
+
+    def client_data_callback_handler(self, client_data):
+        if client_data.dwDefineID != LVARS_BLOCK_DEFINITION_ID:
+            return
+        count = len(self.names)
+        available = (client_data.dwSize - SIMCONNECT_RECV_CLIENT_DATA.dwData.offset) // sizeof(FLOAT)
+        count = min(count, available)
+        if count <= 0:
+            return
+        raw = (c_char * (count * sizeof(FLOAT))).from_address(addressof(client_data) + SIMCONNECT_RECV_CLIENT_DATA.dwData.offset)
+        block = np.frombuffer(raw, dtype="<f4", count=count).astype(np.float64).round(5)
+        values = self.values[:count]
+        # Same rule as the per-variable path: a variable's first sample of 0
+        # is the area's initial fill, not a value.
+        store = self.seen[:count] | (block != 0.0)
+        changed = np.flatnonzero(store & ((values != block) | np.isnan(values)))
+        self.seen[:count] = True
+        if len(changed):
+            values[changed] = block[changed]
+            self.updated_at[changed] = monotonic()
+            self._notify(changed)
+        with self.block_updated:
+            self.block_updates += 1
+            self.block_updated.notify_all()
+
+
+    def _notify(self, indexes):
+        if not self.listeners:
+            return
+        names = self.names
+        values = self.values
+        for index in indexes.tolist():
+            for listener in self.listeners:
+                try:
+                    listener(names[index], float(values[index]))
+                except Exception as e:
+                    logging.warning("LVar listener failed for %s: %s", names[index], e)
+
+
+    def register(self, variableString):
+        with self.register_lock:
+            variable_id = self.sim_var_name_to_id.get(variableString)
+            if variable_id is not None:
+                return variable_id
+            if len(self.names) >= self.capacity:
+                raise ValueError(f"MobiFlight.LVars holds at most {self.capacity} variables")
+            self.names.append(variableString)
+            variable_id = len(self.names)
+            self.sim_var_name_to_id[variableString] = variable_id
+            self.send_command("MF.SimVars.Add." + variableString)
+            return variable_id
+
+
+    def get(self, variableString, timeout=None):
+        started = perf_counter()
+        index = self.register(variableString) - 1
+        if np.isnan(self.values[index]):
+            deadline = monotonic() + (self.get_timeout if timeout is None else timeout)
+            with self.block_updated:
+                while np.isnan(self.values[index]):
+                    remaining = deadline - monotonic()
+                    if remaining <= 0 or not self.block_updated.wait(remaining):
+                        break
+        if np.isnan(self.values[index]) and self.seen[index]:
+            self.values[index] = 0.0
+            self.updated_at[index] = monotonic()
+            self._notify(np.array([index]))
+        value = self.values[index]
+        GET_SECONDS.observe(perf_counter() - started)
+        return None if np.isnan(value) else float(value)
+
+
+    def is_ready(self, variableString):
+        variable_id = self.sim_var_name_to_id.get(variableString)
+        return variable_id is not None and not np.isnan(self.values[variable_id - 1])
+
+
+    def get_cached(self, variableString):
+        variable_id = self.sim_var_name_to_id.get(variableString)
+        if variable_id is None or np.isnan(self.values[variable_id - 1]):
+            return None, None
+        index = variable_id - 1
+        return float(self.values[index]), monotonic() - float(self.updated_at[index])
+
+
+    def clear_sim_variables(self):
+        logging.info("clear_sim_variables")
+        with self.register_lock:
+            self.names.clear()
+            self.sim_var_name_to_id.clear()
+            self.values.fill(np.nan)
+            self.seen.fill(False)
+        with self.block_updated:
+            self.block_updated.notify_all()
         self.send_command("MF.SimVars.Clear")
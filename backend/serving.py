@@ -0,0 +1,77 @@
+import logging
+import os
+
+try:
+    from cheroot import wsgi
+except ImportError:
+    wsgi = None
+
+CERT_DIR = os.path.join(os.path.expanduser("~"), ".virtual_cockpit")
+CERT_HOST = "virtual-cockpit"
+SERVER_THREADS = 32
+SERVER_QUEUE_SIZE = 64
+SOCKETIO_PATH = "/socket.io/"
+SERVER_TIMEOUT = 30
+
+
+def ensure_certificate(cert_dir=CERT_DIR, host=CERT_HOST):
+    base = os.path.join(cert_dir, "server")
+    certfile, keyfile = base + ".crt", base + ".key"
+    if not (os.path.exists(certfile) and os.path.exists(keyfile)):
+        from werkzeug.serving import make_ssl_devcert
+        os.makedirs(cert_dir, exist_ok=True)
+        make_ssl_devcert(base, host=host)
+        logging.info("Generated TLS certificate %s", certfile)
+    return certfile, keyfile
+
+
+class BorrowedSocket:
+
+    # cheroot still owns the connection and shuts it down when the request
+    # ends, so the websocket must not close it underneath it.
+    def __init__(self, sock):
+        self.sock = sock
+
+    def __getattr__(self, name):
+        return getattr(self.sock, name)
+
+    def close(self):
+        pass
+
+
+if wsgi is not None:
+
+    class WebSocketGateway(wsgi.Gateway_10):
+
+        # simple-websocket takes over the connection socket from the WSGI
+        # environ. cheroot does not publish it, so expose it under the key the
+        # Werkzeug server uses; engine.io then raises ConnectionError once the
+        # websocket closes, and the connection is dropped without a response.
+        def get_environ(self):
+            env = super().get_environ()
+            if env.get("HTTP_UPGRADE", "").lower() == "websocket" and env["PATH_INFO"].startswith(SOCKETIO_PATH):
+                sock = self.req.conn.socket
+                sock.settimeout(None)
+                env["werkzeug.socket"] = BorrowedSocket(sock)
+            return env
+
+        def respond(self):
+            try:
+                super().respond()
+            except ConnectionError:
+                if "werkzeug.socket" not in self.env:
+                    raise
+                self.req.ready = False
+                self.req.chunked_write = False
+                self.req.close_connection = True
+
+
+def make_production_server(app, host, port, threads=SERVER_THREADS, ssl_files=None):
+    if wsgi is None:
+        raise ImportError("cheroot is not installed")
+    server = wsgi.Server((host, port), app, numthreads=threads, request_queue_size=SERVER_QUEUE_SIZE, timeout=SERVER_TIMEOUT)
+    server.gateway = WebSocketGateway
+    if ssl_files:
+        from cheroot.ssl.builtin import BuiltinSSLAdapter
+        server.ssl_adapter = BuiltinSSLAdapter(*ssl_files)
+    return server
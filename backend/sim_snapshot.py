@@ -0,0 +1,138 @@
+import heapq
+import logging
+import threading
+import time
+
+
+class SimSnapshot:
+
+    def __init__(self, aq=None):
+        self.aq = aq
+        self.values = {}
+        self.profiles = {}
+        self.groups = []
+        self.lock = threading.Lock()
+        self.thread = None
+        self.running = False
+        self.started = False
+        self.wake_event = threading.Event()
+        self.stats = {
+            "polls": 0,
+            "poll_errors": 0,
+            "sync_reads": 0,
+            "cache_hits": 0,
+        }
+
+    def activate(self, profile_name, groups):
+        with self.lock:
+            if self.profiles.get(profile_name, []) == groups:
+                return
+            if groups:
+                self.profiles[profile_name] = groups
+            else:
+                self.profiles.pop(profile_name, None)
+            self.groups = self._merge_groups()
+        if self.started:
+            self._spawn()
+        self.wake_event.set()
+
+    def _merge_groups(self):
+        rates = {}
+        for groups in self.profiles.values():
+            for group in groups:
+                for name in group['vars']:
+                    rates[name] = max(rates.get(name, 0), group['hz'])
+        merged = {}
+        for name, hz in rates.items():
+            merged.setdefault(hz, []).append(name)
+        return [(hz, names) for hz, names in sorted(merged.items())]
+
+    def _read(self, name):
+        value = self.aq.get(name)
+        now = time.monotonic()
+        self.values[name] = (value, now)
+        return value, now
+
+    def get(self, name, max_age=None, default=None):
+        cached = self.values.get(name)
+        if cached is not None and (max_age is None or time.monotonic() - cached[1] <= max_age):
+            self.stats["cache_hits"] += 1
+            return cached[0]
+        if self.aq is None:
+            return default if cached is None else cached[0]
+        self.stats["sync_reads"] += 1
+        try:
+            return self._read(name)[0]
+        except Exception as e:
+            logging.debug("sim var %s read failed: %s", name, e)
+            return default if cached is None else cached[0]
+
+    def set(self, name, value):
+        return self.aq.set(name, value)
+
+    def snapshot(self, names=None):
+        now = time.monotonic()
+        values = self.values
+        names = values.keys() if names is None else names
+        result = {}
+        for name in names:
+            cached = values.get(name)
+            if cached is not None:
+                result[name] = {"value": cached[0], "age_ms": round((now - cached[1]) * 1000.0, 1)}
+        return result
+
+    def profile_vars(self, profile_name):
+        return [name for group in self.profiles.get(profile_name, []) for name in group['vars']]
+
+    def start(self):
+        self.started = True
+        self._spawn()
+        return self
+
+    def _spawn(self):
+        # Profiles opt into polling through 'sim_vars'; until one does, only
+        # the synchronous reads in get() touch SimConnect.
+        if self.thread is not None or self.aq is None or not self.groups:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="sim-snapshot", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.started = False
+        self.running = False
+        self.wake_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
+            self.thread = None
+
+    def _poll(self, names):
+        for name in names:
+            try:
+                self._read(name)
+                self.stats["polls"] += 1
+            except Exception as e:
+                self.stats["poll_errors"] += 1
+                logging.debug("sim var %s poll failed: %s", name, e)
+
+    def _run(self):
+        schedule = []
+        groups = None
+        while self.running:
+            if groups is not self.groups:
+                groups = self.groups
+                now = time.monotonic()
+                schedule = [(now, hz, names) for hz, names in groups]
+                heapq.heapify(schedule)
+            if not schedule:
+                self.wake_event.wait()
+                self.wake_event.clear()
+                continue
+            due, hz, names = schedule[0]
+            delay = due - time.monotonic()
+            if delay > 0:
+                if self.wake_event.wait(delay):
+                    self.wake_event.clear()
+                continue
+            self._poll(names)
+            heapq.heapreplace(schedule, (max(due + 1.0 / hz, time.monotonic()), hz, names))
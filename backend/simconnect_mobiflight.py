@@ -3,36 +3,44 @@ import ctypes
 from ctypes import wintypes
 from SimConnect import SimConnect
 from SimConnect.Enum import SIMCONNECT_CLIENT_DATA_ID, SIMCONNECT_RECV_ID, SIMCONNECT_RECV_CLIENT_DATA
+from backend.client_data_pump import ClientDataPump
 
 
 class SimConnectMobiFlight(SimConnect):
 
-    def __init__(self, auto_connect=True, library_path=None):
-        self.client_data_handlers = []
+    def __init__(self, auto_connect=True, library_path=None, pump_hz=None):
+        self.pump = ClientDataPump(pump_hz)
         if library_path:
             super().__init__(auto_connect, library_path)
         else:
             super().__init__(auto_connect)
         self.dll.MapClientDataNameToID.argtypes = [wintypes.HANDLE, ctypes.c_char_p, SIMCONNECT_CLIENT_DATA_ID]
+        self.pump.start()
 
 
-    def register_client_data_handler(self, handler):
-        if not handler in self.client_data_handlers:
-            logging.info("Register new client data handler")
-            self.client_data_handlers.append(handler)
+    @property
+    def client_data_handlers(self):
+        return self.pump.handlers()
+
+
+    def register_client_data_handler(self, handler, define_ids=None):
+        logging.info("Register new client data handler")
+        self.pump.register(handler, define_ids)
 
 
     def unregister_client_data_handler(self, handler):
-        if handler in self.client_data_handlers:
-            logging.info("Unregister client data handler")
-            self.client_data_handlers.remove(handler)
+        logging.info("Unregister client data handler")
+        self.pump.unregister(handler)
 
 
     def my_dispatch_proc(self, pData, cbData, pContext):
         dwID = pData.contents.dwID
         if dwID == SIMCONNECT_RECV_ID.SIMCONNECT_RECV_ID_CLIENT_DATA:
-            client_data = ctypes.cast(pData, ctypes.POINTER(SIMCONNECT_RECV_CLIENT_DATA)).contents
-            for handler in self.client_data_handlers:
-                handler(client_data)
+            if self.pump.thread is not None:
+                # pData is only valid during this callback; the pump thread
+                # works on a copy.
+                self.pump.submit(ctypes.string_at(pData, cbData))
+            else:
+                self.pump.dispatch(ctypes.cast(pData, ctypes.POINTER(SIMCONNECT_RECV_CLIENT_DATA)).contents)
         else:
             super().my_dispatch_proc(pData, cbData, pContext)
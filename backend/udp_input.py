@@ -0,0 +1,137 @@
+import logging
+import secrets
+import socket
+import struct
+import threading
+
+FRAME = struct.Struct("<2sBBBx8sII4f")
+FRAME_MAGIC = b"VC"
+FRAME_VERSION = 2
+TOKEN_BYTES = 8
+FLAG_RESTART = 0x1
+
+COMMAND_TYPES = {
+    1: "throttle",
+    2: "rudder",
+    3: "brakes",
+    4: "spoilers",
+    5: "flaps_axis",
+    6: "flight_controls",
+    7: "vjoy_button",
+    8: "arm_spoilers",
+    9: "idle_command",
+    10: "gear_command",
+    11: "camera",
+}
+
+BUTTON_REVERSE = 0x1
+
+
+def new_token():
+    return secrets.token_bytes(TOKEN_BYTES)
+
+
+def pack_frame(token, command_id, seq, buttons=0, axes=(0.0, 0.0, 0.0, 0.0), restart=False):
+    values = tuple(axes) + (0.0,) * (4 - len(axes))
+    flags = FLAG_RESTART if restart else 0
+    return FRAME.pack(FRAME_MAGIC, FRAME_VERSION, command_id, flags, token, seq & 0xFFFFFFFF, buttons & 0xFFFFFFFF, *values)
+
+
+def frame_to_payloads(command_id, buttons, axes):
+    t = COMMAND_TYPES.get(command_id)
+    if t is None:
+        return []
+    if t == "throttle":
+        return [{"type": t, "value": axes[0], "reverse": bool(buttons & BUTTON_REVERSE)}]
+    if t == "flight_controls":
+        return [{"type": t, "val_x": axes[0], "val_y": axes[1]}]
+    if t == "vjoy_button":
+        return [{"type": t, "button": bit + 1} for bit in range(32) if buttons & (1 << bit)]
+    if t == "camera":
+        return [{"type": t, "cam_id": buttons}]
+    return [{"type": t, "value": axes[0]}]
+
+
+def _is_newer(seq, last):
+    delta = (seq - last) & 0xFFFFFFFF
+    return 0 < delta < 0x80000000
+
+
+class UdpControlListener:
+
+    def __init__(self, apply_command, resolve_profile, host="0.0.0.0", port=5005):
+        self.apply_command = apply_command
+        self.resolve_profile = resolve_profile
+        self.host = host
+        self.port = port
+        self.sock = None
+        self.thread = None
+        self.running = False
+        self.last_seq = {}
+        self.stats = {
+            "received": 0,
+            "applied": 0,
+            "dropped_stale": 0,
+            "dropped_malformed": 0,
+            "dropped_unauthorized": 0,
+        }
+
+    def start(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((self.host, self.port))
+        self.port = self.sock.getsockname()[1]
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="udp-control", daemon=True)
+        self.thread.start()
+        logging.info("UDP control listener on %s:%s", self.host, self.port)
+        return self
+
+    def stop(self):
+        self.running = False
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def accept_sequence(self, token, command_id, seq, restart=False):
+        # Numbering only starts over when the client says so; an idle stream
+        # alone would let a captured frame be replayed later.
+        stream = (token, command_id)
+        last = self.last_seq.get(stream)
+        if last is not None and not restart and not _is_newer(seq, last):
+            return False
+        self.last_seq[stream] = seq
+        return True
+
+    def handle_datagram(self, datagram, addr):
+        self.stats["received"] += 1
+        if len(datagram) != FRAME.size:
+            self.stats["dropped_malformed"] += 1
+            return
+        magic, version, command_id, flags, token, seq, buttons, a0, a1, a2, a3 = FRAME.unpack(datagram)
+        if magic != FRAME_MAGIC or version != FRAME_VERSION:
+            self.stats["dropped_malformed"] += 1
+            return
+        profile_name = self.resolve_profile(token)
+        if profile_name is None:
+            self.stats["dropped_unauthorized"] += 1
+            return
+        if not self.accept_sequence(token, command_id, seq, bool(flags & FLAG_RESTART)):
+            self.stats["dropped_stale"] += 1
+            return
+        for payload in frame_to_payloads(command_id, buttons, (a0, a1, a2, a3)):
+            self.apply_command(payload, profile_name)
+        self.stats["applied"] += 1
+
+    def _run(self):
+        while self.running:
+            try:
+                datagram, addr = self.sock.recvfrom(64)
+            except OSError:
+                if not self.running:
+                    break
+                continue
+            try:
+                self.handle_datagram(datagram, addr)
+            except Exception as e:
+                logging.debug("udp control frame failed: %s", e)
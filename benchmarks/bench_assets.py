@@ -0,0 +1,68 @@
+import os
+import sys
+import time
+
+from fakes import load_app, percentile
+
+REQUESTS = 200
+LINK_KBPS = 2000
+RELOAD = ["/fenix_a320.html", "/static/css/style.css", "/static/js/config.js", "/profiles/fenix_a320.js", "/static/js/main.js"]
+
+
+def legacy_client(app_module):
+    # The pre-cache app: Flask's own static handler, per-request reads and
+    # renders, no compression.
+    app_module.app.view_functions["static"] = app_module.app.send_static_file
+    app_module.assets.get = lambda key, build, mimetype, sources=(): type("Uncached", (), {"build": staticmethod(build), "mimetype": mimetype})
+    app_module.assets.respond = lambda asset, request, status=200: app_module.app.response_class(asset.build(), status=status, mimetype=asset.mimetype)
+
+
+def reload(client, etags=None):
+    sent = 0
+    samples = []
+    for path in RELOAD:
+        headers = {"Accept-Encoding": "gzip, br"}
+        if etags is not None and path in etags:
+            headers["If-None-Match"] = etags[path]
+        t0 = time.perf_counter()
+        response = client.get(path, headers=headers)
+        samples.append(time.perf_counter() - t0)
+        sent += len(response.data)
+        if etags is not None and response.headers.get("ETag"):
+            etags[path] = response.headers["ETag"]
+    return sent, samples
+
+
+def bench(name, app_module):
+    client = app_module.app.test_client()
+    client.post("/session", json={"pin": "1234", "profile": "fenix_a320"})
+    etags = {}
+    cold, _ = reload(client, etags)
+    samples = []
+    warm = 0
+    for _ in range(REQUESTS // len(RELOAD)):
+        warm, batch = reload(client, etags)
+        samples.extend(batch)
+    print("%-7s reload cold=%7d B (%6.1fms @%d kbit/s)  revalidate=%7d B  server p50=%6.1fus p99=%6.1fus" % (
+        name, cold, cold * 8.0 / LINK_KBPS, LINK_KBPS, warm, percentile(samples, 50) * 1e6, percentile(samples, 99) * 1e6))
+
+
+def main():
+    app_module = load_app()
+    app_module.warm_assets()
+    bench("cached", app_module)
+    print("asset stats %s" % app_module.assets.snapshot())
+    main_js = os.path.join(app_module.app.static_folder, "js", "main.js")
+    os.utime(main_js)
+    client = app_module.app.test_client()
+    client.post("/session", json={"pin": "1234", "profile": "fenix_a320"})
+    builds = app_module.assets.stats["builds"]
+    client.get("/static/js/main.js")
+    print("touching main.js rebuilds %d entry" % (app_module.assets.stats["builds"] - builds))
+    legacy_client(app_module)
+    bench("legacy", app_module)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+import sys
+import time
+
+from fakes import install, percentile
+
+install()
+
+from backend.device_output import DeviceWriter
+
+HOLDS = (0.05, 0.1)
+PULSES = 40
+
+
+class TimedDevice:
+
+    def __init__(self):
+        self.pressed_at = {}
+        self.held = []
+
+    def set_axis(self, AxisID, AxisValue):
+        return True
+
+    def set_button(self, buttonID, state):
+        now = time.perf_counter()
+        if state:
+            self.pressed_at[buttonID] = now
+        elif buttonID in self.pressed_at:
+            self.held.append(now - self.pressed_at.pop(buttonID))
+        return True
+
+
+def bench_hold(hold):
+    device = TimedDevice()
+    writer = DeviceWriter({1: device}, rate_hz=200).start()
+    start = time.perf_counter()
+    for i in range(PULSES):
+        writer.pulse(1, 10 + (i % 10), hold)
+        time.sleep(hold / 4)
+    while writer.snapshot()["pulses_active"]:
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - start
+    writer.stop()
+    errors = [abs(held - hold) for held in device.held]
+    print("hold=%3.0fms  pulses=%d  released=%d  err p50=%5.2fms p99=%5.2fms  submit=%.2fs" % (
+        hold * 1000, PULSES, len(device.held), percentile(errors, 50) * 1000,
+        percentile(errors, 99) * 1000, elapsed))
+
+
+def bench_burst():
+    device = TimedDevice()
+    writer = DeviceWriter({1: device}, rate_hz=200).start()
+    t0 = time.perf_counter()
+    for _ in range(20):
+        writer.pulse(1, 12, 0.05)
+    submit = time.perf_counter() - t0
+    time.sleep(0.2)
+    writer.stop()
+    stats = writer.snapshot()
+    print("burst of 20 on one button: presses=%d collapsed=%d submit=%.1fus" % (
+        len(device.held), stats["pulses_collapsed"], submit * 1e6))
+
+
+def main():
+    for hold in HOLDS:
+        bench_hold(hold)
+    bench_burst()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+import ctypes
+import logging
+import struct
+import sys
+import time
+
+from fakes import SIMCONNECT_RECV_CLIENT_DATA, FakeMobiFlightSim, install
+
+install()
+
+from backend.client_data_pump import ClientDataPump
+from backend.mobiflight_variable_requests import MobiFlightVariableRequests
+
+VARIABLES = 200
+MESSAGES = 100000
+STREAM_RATE = 20000
+STREAM_SECONDS = 1.0
+OTHER_CONSUMERS = 3
+
+
+def message(define_id, value):
+    client_data = SIMCONNECT_RECV_CLIENT_DATA()
+    client_data.dwSize = ctypes.sizeof(client_data)
+    client_data.dwDefineID = define_id
+    client_data.dwData[0] = struct.unpack("<I", struct.pack("<f", value))[0]
+    return client_data
+
+
+def consumer(owned):
+    def handler(client_data):
+        if client_data.dwDefineID in owned:
+            return client_data.dwData[0]
+        logging.warning("client_data_callback_handler DefinitionID %s not found!", client_data.dwDefineID)
+    return handler
+
+
+def build():
+    vr = MobiFlightVariableRequests(FakeMobiFlightSim())
+    for i in range(VARIABLES):
+        vr.register("(L:VAR_%d)" % i)
+    others = [(consumer(set(range(5000 + n * 100, 5100 + n * 100))), range(5000 + n * 100, 5100 + n * 100)) for n in range(OTHER_CONSUMERS)]
+    return vr, others
+
+
+def bench_routing():
+    vr, others = build()
+    broadcast = [vr.client_data_callback_handler] + [handler for handler, ids in others]
+    messages = [message(i % VARIABLES + 1, i % 7 + 1) for i in range(MESSAGES)]
+    start = time.perf_counter()
+    for client_data in messages:
+        for handler in broadcast:
+            handler(client_data)
+    legacy = time.perf_counter() - start
+    pump = ClientDataPump()
+    pump.register(vr.client_data_callback_handler, vr.client_data_define_ids())
+    for handler, ids in others:
+        pump.register(handler, ids)
+    start = time.perf_counter()
+    for client_data in messages:
+        pump.dispatch(client_data)
+    routed = time.perf_counter() - start
+    print("broadcast to %d handlers %6.2f us/msg" % (len(broadcast), legacy / MESSAGES * 1e6))
+    print("routed by dwDefineID      %6.2f us/msg" % (routed / MESSAGES * 1e6))
+
+
+def bench_pump(drain_hz):
+    vr, others = build()
+    pump = ClientDataPump(drain_hz)
+    pump.register(vr.client_data_callback_handler, vr.client_data_define_ids())
+    pump.start()
+    frames = [bytes(message(i % VARIABLES + 1, i % 7 + 1)) for i in range(VARIABLES)]
+    interval = 1.0 / STREAM_RATE
+    sent = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < STREAM_SECONDS:
+        target = int((time.perf_counter() - start) / interval)
+        while sent < target:
+            pump.submit(frames[sent % VARIABLES])
+            sent += 1
+        time.sleep(0.0005)
+    time.sleep(2.0 / drain_hz)
+    pump.stop()
+    stats = pump.snapshot()
+    handler = stats["handlers"]["MobiFlightVariableRequests.client_data_callback_handler"]
+    print("pump %4d Hz  %6d msgs  batches=%5d batch_max=%4d lag_max=%6.2fms handler avg=%5.2fus" % (
+        drain_hz, stats["dispatched"], stats["batches"], stats["batch_max"], stats["lag_max_ms"], handler["avg_us"]))
+
+
+def main():
+    logging.basicConfig(level=logging.WARNING, handlers=[logging.NullHandler()])
+    bench_routing()
+    for drain_hz in (100, 250, 1000):
+        bench_pump(drain_hz)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
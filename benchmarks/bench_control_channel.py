@@ -0,0 +1,53 @@
+import sys
+import time
+
+from fakes import load_app, percentile
+
+MESSAGES = 5000
+
+
+def _payload(i):
+    return {"type": "throttle" if i % 2 else "rudder", "value": (i % 1000) / 1000.0, "reverse": False}
+
+
+def bench_post(app_module, client):
+    samples = []
+    start = time.perf_counter()
+    for i in range(MESSAGES):
+        t0 = time.perf_counter()
+        client.post("/update_sim", json=_payload(i))
+        samples.append(time.perf_counter() - t0)
+    return time.perf_counter() - start, samples
+
+
+def bench_socket(app_module, client):
+    sio = app_module.socketio.test_client(app_module.app, flask_test_client=client)
+    if not sio.is_connected():
+        raise RuntimeError("socket connect rejected")
+    samples = []
+    start = time.perf_counter()
+    for i in range(MESSAGES):
+        t0 = time.perf_counter()
+        sio.emit("control", _payload(i))
+        samples.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - start
+    sio.disconnect()
+    return elapsed, samples
+
+
+def _report(name, elapsed, samples):
+    print("%-8s %8.0f msg/s  p50=%7.1fus  p99=%7.1fus" % (
+        name, len(samples) / elapsed, percentile(samples, 50) * 1e6, percentile(samples, 99) * 1e6))
+
+
+def main():
+    app_module = load_app()
+    client = app_module.app.test_client()
+    client.post("/session", json={"pin": app_module.PIN, "profile": "fenix_a320"})
+    _report("post", *bench_post(app_module, client))
+    _report("socket", *bench_socket(app_module, client))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
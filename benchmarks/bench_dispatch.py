@@ -0,0 +1,103 @@
+import sys
+import time
+
+from fakes import install
+
+install()
+
+import pyvjoy
+from profiles import PROFILES, get_profile
+from backend.command_table import CommandContext, compile_profiles
+
+ITERATIONS = 200000
+PAYLOADS = [
+    {"type": "throttle", "value": 0.42, "reverse": False},
+    {"type": "rudder", "value": 0.51},
+    {"type": "spoilers", "value": 0.3},
+    {"type": "flaps_axis", "value": 0.5},
+    {"type": "flight_controls", "val_x": 0.4, "val_y": 0.6},
+    {"type": "vjoy_button", "button": 5},
+]
+
+
+class NullDevice:
+
+    def set_axis(self, AxisID, AxisValue):
+        return True
+
+    def set_button(self, buttonID, state):
+        return True
+
+    def pulse_button(self, buttonID, hold):
+        return True
+
+
+def legacy_chain(data, profile_name, vjoy_1):
+    t = data.get('type')
+    val = float(data.get('value', 0))
+    rev = data.get('reverse', False)
+    profile = get_profile(profile_name)
+    handler = profile.get('handlers', {}).get(t)
+    if handler:
+        return handler(data, vjoy_1, None, 0, None)
+    if t == 'throttle':
+        vjoy_1.set_button(2, 1 if rev else 0)
+        vjoy_1.set_axis(pyvjoy.HID_USAGE_Z, int(val * 32767))
+    elif t == 'rudder':
+        vjoy_1.set_axis(pyvjoy.HID_USAGE_RX, int(val * 32767))
+    elif t == 'brakes':
+        vjoy_1.set_axis(pyvjoy.HID_USAGE_X, int(val * 32767))
+    elif t == 'spoilers':
+        f = profile['backend']['spoiler_formula'](val)
+        vjoy_1.set_axis(pyvjoy.HID_USAGE_Y, int(f * 32767))
+    elif t == 'arm_spoilers':
+        vjoy_1.set_axis(pyvjoy.HID_USAGE_Y, int(profile['backend']['arm_spoiler_value'] * 32767))
+    elif t == 'flaps_axis':
+        mapped_val = profile['backend']['flap_axis_mapping'](val)
+        vjoy_1.set_axis(pyvjoy.HID_USAGE_SL0, int(mapped_val))
+    elif t == 'flap_command':
+        vjoy_1.pulse_button(20 if val == 0 else 21, 0.1)
+    elif t == 'camera':
+        vjoy_1.pulse_button(9 + int(data.get('cam_id')), 0.05)
+    elif t == 'flight_controls':
+        vjoy_1.set_axis(pyvjoy.HID_USAGE_RZ, int(float(data.get('val_x', 0.5)) * 32767))
+        vjoy_1.set_axis(pyvjoy.HID_USAGE_RY, int(float(data.get('val_y', 0.5)) * 32767))
+    elif t == 'gear_command':
+        vjoy_1.pulse_button(4, 0.1)
+    elif t == 'idle_command':
+        vjoy_1.set_axis(pyvjoy.HID_USAGE_Z, 0)
+        vjoy_1.pulse_button(3, 0.1)
+    elif t == 'vjoy_button':
+        btn = int(data.get('button', 0))
+        if btn > 0:
+            vjoy_1.pulse_button(btn, 0.05)
+
+
+def bench_legacy(device):
+    start = time.perf_counter()
+    for i in range(ITERATIONS):
+        legacy_chain(PAYLOADS[i % len(PAYLOADS)], "fenix_a320", device)
+    return time.perf_counter() - start
+
+
+def bench_table(device):
+    tables = compile_profiles(PROFILES, CommandContext())
+    start = time.perf_counter()
+    for i in range(ITERATIONS):
+        data = PAYLOADS[i % len(PAYLOADS)]
+        command = tables.get("fenix_a320").get(data.get("type"))
+        command(data, device, device)
+    return time.perf_counter() - start
+
+
+def main():
+    device = NullDevice()
+    legacy = bench_legacy(device)
+    table = bench_table(device)
+    print("if/elif chain  %6.2f us/command" % (legacy / ITERATIONS * 1e6))
+    print("dispatch table %6.2f us/command  (%.2fx)" % (table / ITERATIONS * 1e6, legacy / table))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+import json
+import sys
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from fakes import install
+
+install()
+
+from backend.flight_data import FlightDataService
+
+UPSTREAM_LATENCY = 0.05
+CONCURRENT = 10
+PDF_SIZE = 2 * 1024 * 1024
+
+
+def ofp(host, plan):
+    return {
+        "params": {"request_id": str(plan), "time_generated": str(1760790000 + plan)},
+        "files": {"directory": "http://%s/ofp/flightplans/" % host, "pdf": {"link": "EGLLLFPG_%d.pdf" % plan}},
+        "origin": {"icao_code": "EGLL"},
+        "destination": {"icao_code": "LFPG"},
+    }
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    requests = []
+    lock = threading.Lock()
+    plan = 1
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        with self.lock:
+            self.requests.append(parts.path)
+        time.sleep(UPSTREAM_LATENCY)
+        content_type = "application/json"
+        if parts.path == "/metar":
+            ids = parse_qs(parts.query).get("ids", [""])[0].split(",")
+            body = [{"icaoId": icao, "rawOb": "METAR %s 181250Z 24008KT 9999 FEW030 12/06 Q1021" % icao} for icao in ids]
+            payload = json.dumps(body).encode("utf-8")
+        elif parts.path.startswith("/ofp/flightplans/"):
+            content_type = "application/pdf"
+            payload = b"%PDF-1.4\n" + parts.path.encode("utf-8").ljust(PDF_SIZE - 9, b" ")
+        else:
+            payload = json.dumps(ofp(self.headers["Host"], self.plan)).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+def legacy_ofp(base):
+    with urllib.request.urlopen(base + "/simbrief", timeout=10) as response:
+        data = json.loads(response.read().decode("utf-8"))
+    metars = {}
+    for key, icao in (("origin", data["origin"]["icao_code"]), ("destination", data["destination"]["icao_code"])):
+        with urllib.request.urlopen(base + "/metar?ids=%s" % icao, timeout=5) as response:
+            metar_data = json.loads(response.read().decode("utf-8"))
+            metars[key] = metar_data[0].get("rawOb", "")
+    return metars
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    fn()
+    return time.perf_counter() - t0
+
+
+def concurrent(fn):
+    threads = [threading.Thread(target=fn) for _ in range(CONCURRENT)]
+    t0 = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - t0
+
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = "http://127.0.0.1:%d" % server.server_port
+    requests = StandInHandler.requests
+
+    del requests[:]
+    cold = timed(lambda: legacy_ofp(base))
+    burst = concurrent(lambda: legacy_ofp(base))
+    print("legacy   cold=%6.1fms  %d concurrent=%6.1fms  upstream requests=%d" % (
+        cold * 1e3, CONCURRENT, burst * 1e3, len(requests)))
+
+    service = FlightDataService(simbrief_url=base + "/simbrief", metar_url=base + "/metar?ids={ids}")
+    del requests[:]
+    cold = timed(service.ofp)
+    warm = timed(service.ofp)
+    service.cache.values.clear()
+    burst = concurrent(service.ofp)
+    refresh = timed(lambda: service.ofp(refresh=True))
+    print("service  cold=%6.1fms  warm=%6.3fms  %d concurrent=%6.1fms  refresh=%6.1fms  upstream requests=%d" % (
+        cold * 1e3, warm * 1e3, CONCURRENT, burst * 1e3, refresh * 1e3, len(requests)))
+    print("service stats %s" % service.snapshot())
+    assert service.ofp()["metars"]["destination"].startswith("METAR LFPG")
+    server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
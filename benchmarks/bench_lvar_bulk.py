@@ -0,0 +1,69 @@
+import struct
+import sys
+import time
+import tracemalloc
+
+from fakes import BULK_DEFINITION_ID, SIMCONNECT_RECV_CLIENT_DATA, FakeMobiFlightSim, client_data_block, install
+
+install()
+
+from backend.mobiflight_variable_requests import MobiFlightBulkVariableRequests, MobiFlightVariableRequests
+
+SIZES = (100, 500, 1000)
+FRAMES = 50
+
+
+def build(cls, count, bulk):
+    sim = FakeMobiFlightSim(bulk=bulk)
+    tracemalloc.start()
+    vr = cls(sim)
+    handlers, sim.client_data_handlers = sim.client_data_handlers, []
+    for i in range(count):
+        vr.register("(L:VAR_%d)" % i)
+    snapshot = tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(True, "*mobiflight_variable_requests.py")])
+    memory = sum(stat.size for stat in snapshot.statistics("filename"))
+    tracemalloc.stop()
+    sim.client_data_handlers = handlers
+    return vr, memory
+
+
+def per_var_frames(count):
+    frames = []
+    for frame in range(FRAMES):
+        messages = []
+        for i in range(count):
+            client_data = SIMCONNECT_RECV_CLIENT_DATA()
+            client_data.dwDefineID = i + 1
+            client_data.dwData[0] = struct.unpack("<I", struct.pack("<f", frame + i * 0.5 + 1))[0]
+            messages.append(client_data)
+        frames.append(messages)
+    return frames
+
+
+def bulk_frames(count):
+    return [[client_data_block(BULK_DEFINITION_ID, [frame + i * 0.5 + 1 for i in range(count)])] for frame in range(FRAMES)]
+
+
+def bench(cls, count, bulk):
+    vr, memory = build(cls, count, bulk)
+    frames = bulk_frames(count) if bulk else per_var_frames(count)
+    start = time.perf_counter()
+    for messages in frames:
+        for client_data in messages:
+            vr.client_data_callback_handler(client_data)
+    elapsed = time.perf_counter() - start
+    assert vr.get_cached("(L:VAR_%d)" % (count - 1))[0] == FRAMES - 1 + (count - 1) * 0.5 + 1
+    return count * FRAMES / elapsed, len(frames[0]), memory
+
+
+def main():
+    for count in SIZES:
+        for name, cls, bulk in (("per-var", MobiFlightVariableRequests, False), ("bulk", MobiFlightBulkVariableRequests, True)):
+            rate, messages, memory = bench(cls, count, bulk)
+            print("%4d vars %-7s %10.0f values/s  %4d msgs/update  %7.1f KiB store" % (
+                count, name, rate, messages, memory / 1024.0))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
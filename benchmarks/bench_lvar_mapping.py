@@ -0,0 +1,65 @@
+import json
+import os
+import sys
+import time
+
+from fakes import install
+
+install()
+
+import backend.fsuipc_wapi_reader as reader
+
+ITERATIONS = 20000
+KEYS = ["ap_engage", "ap_state_off", "ap_disconnect", "parking_brake"]
+
+
+class NullVariableRequests:
+
+    def set(self, cmd):
+        return None
+
+    def get(self, expr):
+        return 0.0
+
+
+def legacy_write(profile_name, key, value, vr):
+    with open(reader.MAPPING_PATH, "r") as handle:
+        data = json.load(handle)
+    vars_list = data.get("profiles", {}).get(profile_name, {}).get("vars", [])
+    lvar = None
+    for item in vars_list:
+        if item.get("key") == key:
+            lvar = item.get("lvar")
+            break
+    if not lvar:
+        return {"error": "unknown_key"}
+    target = lvar if lvar.startswith("L:") else f"L:{lvar}"
+    vr.set(f"{value} (>{target})")
+    return {"status": "ok"}
+
+
+def bench(write):
+    start = time.perf_counter()
+    for i in range(ITERATIONS):
+        write("fenix_a320", KEYS[i % len(KEYS)], i & 1)
+    return time.perf_counter() - start
+
+
+def main():
+    vr = NullVariableRequests()
+    reader._mf = object()
+    reader._vr = vr
+    uncached = bench(lambda profile, key, value: legacy_write(profile, key, value, vr))
+    cached = bench(reader.write_lvar_value)
+    mtime = os.stat(reader.MAPPING_PATH).st_mtime_ns
+    os.utime(reader.MAPPING_PATH, ns=(mtime, mtime + 1))
+    reloaded = reader.write_lvar_value("fenix_a320", "ap_engage", 1)
+    os.utime(reader.MAPPING_PATH, ns=(mtime, mtime))
+    print("uncached write %7.2f us/call" % (uncached / ITERATIONS * 1e6))
+    print("cached write   %7.2f us/call  (%.1fx)" % (cached / ITERATIONS * 1e6, uncached / cached))
+    print("reload after mtime change: %s" % reloaded)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,57 @@
+import sys
+import time
+
+from fakes import FakeMobiFlightSim, install, percentile
+
+install()
+
+from backend.mobiflight_variable_requests import MobiFlightVariableRequests
+
+VARIABLES = 60
+LATENCIES = (0.002, 0.005, 0.013)
+
+
+class PollingVariableRequests(MobiFlightVariableRequests):
+
+    def get(self, variableString, timeout=None):
+        sim_var = self.register(variableString)
+        wait_counter = 0
+        while wait_counter < 50:
+            if sim_var.float_value is None:
+                time.sleep(0.01)
+                wait_counter = wait_counter + 1
+            else:
+                break
+        if sim_var.float_value is None and sim_var.initialized:
+            self._store(sim_var, 0.0)
+        return sim_var.float_value
+
+
+def bench(cls):
+    lags = []
+    for i in range(VARIABLES):
+        latency = LATENCIES[i % len(LATENCIES)]
+        vr = cls(FakeMobiFlightSim(latency=latency))
+        t0 = time.perf_counter()
+        value = vr.get("(L:VAR_%d)" % i)
+        elapsed = time.perf_counter() - t0
+        if value is not None:
+            lags.append(elapsed - latency)
+    return lags
+
+
+def main():
+    for name, cls in (("sleep poll", PollingVariableRequests), ("event", MobiFlightVariableRequests)):
+        lags = bench(cls)
+        print("%-10s wake-up lag p50=%6.2fms p99=%6.2fms max=%6.2fms  (%d/%d values)" % (
+            name, percentile(lags, 50) * 1e3, percentile(lags, 99) * 1e3,
+            max(lags) * 1e3, len(lags), VARIABLES))
+    vr = MobiFlightVariableRequests(FakeMobiFlightSim())
+    vr.get("(L:S_FCU_AP1)")
+    value, age = vr.get_cached("(L:S_FCU_AP1)")
+    print("get_cached -> value=%s age=%.3fms" % (value, age * 1e3))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+import sys
+import time
+
+from fakes import FakeMobiFlightSim, install, percentile
+
+install()
+
+import backend.fsuipc_wapi_reader as reader
+
+REQUESTS = 400
+BURST = 20
+ACTION = [
+    ("set", "parking_brake", 0),
+    ("set", "brake_left", 0.25),
+    ("set", "spoilers_handle", 2),
+    ("step", "flaps_handle", 1),
+    ("step", "throttle_left", 1),
+    ("step", "ap_engage", 1),
+]
+
+
+def setup(latency):
+    sim = FakeMobiFlightSim(latency=latency)
+    reader.SimConnectMobiFlight = lambda **kwargs: sim
+    reader._mf = None
+    reader._vr = None
+    reader._get_mf()
+    return sim
+
+
+def legacy_action(vr, targets):
+    reads = 0
+    for kind, key, value in ACTION:
+        target = targets[key]
+        if kind == "step" and target.is_expression:
+            vr.set(target.lvar)
+            vr.send_command(target.lvar)
+        elif kind == "step":
+            current = vr.get(target.expr)
+            reads += 1
+            cmd = target.set_command(float(current) + value)
+            vr.set(cmd)
+            vr.send_command(cmd)
+        else:
+            vr.set(target.set_command(value))
+    return reads
+
+
+def bench_action():
+    targets = reader._get_mapping("fenix_a320")
+    sim = setup(0.0)
+    before = len(sim.commands)
+    reads = legacy_action(reader._vr, targets)
+    legacy_frames = len(sim.commands) - before
+    sim = setup(0.0)
+    before = len(sim.commands)
+    for kind, key, value in ACTION:
+        (reader.queue_lvar_step if kind == "step" else reader.queue_lvar_write)("fenix_a320", key, value)
+    reader.lvar_writer.flush()
+    print("action (%d intents): legacy %d SetClientData + %d Python reads, packed %d SetClientData + 0 reads" % (
+        len(ACTION), legacy_frames, reads, len(sim.commands) - before))
+
+
+def bench_route():
+    sim = setup(0.002)
+    samples = []
+    for i in range(REQUESTS):
+        t0 = time.perf_counter()
+        reader.queue_lvar_step("fenix_a320", "flaps_handle", 1 if i % 2 else -1)
+        samples.append(time.perf_counter() - t0)
+    reader.lvar_writer.flush()
+    print("queued step route p50=%6.1fus max=%7.1fus" % (percentile(samples, 50) * 1e6, max(samples) * 1e6))
+
+
+def bench_burst():
+    sim = setup(0.0)
+    before = len(sim.commands)
+    for i in range(BURST):
+        reader.queue_lvar_step("fenix_a320", "flaps_handle", 1)
+        reader.queue_lvar_write("fenix_a320", "parking_brake", i % 2)
+    time.sleep(reader.LVAR_WRITE_WINDOW * 5)
+    stats = reader.lvar_writer.snapshot()
+    print("burst  %d intents -> %d SetClientData  coalescing_ratio=%.2f skipped_unchanged=%d" % (
+        BURST * 2, len(sim.commands) - before, stats["coalescing_ratio"], stats["skipped_unchanged"]))
+
+
+def main():
+    bench_action()
+    bench_route()
+    bench_burst()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
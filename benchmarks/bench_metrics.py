@@ -0,0 +1,110 @@
+import sys
+import time
+
+from fakes import install, load_app, percentile
+
+install()
+
+import backend.command_table as command_table
+import backend.device_output as device_output
+from backend.metrics import COMMAND_SECONDS, metrics
+
+OBSERVATIONS = 200000
+REQUESTS = 3000
+ROUNDS = 3
+
+
+class NullChild:
+
+    def observe(self, seconds):
+        pass
+
+    def inc(self, amount=1):
+        pass
+
+
+class NullFamily:
+
+    def labels(self, *values):
+        return NULL_CHILD
+
+
+NULL_CHILD = NullChild()
+
+
+def observation_count():
+    return sum(child.count for family in metrics.families.values() if family.kind == "histogram" for child in family.children.values())
+
+
+def bench_primitive():
+    child = COMMAND_SECONDS.labels("throttle")
+    start = time.perf_counter()
+    for _ in range(OBSERVATIONS):
+        started = time.perf_counter()
+        child.observe(time.perf_counter() - started)
+    observe = (time.perf_counter() - start) / OBSERVATIONS
+    start = time.perf_counter()
+    for _ in range(OBSERVATIONS):
+        started = time.perf_counter()
+        COMMAND_SECONDS.labels("throttle").observe(time.perf_counter() - started)
+    labelled = (time.perf_counter() - start) / OBSERVATIONS
+    print("timer + observe %6.0f ns   timer + labels().observe %6.0f ns" % (observe * 1e9, labelled * 1e9))
+    return labelled
+
+
+def set_enabled(app_module, enabled, saved):
+    if enabled:
+        for module, name in saved:
+            setattr(module, name, saved[(module, name)])
+        return
+    for module, name in saved:
+        setattr(module, name, NULL_CHILD if name.startswith("VJOY_") else NullFamily())
+
+
+def run(client):
+    samples = []
+    for i in range(REQUESTS):
+        t0 = time.perf_counter()
+        client.post("/update_sim", json={"type": "throttle" if i % 2 else "rudder", "value": (i % 1000) / 1000.0})
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+
+def main():
+    cost = bench_primitive()
+    app_module = load_app()
+    client = app_module.app.test_client()
+    client.post("/session", json={"pin": app_module.PIN, "profile": "fenix_a320"})
+    names = [
+        (app_module, "REQUEST_SECONDS"),
+        (command_table, "COMMAND_SECONDS"),
+        (command_table, "COMMAND_ERRORS"),
+        (device_output, "VJOY_UPDATE_SECONDS"),
+        (device_output, "VJOY_SET_AXIS_SECONDS"),
+        (device_output, "VJOY_SET_BUTTON_SECONDS"),
+    ]
+    saved = {(module, name): getattr(module, name) for module, name in names}
+    results = {True: [], False: []}
+    before = observation_count()
+    run(client)
+    per_request = (observation_count() - before) / float(REQUESTS)
+    for round_index in range(ROUNDS * 2):
+        for enabled in ((False, True) if round_index % 2 else (True, False)):
+            set_enabled(app_module, enabled, saved)
+            results[enabled].extend(run(client))
+    for enabled in (False, True):
+        samples = results[enabled]
+        print("/update_sim metrics %-3s p50=%7.1fus p99=%7.1fus" % (
+            "on" if enabled else "off", percentile(samples, 50) * 1e6, percentile(samples, 99) * 1e6))
+    delta = percentile(results[True], 50) - percentile(results[False], 50)
+    print("p50 difference %+.1fus (%+.2f%%, includes run-to-run noise)" % (delta * 1e6, delta / percentile(results[False], 50) * 100))
+    print("%.1f observations/request x %.0f ns = %.1fus instrumentation per request (%.2f%% of p50)" % (
+        per_request, cost * 1e9, per_request * cost * 1e6, per_request * cost / percentile(results[False], 50) * 100))
+    start = time.perf_counter()
+    body = metrics.render()
+    print("render %d series lines in %.2fms" % (body.count("\n"), (time.perf_counter() - start) * 1e3))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+import logging
+import sys
+import time
+import tracemalloc
+
+from fakes import install
+
+install()
+
+from backend.mobiflight_variable_requests import MobiFlightVariableRequests
+
+COMMANDS = 200000
+TRACED = 2000
+COMMAND = "MF.SimVars.Set.1 (>L:S_FC_CAPT_INST_DISCONNECT)"
+
+
+class CountingDll:
+
+    def __init__(self):
+        self.frames = 0
+
+    def SetClientData(self, hSimConnect, area_id, definition_id, flags, reserved, size, data):
+        self.frames += 1
+        return 0
+
+    def __getattr__(self, name):
+        return lambda *args: 0
+
+
+class CountingSim:
+
+    def __init__(self):
+        self.hSimConnect = None
+        self.dll = CountingDll()
+
+    def register_client_data_handler(self, handler, define_ids=None):
+        pass
+
+
+class LegacyVariableRequests(MobiFlightVariableRequests):
+
+    def send_data(self, data_area_id, definition_id, size, dataBytes):
+        logging.info("send_data data_area_id=%s, definition_id=%s, size=%s, dataBytes=%s", data_area_id, definition_id, size, dataBytes)
+        self.sm.dll.SetClientData(self.sm.hSimConnect, data_area_id, definition_id, self.FLAG_DEFAULT, 0, size, dataBytes)
+
+    def send_command(self, command):
+        logging.info("send_command command=%s", command)
+        data_byte_array = bytearray(command, "ascii")
+        data_byte_array.extend(bytearray(self.DATA_STRING_SIZE - len(data_byte_array)))
+        self.send_data(self.CLIENT_DATA_AREA_CMD, self.DATA_STRING_DEFINITION_ID, self.DATA_STRING_SIZE, bytes(data_byte_array))
+
+
+def bench(cls):
+    vr = cls(CountingSim())
+    start = time.perf_counter()
+    for _ in range(COMMANDS):
+        vr.send_command(COMMAND)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    transient = 0
+    for _ in range(TRACED):
+        tracemalloc.reset_peak()
+        current = tracemalloc.get_traced_memory()[0]
+        vr.send_command(COMMAND)
+        transient += tracemalloc.get_traced_memory()[1] - current
+    tracemalloc.stop()
+    return COMMANDS / elapsed, transient / TRACED
+
+
+def main():
+    logging.basicConfig(level=logging.WARNING)
+    for name, cls in (("legacy", LegacyVariableRequests), ("ring", MobiFlightVariableRequests)):
+        rate, transient = bench(cls)
+        print("%-6s %9.0f commands/s  %6.0f bytes allocated/command" % (name, rate, transient))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,70 @@
+import http.client
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+from fakes import http_session, load_app, serve_app
+
+from bench_flight_data import PDF_SIZE, StandInHandler
+
+OPENS = 5
+RANGE_BYTES = 64 * 1024
+
+
+def fetch(conn, headers, path, extra=None):
+    t0 = time.perf_counter()
+    conn.request("GET", path, headers=dict(headers, **(extra or {})))
+    response = conn.getresponse()
+    body = response.read()
+    return response, body, time.perf_counter() - t0
+
+
+def main():
+    upstream = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    threading.Thread(target=upstream.serve_forever, daemon=True).start()
+    base = "http://127.0.0.1:%d" % upstream.server_port
+
+    app_module = load_app()
+    app_module.flight_data.simbrief_url = base + "/simbrief"
+    app_module.flight_data.metar_url = base + "/metar?ids={ids}"
+    app_module.ofp_pdfs.directory = tempfile.mkdtemp(prefix="ofp_bench_")
+    server = serve_app(app_module)
+    conn, headers = http_session(server)
+
+    pdf_url = app_module.flight_data.ofp()["pdf_url"]
+    t0 = time.perf_counter()
+    for _ in range(OPENS):
+        with urllib.request.urlopen(pdf_url) as response:
+            response.read()
+    legacy = time.perf_counter() - t0
+    print("legacy  %d opens from upstream  %7.1fms  %6.1f MB transferred" % (OPENS, legacy * 1e3, OPENS * PDF_SIZE / 1e6))
+
+    response, body, cold = fetch(conn, headers, "/ofp/pdf")
+    etag = response.getheader("ETag")
+    print("local   cold open   status=%d %7.1fms  %6.1f MB  etag=%s" % (response.status, cold * 1e3, len(body) / 1e6, etag))
+    total = 0.0
+    for _ in range(OPENS - 1):
+        response, body, elapsed = fetch(conn, headers, "/ofp/pdf", {"If-None-Match": etag})
+        total += elapsed
+    print("local   %d reopens  status=%d %7.1fms  %6d B" % (OPENS - 1, response.status, total * 1e3, len(body)))
+    response, body, elapsed = fetch(conn, headers, "/ofp/pdf", {"Range": "bytes=0-%d" % (RANGE_BYTES - 1)})
+    print("local   first page  status=%d %7.1fms  %6d B  %s" % (response.status, elapsed * 1e3, len(body), response.getheader("Content-Range")))
+
+    app_module.ofp_pdfs.refresh_interval = 0.2
+    app_module.ofp_pdfs.start()
+    StandInHandler.plan = 2
+    time.sleep(1.0)
+    app_module.ofp_pdfs.stop()
+    response, body, elapsed = fetch(conn, headers, "/ofp/pdf", {"If-None-Match": etag})
+    print("new plan after refresh  status=%d %7.1fms  etag=%s" % (response.status, elapsed * 1e3, response.getheader("ETag")))
+    print("pdf stats %s" % app_module.ofp_pdfs.stats)
+    server.shutdown()
+    upstream.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
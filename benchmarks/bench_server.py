@@ -0,0 +1,100 @@
+import json
+import sys
+import threading
+import time
+
+import simple_websocket
+from fakes import http_session, load_app, percentile, serve_app
+
+CLIENTS = (1, 8)
+SECONDS = 3.0
+THREADS = 32
+
+
+def client_loop(server, deadline, samples):
+    conn, headers = http_session(server)
+    i = 0
+    while time.perf_counter() < deadline:
+        body = json.dumps({"type": "throttle" if i % 2 else "rudder", "value": (i % 1000) / 1000.0, "reverse": False})
+        t0 = time.perf_counter()
+        conn.request("POST", "/update_sim", body, headers)
+        conn.getresponse().read()
+        samples.append(time.perf_counter() - t0)
+        i += 1
+    conn.close()
+
+
+def socket_loop(server, deadline, samples):
+    # Engine.IO v4 over a websocket, asking for an ack on every control event
+    # so each sample is a full round trip like the HTTP one.
+    ws = simple_websocket.Client.connect("ws://%s:%d/socket.io/?EIO=4&transport=websocket" % (server.host, server.port))
+    ws.receive(5)
+    ws.send("40" + json.dumps({"pin": "1234", "profile": "fenix_a320"}))
+    ws.receive(5)
+    i = 0
+    while time.perf_counter() < deadline:
+        payload = {"type": "throttle" if i % 2 else "rudder", "value": (i % 1000) / 1000.0, "reverse": False}
+        ack = "43%d" % i
+        t0 = time.perf_counter()
+        ws.send("42%d%s" % (i, json.dumps(["control", payload])))
+        while True:
+            message = ws.receive(5)
+            if message == "2":
+                ws.send("3")
+            elif message is None or message.startswith(ack):
+                break
+        samples.append(time.perf_counter() - t0)
+        i += 1
+    ws.close()
+
+
+def load(name, server, clients, loop=client_loop):
+    results = [[] for _ in range(clients)]
+    deadline = time.perf_counter() + SECONDS
+    threads = [threading.Thread(target=loop, args=(server, deadline, results[n])) for n in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    samples = [sample for result in results for sample in result]
+    print("%-10s %d clients  %8.0f req/s  p50=%7.1fus  p99=%7.1fus  max=%7.1fus" % (
+        name, clients, len(samples) / elapsed, percentile(samples, 50) * 1e6, percentile(samples, 99) * 1e6, max(samples) * 1e6))
+
+
+class ServerAddress:
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+
+
+def main():
+    app_module = load_app()
+    app_module.warm_assets()
+    dev = serve_app(app_module)
+    for clients in CLIENTS:
+        load("dev", dev, clients)
+    for clients in CLIENTS:
+        load("dev ws", dev, clients, socket_loop)
+    dev.shutdown()
+    try:
+        server = app_module.make_production_server(app_module.app, "127.0.0.1", 0, threads=THREADS)
+    except ImportError:
+        print("production skipped: cheroot is not installed")
+        return 0
+    server.prepare()
+    thread = threading.Thread(target=server.serve, daemon=True)
+    thread.start()
+    address = ServerAddress(*server.bind_addr[:2])
+    for clients in CLIENTS:
+        load("production", address, clients)
+    for clients in CLIENTS:
+        load("prod ws", address, clients, socket_loop)
+    server.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,56 @@
+import sys
+import time
+
+from fakes import install, percentile
+
+install()
+
+from backend.sim_snapshot import SimSnapshot
+
+REQUESTS = 200
+SIM_LATENCY = 0.002
+HANDLER_VARS = ("GEAR_HANDLE_POSITION", "AUTOPILOT_MASTER", "SIM_ON_GROUND")
+SIM_VARS = [{"hz": 5, "vars": list(HANDLER_VARS)}]
+
+
+class SlowAircraftRequests:
+
+    def __init__(self):
+        self.reads = 0
+
+    def get(self, name):
+        self.reads += 1
+        time.sleep(SIM_LATENCY)
+        return 1.0
+
+    def set(self, name, value):
+        return True
+
+
+def bench(name, aq, read):
+    samples = []
+    for _ in range(REQUESTS):
+        t0 = time.perf_counter()
+        for var in HANDLER_VARS:
+            read(var)
+        samples.append(time.perf_counter() - t0)
+        time.sleep(0.005)
+    print("%-9s handler p50=%8.1fus p99=%8.1fus  sim reads=%d" % (
+        name, percentile(samples, 50) * 1e6, percentile(samples, 99) * 1e6, aq.reads))
+
+
+def main():
+    aq = SlowAircraftRequests()
+    bench("direct", aq, aq.get)
+    aq = SlowAircraftRequests()
+    snapshot = SimSnapshot(aq).start()
+    snapshot.activate("fenix_a320", SIM_VARS)
+    time.sleep(0.1)
+    bench("snapshot", aq, lambda var: snapshot.get(var, max_age=1.0))
+    snapshot.stop()
+    print("snapshot stats %s" % snapshot.stats)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
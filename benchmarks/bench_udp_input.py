@@ -0,0 +1,77 @@
+import json
+import socket
+import sys
+import threading
+import time
+
+from fakes import http_session, load_app, percentile, serve_app
+
+MESSAGES = 3000
+
+
+# Both paths are timed from send until the value reaches the (fake) vJoy
+# device, so each sample includes the wait for the next DeviceWriter flush.
+def watch_writes(app_module):
+    written = threading.Event()
+    app_module.device_1.on_write = lambda axis, value: written.set()
+    return written
+
+
+def bench_http(app_module, server):
+    conn, headers = http_session(server)
+    written = watch_writes(app_module)
+    samples = []
+    start = time.perf_counter()
+    for i in range(MESSAGES):
+        written.clear()
+        body = json.dumps({"type": "rudder", "value": (i % 1000) / 1000.0})
+        t0 = time.perf_counter()
+        conn.request("POST", "/update_sim", body, headers)
+        conn.getresponse().read()
+        if written.wait(1.0):
+            samples.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - start
+    app_module.device_1.on_write = None
+    return elapsed, samples
+
+
+def bench_udp(app_module, server):
+    from backend.udp_input import pack_frame
+    conn, headers = http_session(server)
+    conn.request("POST", "/session", json.dumps({"pin": "1234", "profile": "fenix_a320"}), headers)
+    token = bytes.fromhex(json.loads(conn.getresponse().read())["udp_token"])
+    listener = app_module.start_udp_listener(0)
+    written = watch_writes(app_module)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    samples = []
+    start = time.perf_counter()
+    for i in range(MESSAGES):
+        written.clear()
+        frame = pack_frame(token, 2, i + 1, axes=((i % 1000) / 1000.0,), restart=i == 0)
+        t0 = time.perf_counter()
+        sock.sendto(frame, ("127.0.0.1", listener.port))
+        if written.wait(1.0):
+            samples.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - start
+    app_module.device_1.on_write = None
+    listener.stop()
+    return elapsed, samples
+
+
+def _report(name, elapsed, samples):
+    print("%-5s %8.0f msg/s  p50=%7.1fus  p99=%7.1fus  delivered=%d/%d" % (
+        name, len(samples) / elapsed, percentile(samples, 50) * 1e6,
+        percentile(samples, 99) * 1e6, len(samples), MESSAGES))
+
+
+def main():
+    app_module = load_app()
+    server = serve_app(app_module)
+    _report("http", *bench_http(app_module, server))
+    _report("udp", *bench_udp(app_module, server))
+    server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,300 @@
+import ctypes
+import http.client
+import json
+import os
+import re
+import struct
+import sys
+import threading
+import types
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+BULK_DEFINITION_ID = 0x1000
+RPN_TOKEN = re.compile(r"\([^)]*\)|\S+")
+
+
+AXIS_FIELDS = {
+    0x30: "wAxisX",
+    0x31: "wAxisY",
+    0x32: "wAxisZ",
+    0x33: "wAxisXRot",
+    0x34: "wAxisYRot",
+    0x35: "wAxisZRot",
+    0x36: "wSlider",
+    0x37: "wDial",
+    0x38: "wWheel",
+}
+
+
+class JOYSTICK_POSITION_V2(ctypes.Structure):
+    _fields_ = [("bDevice", ctypes.c_byte)] + [
+        (name, ctypes.c_long) for name in (
+            "wThrottle", "wRudder", "wAileron", "wAxisX", "wAxisY", "wAxisZ",
+            "wAxisXRot", "wAxisYRot", "wAxisZRot", "wSlider", "wDial", "wWheel",
+            "wAxisVX", "wAxisVY", "wAxisVZ", "wAxisVBRX", "wAxisVBRY", "wAxisVBRZ",
+            "lButtons", "bHats", "bHatsEx1", "bHatsEx2", "bHatsEx3",
+            "lButtonsEx1", "lButtonsEx2", "lButtonsEx3")
+    ]
+
+
+class FakeVJoyDevice:
+
+    def __init__(self, rID=None, data=None):
+        self.rID = rID
+        self.data = data or JOYSTICK_POSITION_V2(bDevice=rID or 1)
+        self.axes = {}
+        self.buttons = {}
+        self.calls = 0
+        self.on_write = None
+
+    def update(self):
+        self.calls += 1
+        for axis, field in AXIS_FIELDS.items():
+            self.axes[axis] = getattr(self.data, field)
+        for word, field in enumerate(("lButtons", "lButtonsEx1", "lButtonsEx2", "lButtonsEx3")):
+            mask = getattr(self.data, field) & 0xFFFFFFFF
+            for bit in range(32):
+                if mask & (1 << bit) or (word * 32 + bit + 1) in self.buttons:
+                    self.buttons[word * 32 + bit + 1] = (mask >> bit) & 1
+        if self.on_write is not None:
+            self.on_write(None, None)
+        return True
+
+    def set_axis(self, AxisID, AxisValue):
+        self.calls += 1
+        self.axes[AxisID] = AxisValue
+        if self.on_write is not None:
+            self.on_write(AxisID, AxisValue)
+        return True
+
+    def set_button(self, buttonID, state):
+        self.calls += 1
+        self.buttons[buttonID] = state
+        return True
+
+
+class FakeSimConnect:
+
+    def __init__(self, auto_connect=True, library_path=None):
+        self.hSimConnect = None
+        self.dll = None
+
+    def connect(self):
+        pass
+
+    def exit(self):
+        pass
+
+
+class FakeAircraftRequests:
+
+    def __init__(self, sm, _time=10, _attemps=10):
+        self.sm = sm
+        self.values = {}
+
+    def get(self, name):
+        return self.values.get(name)
+
+    def set(self, name, value):
+        self.values[name] = value
+        return True
+
+
+class FakeMobiFlightDll:
+
+    def __init__(self, sim):
+        self.sim = sim
+
+    def SetClientData(self, hSimConnect, area_id, definition_id, flags, reserved, size, data):
+        if area_id == 1:
+            self.sim.on_command(bytes(data).split(b"\0", 1)[0].decode("ascii"))
+        return 0
+
+    def __getattr__(self, name):
+        return lambda *args: 0
+
+
+class FakeMobiFlightSim:
+
+    def __init__(self, latency=0.0, values=None, bulk=False):
+        self.hSimConnect = None
+        self.bulk = bulk
+        self.dll = FakeMobiFlightDll(self)
+        self.client_data_handlers = []
+        self.latency = latency
+        self.values = values or {}
+        self.commands = []
+        self.added = []
+
+    def register_client_data_handler(self, handler, define_ids=None):
+        self.client_data_handlers.append(handler)
+
+    def deliver(self, define_id, value):
+        client_data = SIMCONNECT_RECV_CLIENT_DATA()
+        client_data.dwDefineID = define_id
+        client_data.dwData[0] = struct.unpack("<I", struct.pack("<f", value))[0]
+        for handler in self.client_data_handlers:
+            handler(client_data)
+
+    def on_command(self, command):
+        self.commands.append(command)
+        if command.startswith("MF.SimVars.Add."):
+            name = command[len("MF.SimVars.Add."):]
+            self.added.append(name)
+            define_id = len(self.added)
+            value = self.values.setdefault(name, 1.0)
+            deliver = self.deliver_block if self.bulk else self.deliver
+            args = () if self.bulk else (define_id, value)
+            if self.latency:
+                threading.Timer(self.latency, deliver, args).start()
+            else:
+                deliver(*args)
+        elif command.startswith("MF.SimVars.Set."):
+            self.on_set(command[len("MF.SimVars.Set."):])
+        elif command == "MF.SimVars.Clear":
+            self.added = []
+
+    def on_set(self, expression):
+        stack = []
+        for token in RPN_TOKEN.findall(expression):
+            if token.startswith("(>"):
+                self.store("(%s" % token[2:], stack.pop() if stack else 0.0)
+            elif token.startswith("("):
+                stack.append(self.values.get(token, 0.0))
+            elif token in ("+", "-") and len(stack) > 1:
+                b, a = stack.pop(), stack.pop()
+                stack.append(a + b if token == "+" else a - b)
+            elif token in ("++", "--") and stack:
+                stack.append(stack.pop() + (1 if token == "++" else -1))
+            else:
+                try:
+                    stack.append(float(token))
+                except ValueError:
+                    pass
+
+    def store(self, name, value):
+        self.values[name] = value
+        if name in self.added:
+            if self.bulk:
+                self.deliver_block()
+            else:
+                self.deliver(self.added.index(name) + 1, value)
+
+    def deliver_block(self, values=None):
+        if values is None:
+            values = [self.values.get(name, 0.0) for name in self.added]
+        client_data = client_data_block(BULK_DEFINITION_ID, values)
+        for handler in self.client_data_handlers:
+            handler(client_data)
+
+
+def client_data_block(define_id, values):
+    class Block(ctypes.Structure):
+        _fields_ = SIMCONNECT_RECV_CLIENT_DATA._fields_[:-1] + [("dwData", ctypes.c_float * max(1, len(values)))]
+    block = Block()
+    block.dwSize = ctypes.sizeof(Block)
+    block.dwDefineID = define_id
+    block.dwData[:len(values)] = values
+    return block
+
+
+class SIMCONNECT_RECV(ctypes.Structure):
+    _fields_ = [
+        ("dwSize", ctypes.c_uint32),
+        ("dwVersion", ctypes.c_uint32),
+        ("dwID", ctypes.c_uint32),
+    ]
+
+
+class SIMCONNECT_RECV_CLIENT_DATA(ctypes.Structure):
+    _fields_ = [
+        ("dwSize", ctypes.c_uint32),
+        ("dwVersion", ctypes.c_uint32),
+        ("dwID", ctypes.c_uint32),
+        ("dwRequestID", ctypes.c_uint32),
+        ("dwObjectID", ctypes.c_uint32),
+        ("dwDefineID", ctypes.c_uint32),
+        ("dwFlags", ctypes.c_uint32),
+        ("dwentrynumber", ctypes.c_uint32),
+        ("dwoutof", ctypes.c_uint32),
+        ("dwDefineCount", ctypes.c_uint32),
+        ("dwData", ctypes.c_uint32 * 1),
+    ]
+
+
+def _install_pyvjoy():
+    module = types.ModuleType("pyvjoy")
+    module.HID_USAGE_X = 0x30
+    module.HID_USAGE_Y = 0x31
+    module.HID_USAGE_Z = 0x32
+    module.HID_USAGE_RX = 0x33
+    module.HID_USAGE_RY = 0x34
+    module.HID_USAGE_RZ = 0x35
+    module.HID_USAGE_SL0 = 0x36
+    module.HID_USAGE_SL1 = 0x37
+    module.HID_USAGE_WHL = 0x38
+    module.HID_USAGE_POV = 0x39
+    module.VJoyDevice = FakeVJoyDevice
+    sys.modules["pyvjoy"] = module
+
+
+def _install_simconnect():
+    module = types.ModuleType("SimConnect")
+    module.SimConnect = FakeSimConnect
+    module.AircraftRequests = FakeAircraftRequests
+    enum = types.ModuleType("SimConnect.Enum")
+    enum.SIMCONNECT_UNUSED = 0xFFFFFFFF
+    enum.SIMCONNECT_CLIENT_DATA_ID = ctypes.c_uint32
+    enum.SIMCONNECT_CLIENT_DATA_PERIOD = types.SimpleNamespace(
+        SIMCONNECT_CLIENT_DATA_PERIOD_NEVER=0,
+        SIMCONNECT_CLIENT_DATA_PERIOD_ONCE=1,
+        SIMCONNECT_CLIENT_DATA_PERIOD_VISUAL_FRAME=2,
+        SIMCONNECT_CLIENT_DATA_PERIOD_ON_SET=3,
+        SIMCONNECT_CLIENT_DATA_PERIOD_SECOND=4,
+    )
+    enum.SIMCONNECT_RECV_ID = types.SimpleNamespace(SIMCONNECT_RECV_ID_CLIENT_DATA=16)
+    enum.SIMCONNECT_RECV = SIMCONNECT_RECV
+    enum.SIMCONNECT_RECV_CLIENT_DATA = SIMCONNECT_RECV_CLIENT_DATA
+    module.Enum = enum
+    sys.modules["SimConnect"] = module
+    sys.modules["SimConnect.Enum"] = enum
+
+
+def install():
+    _install_pyvjoy()
+    _install_simconnect()
+    if ROOT_DIR not in sys.path:
+        sys.path.insert(0, ROOT_DIR)
+
+
+def load_app():
+    install()
+    import app as app_module
+    app_module.init_systems()
+    return app_module
+
+
+def serve_app(app_module, host="127.0.0.1", port=0):
+    from werkzeug.serving import make_server
+    server = make_server(host, port, app_module.app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def http_session(server, profile="fenix_a320", pin="1234"):
+    conn = http.client.HTTPConnection(server.host, server.port)
+    body = json.dumps({"pin": pin, "profile": profile})
+    conn.request("POST", "/session", body, {"Content-Type": "application/json"})
+    response = conn.getresponse()
+    response.read()
+    cookie = (response.getheader("Set-Cookie") or "").split(";", 1)[0]
+    return conn, {"Content-Type": "application/json", "Cookie": cookie}
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
@@ -0,0 +1,277 @@
+import argparse
+import json
+import math
+import platform
+import sys
+import threading
+import time
+
+from fakes import FakeMobiFlightSim, http_session, install, load_app, percentile, serve_app
+
+install()
+
+import backend.fsuipc_wapi_reader as reader
+
+PROFILE = "fenix_a320"
+BURST_BUTTONS = (9, 10, 11, 12, 13, 14)
+
+
+def sweep(period):
+    def value(i, hz):
+        phase = (i / float(hz)) % period / period
+        return 2.0 * phase if phase < 0.5 else 2.0 * (1.0 - phase)
+    return value
+
+
+THROTTLE = sweep(4.0)
+RUDDER = sweep(2.0)
+
+
+def throttle_payload(i, hz):
+    return "/update_sim", {"type": "throttle", "value": round(THROTTLE(i, hz), 4), "reverse": False}
+
+
+def rudder_payload(i, hz):
+    return "/update_sim", {"type": "rudder", "value": round(RUDDER(i, hz), 4), "raw": True}
+
+
+def joystick_payload(i, hz):
+    angle = 2.0 * math.pi * i / float(hz)
+    return "/update_sim", {"type": "flight_controls", "val_x": round(0.5 + 0.4 * math.cos(angle), 4), "val_y": round(0.5 + 0.4 * math.sin(angle), 4), "raw": True}
+
+
+def button_payload(i, hz):
+    return "/update_sim", {"type": "vjoy_button", "button": BURST_BUTTONS[i % len(BURST_BUTTONS)]}
+
+
+def lvar_set_payload(i, hz):
+    return "/lvars", {"key": "parking_brake", "value": i % 2}
+
+
+def lvar_step_payload(i, hz):
+    return "/lvars/step", {"key": "flaps_handle", "delta": 1 if i % 8 < 4 else -1}
+
+
+# name, rate (Hz), burst size, payload factory. Bursts send `burst` requests
+# back to back once per period.
+STREAMS = (
+    ("throttle_sweep", 120, 1, throttle_payload),
+    ("rudder_sweep", 60, 1, rudder_payload),
+    ("joystick", 60, 1, joystick_payload),
+    ("button_bursts", 1, len(BURST_BUTTONS), button_payload),
+    ("lvar_set", 10, 1, lvar_set_payload),
+    ("lvar_step", 10, 1, lvar_step_payload),
+)
+
+
+class CpuMeter:
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+        self.routes = {}
+        self.lock = threading.Lock()
+
+    def __call__(self, environ, start_response):
+        started = time.thread_time()
+        try:
+            return self.wsgi_app(environ, start_response)
+        finally:
+            elapsed = time.thread_time() - started
+            path = environ.get("PATH_INFO", "")
+            with self.lock:
+                entry = self.routes.setdefault(path, [0, 0.0])
+                entry[0] += 1
+                entry[1] += elapsed
+
+
+class ServerAddress:
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+
+
+def summarize(samples):
+    if not samples:
+        return None
+    return {
+        "p50": round(percentile(samples, 50) * 1e3, 3),
+        "p90": round(percentile(samples, 90) * 1e3, 3),
+        "p99": round(percentile(samples, 99) * 1e3, 3),
+        "max": round(max(samples) * 1e3, 3),
+        "mean": round(sum(samples) / len(samples) * 1e3, 3),
+    }
+
+
+def run_stream(server, stream, deadline, result):
+    name, hz, burst, payload = stream
+    conn, headers = http_session(server, profile=PROFILE)
+    period = 1.0 / hz
+    next_send = time.perf_counter()
+    seq = 0
+    i = 0
+    while True:
+        now = time.perf_counter()
+        if now >= deadline:
+            break
+        if next_send > now:
+            time.sleep(next_send - now)
+        elif now - next_send > period:
+            result["late"] += 1
+        for _ in range(burst):
+            path, body = payload(i, hz)
+            seq += 1
+            if path == "/update_sim":
+                body["ts"] = time.time() * 1000.0
+                body["seq"] = seq
+            t0 = time.perf_counter()
+            try:
+                conn.request("POST", path, json.dumps(body), headers)
+                response = conn.getresponse()
+                response.read()
+                if response.status >= 400:
+                    result["errors"] += 1
+            except Exception:
+                result["errors"] += 1
+                conn.close()
+            result["samples"].append(time.perf_counter() - t0)
+            result["paths"].setdefault(path, []).append(time.perf_counter() - t0)
+            i += 1
+        next_send += period
+    conn.close()
+
+
+def start_server(app_module, kind):
+    if kind == "dev":
+        server = serve_app(app_module)
+        return server, server.shutdown
+    server = app_module.make_production_server(app_module.app, "127.0.0.1", 0)
+    server.prepare()
+    threading.Thread(target=server.serve, daemon=True).start()
+    return ServerAddress(*server.bind_addr[:2]), server.stop
+
+
+def run(duration, clients, kind):
+    sim = FakeMobiFlightSim(latency=0.0)
+    reader.SimConnectMobiFlight = lambda **kwargs: sim
+    app_module = load_app()
+    app_module.warm_assets()
+    meter = CpuMeter(app_module.app.wsgi_app)
+    app_module.app.wsgi_app = meter
+    server, stop = start_server(app_module, kind)
+
+    results = []
+    threads = []
+    for client in range(clients):
+        for stream in STREAMS:
+            result = {"stream": stream, "samples": [], "paths": {}, "errors": 0, "late": 0}
+            results.append(result)
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    deadline = wall_start + duration
+    for result in results:
+        thread = threading.Thread(target=run_stream, args=(server, result["stream"], deadline, result), daemon=True)
+        threads.append(thread)
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - wall_start
+    process_cpu = time.process_time() - cpu_start
+    time.sleep(0.05)
+    stop()
+
+    streams = {}
+    for name, hz, burst, payload in STREAMS:
+        group = [result for result in results if result["stream"][0] == name]
+        samples = [sample for result in group for sample in result["samples"]]
+        streams[name] = {
+            "target_hz": hz * burst * clients,
+            "achieved_hz": round(len(samples) / wall, 1),
+            "requests": len(samples),
+            "errors": sum(result["errors"] for result in group),
+            "late": sum(result["late"] for result in group),
+            "latency_ms": summarize(samples),
+        }
+    routes = {}
+    for path in sorted({path for result in results for path in result["paths"]}):
+        samples = [sample for result in results for sample in result["paths"].get(path, [])]
+        count, cpu = meter.routes.get(path, [0, 0.0])
+        routes[path] = {
+            "requests": len(samples),
+            "throughput_rps": round(len(samples) / wall, 1),
+            "latency_ms": summarize(samples),
+            "cpu_us_per_request": round(cpu / count * 1e6, 1) if count else None,
+        }
+    total = sum(stream["requests"] for stream in streams.values())
+    return {
+        "meta": {
+            "server": kind,
+            "clients": clients,
+            "duration_s": round(wall, 3),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        },
+        "totals": {
+            "requests": total,
+            "errors": sum(stream["errors"] for stream in streams.values()),
+            "throughput_rps": round(total / wall, 1),
+            "handler_cpu_us_per_request": round(sum(cpu for count, cpu in meter.routes.values()) / max(total, 1) * 1e6, 1),
+            "process_cpu_s": round(process_cpu, 3),
+        },
+        "streams": streams,
+        "routes": routes,
+        "device_writer": app_module.device_writer.snapshot() if app_module.device_writer is not None else None,
+        "lvar_writer": app_module.lvar_writer.snapshot(),
+        "trace": app_module.latency_tracer.snapshot(),
+    }
+
+
+def compare(report, baseline, tolerance):
+    regressions = []
+    for path, current in report["routes"].items():
+        previous = baseline.get("routes", {}).get(path)
+        if not previous:
+            continue
+        for field, value, old in (
+            ("latency_ms.p99", (current["latency_ms"] or {}).get("p99"), (previous.get("latency_ms") or {}).get("p99")),
+            ("cpu_us_per_request", current["cpu_us_per_request"], previous.get("cpu_us_per_request")),
+        ):
+            if value is not None and old and value > old * (1.0 + tolerance):
+                regressions.append("%s %s %.1f -> %.1f (+%.0f%%)" % (path, field, old, value, (value / old - 1.0) * 100))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the control API with fake vJoy and SimConnect")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--clients", type=int, default=2, help="concurrent clients, each running every stream")
+    parser.add_argument("--server", choices=["dev", "production"], default="dev")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", help="JSON report to compare against; exits 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative increase over the baseline")
+    args = parser.parse_args(argv)
+
+    report = run(args.duration, args.clients, args.server)
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    for path, route in report["routes"].items():
+        latency = route["latency_ms"] or {}
+        sys.stderr.write("%-12s %7.1f req/s  p50=%6.2fms p99=%6.2fms  cpu=%6.1fus/req\n" % (
+            path, route["throughput_rps"], latency.get("p50", 0), latency.get("p99", 0), route["cpu_us_per_request"] or 0))
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for line in regressions:
+            sys.stderr.write("REGRESSION %s\n" % line)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,7 +4,8 @@ PROFILES = {
         'backend': {
             'spoiler_formula': lambda val: 0 if val == 0 else (0.33 + val),
             'flap_axis_mapping': lambda val: (1 - val) * 32767,
-            'arm_spoiler_value': 0.11
+            'arm_spoiler_value': 0.11,
+            'button_hold_ms': {'default': 50, 3: 100, 4: 100, 20: 100, 21: 100}
         },
         'handlers': {}
     },
@@ -13,7 +14,8 @@ PROFILES = {
         'backend': {
             'spoiler_formula': lambda val: 0 if val == 0 else (0.33 + val),
             'flap_axis_mapping': lambda val: (1 - val) * 32767,
-            'arm_spoiler_value': 0.11
+            'arm_spoiler_value': 0.11,
+            'button_hold_ms': {'default': 50, 3: 100, 4: 100, 20: 100, 21: 100}
         },
         'handlers': {}
     },
@@ -22,7 +24,8 @@ PROFILES = {
         'backend': {
             'spoiler_formula': lambda val: val,
             'flap_axis_mapping': lambda val: (1 - val) * 32767,
-            'arm_spoiler_value': 0.11
+            'arm_spoiler_value': 0.11,
+            'button_hold_ms': {'default': 50, 3: 100, 4: 100, 20: 100, 21: 100}
         },
         'handlers': {}
     },
@@ -31,7 +34,8 @@ PROFILES = {
         'backend': {
             'spoiler_formula': lambda val: val,
             'flap_axis_mapping': lambda val: (1 - val) * 32767,
-            'arm_spoiler_value': 0.11
+            'arm_spoiler_value': 0.11,
+            'button_hold_ms': {'default': 50, 3: 100, 4: 100, 20: 100, 21: 100}
         },
         'handlers': {}
     }
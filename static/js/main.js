@@ -18,7 +18,77 @@ const stepLvar = (key, delta) => {
     });
 };
 
-const baseSend = (payload) => {
+// Start on long-polling and upgrade to a websocket once the server offers it.
+const controlSocket = (typeof io === 'function') ? io({ transports: ['polling', 'websocket'] }) : null;
+
+const applyLvarState = (values) => {
+    const apKey = ('ap_state' in values) ? 'ap_state' : (('ap_master' in values) ? 'ap_master' : null);
+    if (apKey) {
+        apMasterOn = values[apKey] > 0;
+        const apIndicator = document.getElementById('apIndicator');
+        if (apIndicator) apIndicator.classList.toggle('on', apMasterOn);
+    }
+    if ('gear_handle' in values) {
+        gearIsDown = values.gear_handle > 0;
+        const gearLever = document.getElementById('gearHandle');
+        if (gearLever) {
+            gearLever.classList.toggle('gear-down', gearIsDown);
+            gearLever.classList.toggle('gear-up', !gearIsDown);
+        }
+    }
+};
+
+const loadLvarSnapshot = () => {
+    fetch('/lvars')
+        .then((res) => res.json())
+        .then((data) => applyLvarState(data.values || {}))
+        .catch(() => {});
+};
+
+if (controlSocket) {
+    controlSocket.on('connect', loadLvarSnapshot);
+    controlSocket.on('lvars', applyLvarState);
+}
+
+let clockOffsetMs = null;
+let controlSeq = 0;
+const pageId = Math.random().toString(36).slice(2, 10) + Date.now().toString(36);
+
+const clientNow = () => performance.timeOrigin + performance.now();
+
+const syncClock = async (rounds = 5) => {
+    let best = null;
+    for (let i = 0; i < rounds; i += 1) {
+        try {
+            const t0 = clientNow();
+            const res = await fetch('/clock', { cache: 'no-store' });
+            const data = await res.json();
+            const t1 = clientNow();
+            if (best === null || t1 - t0 < best.rtt) {
+                best = { rtt: t1 - t0, offset: data.server_ms - (t0 + t1) / 2 };
+            }
+        } catch {
+            return;
+        }
+    }
+    if (best) clockOffsetMs = best.offset;
+};
+
+syncClock();
+setInterval(syncClock, 60000);
+
+const stamp = (payload) => {
+    if (clockOffsetMs === null) return payload;
+    controlSeq += 1;
+    return { ...payload, ts: clientNow() + clockOffsetMs, seq: controlSeq, page: pageId };
+};
+
+const baseSend = (rawPayload) => {
+    const payload = stamp(rawPayload);
+    if (controlSocket && controlSocket.connected) {
+        controlSocket.emit('control', payload);
+        return;
+    }
     fetch('/update_sim', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
@@ -26,6 +96,23 @@ const baseSend = (payload) => {
     });
 };
 
+const baseSendBatch = (rawPayloads) => {
+    if (rawPayloads.length === 1) {
+        baseSend(rawPayloads[0]);
+        return;
+    }
+    const payloads = rawPayloads.map(stamp);
+    if (controlSocket && controlSocket.connected) {
+        controlSocket.emit('control_batch', payloads);
+        return;
+    }
+    fetch('/update_sim/batch', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ commands: payloads })
+    });
+};
+
 const send = (payload) => {
     const profile = window.PROFILE || {};
     const commands = profile.commands || {};
@@ -34,9 +121,8 @@ const send = (payload) => {
         const result = handler(payload);
         if (!result) return;
         if (Array.isArray(result)) {
-            result.forEach((item) => {
-                if (item) baseSend(item);
-            });
+            const items = result.filter((item) => item);
+            if (items.length > 0) baseSendBatch(items);
             return;
         }
         baseSend(result);
@@ -45,29 +131,6 @@ const send = (payload) => {
     baseSend(payload);
 };
 
-const getControlSensitivity = () => {
-    const profile = window.PROFILE || {};
-    const sensitivity = profile.ui?.control_sensitivity;
-    if (typeof sensitivity === 'number') return sensitivity;
-    return 1;
-};
-
-const getControlResponse = () => {
-    const profile = window.PROFILE || {};
-    const response = profile.ui?.control_response;
-    if (typeof response === 'number') return response;
-    return 1;
-};
-
-const applyControlResponse = (val) => {
-    const response = getControlResponse();
-    if (response === 1) return val;
-    const delta = val - 0.5;
-    const sign = delta >= 0 ? 1 : -1;
-    const magnitude = Math.pow(Math.abs(delta) * 2, response) / 2;
-    return 0.5 + sign * magnitude;
-};
-
 const applySimState = (data) => {
     if (!data || typeof data !== 'object') return;
     const idleBtn = document.getElementById('idleBtn');
@@ -93,6 +156,30 @@ const getVjoyMapping = (key) => {
     return VJOY_MAP[key];
 };
 
+const startLatencyPanel = () => {
+    const panel = document.createElement('div');
+    panel.className = 'latency-panel';
+    document.body.appendChild(panel);
+    const row = (name, summary) => summary
+        ? `${name.padEnd(16)} ${summary.p50.toFixed(1).padStart(6)} ${summary.p99.toFixed(1).padStart(6)}`
+        : `${name.padEnd(16)}      -      -`;
+    const refresh = () => {
+        fetch('/latency')
+            .then((res) => res.json())
+            .then((data) => {
+                const stages = data.stages || {};
+                const types = data.types || {};
+                const lines = [`${'stage (ms)'.padEnd(16)}    p50    p99`];
+                ['network', 'dispatch', 'device', 'total'].forEach((stage) => lines.push(row(stage, stages[stage])));
+                Object.keys(types).sort().forEach((type) => lines.push(row(type, types[type].total || types[type].dispatch)));
+                panel.textContent = lines.join('\n');
+            })
+            .catch(() => {});
+    };
+    refresh();
+    setInterval(refresh, 1000);
+};
+
 const initUI = () => {
     createJoystick('joyZone', 'joyPuck', 'flight_controls');
 
@@ -100,6 +187,7 @@ const initUI = () => {
     let selectedCamBtn = null;
     const cameraConfig = window.PROFILE?.ui?.camera_config || window.PROFILE?.camera_config || [];
     const debugUi = window.DEBUG_UI === true;
+    if (debugUi) startLatencyPanel();
     cameraConfig.forEach((cam, index) => {
         const btn = document.createElement('button');
         btn.className = 'cam-btn';
@@ -281,20 +369,7 @@ const createJoystick = (zoneId, puckId, type) => {
         puck.style.left = puckX + '%';
         puck.style.top = puckY + '%';
 
-        let valX = normalizedX;
-        let valY = normalizedY;
-        if (type === 'flight_controls') {
-            const response = getControlResponse();
-            if (response !== 1) {
-                valX = applyControlResponse(normalizedX);
-                valY = applyControlResponse(normalizedY);
-            } else {
-                const sensitivity = getControlSensitivity();
-                valX = 0.5 + (normalizedX - 0.5) * sensitivity;
-                valY = 0.5 + (normalizedY - 0.5) * sensitivity;
-            }
-        }
-        const payload = { type: type, val_x: valX, val_y: valY };
+        const payload = { type: type, val_x: normalizedX, val_y: normalizedY, raw: true };
         const now = performance.now();
         if (now - lastUpdateTime >= 16) {
             sendUpdate(payload);
@@ -447,12 +522,13 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     };
 
-    const fetchMetars = async () => {
+    const fetchMetars = async (refresh = false) => {
         if (!originIcao && !destinationIcao) return null;
         try {
             const params = new URLSearchParams();
             if (originIcao) params.append('origin', originIcao);
             if (destinationIcao) params.append('destination', destinationIcao);
+            if (refresh) params.append('refresh', '1');
             const res = await fetch(`/metar?${params.toString()}`);
             const data = await res.json();
             return data.metars || {};
@@ -461,6 +537,8 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     };
 
+    const ofpPdfUrl = (data) => data.local_pdf_url || data.pdf_url;
+
     const renderOfp = (pdfUrl, metars) => {
         if (!pdfUrl) {
             if (ofpContainer) ofpContainer.textContent = 'OFP not available';
@@ -522,7 +600,7 @@ document.addEventListener('DOMContentLoaded', () => {
             const res = await fetch('/ofp');
             const data = await res.json();
             if (data.pdf_url) {
-                ofpCache = data.pdf_url;
+                ofpCache = ofpPdfUrl(data);
             }
             if (data.metars) {
                 metarCache = data.metars;
@@ -533,7 +611,7 @@ document.addEventListener('DOMContentLoaded', () => {
             if (data.destination_icao) {
                 destinationIcao = data.destination_icao;
             }
-            renderOfp(data.pdf_url, data.metars);
+            renderOfp(data.pdf_url && ofpPdfUrl(data), data.metars);
         } catch {
             if (ofpContainer) ofpContainer.textContent = 'OFP not available';
         } finally {
@@ -546,7 +624,7 @@ document.addEventListener('DOMContentLoaded', () => {
         metarRefreshBtn.onclick = async () => {
             if (!originIcao && !destinationIcao) return;
             metarRefreshBtn.disabled = true;
-            const metars = await fetchMetars();
+            const metars = await fetchMetars(true);
             if (metars) {
                 metarCache = metars;
                 renderMetars(metars);
@@ -563,9 +641,9 @@ document.addEventListener('DOMContentLoaded', () => {
             ofpLoading = false;
             ofpRefreshBtn.disabled = true;
             try {
-                const res = await fetch('/ofp');
+                const res = await fetch('/ofp?refresh=1');
                 const data = await res.json();
-                if (data.pdf_url) ofpCache = data.pdf_url;
+                if (data.pdf_url) ofpCache = ofpPdfUrl(data);
                 if (data.metars) metarCache = data.metars;
                 if (data.origin_icao) originIcao = data.origin_icao;
                 if (data.destination_icao) destinationIcao = data.destination_icao;
@@ -703,7 +781,7 @@ document.addEventListener('DOMContentLoaded', () => {
             const res = await fetch('/ofp');
             const data = await res.json();
             if (data.pdf_url) {
-                ofpCache = data.pdf_url;
+                ofpCache = ofpPdfUrl(data);
             }
             if (data.metars) {
                 metarCache = data.metars;
@@ -915,15 +993,7 @@ document.addEventListener('DOMContentLoaded', () => {
     const rSlider = document.getElementById('rSlider');
     rSlider.oninput = function() {
         if (!rudderResetting) {
-            const response = getControlResponse();
-            let val = parseFloat(this.value);
-            if (response !== 1) {
-                val = applyControlResponse(val);
-            } else {
-                const sensitivity = getControlSensitivity();
-                val = 0.5 + (val - 0.5) * sensitivity;
-            }
-            send({ type: 'rudder', value: val });
+            send({ type: 'rudder', value: parseFloat(this.value), raw: true });
         }
     };
     const resetRudder = () => {
@@ -933,15 +1003,7 @@ document.addEventListener('DOMContentLoaded', () => {
             const prog = Math.min((t - startTime) / 250, 1);
             const cur = start + (0.5 - start) * (1 - Math.pow(1 - prog, 3));
             rSlider.value = cur; 
-            const response = getControlResponse();
-            let val = cur;
-            if (response !== 1) {
-                val = applyControlResponse(val);
-            } else {
-                const sensitivity = getControlSensitivity();
-                val = 0.5 + (val - 0.5) * sensitivity;
-            }
-            send({ type: 'rudder', value: val });
+            send({ type: 'rudder', value: cur, raw: true });
             if (prog < 1) requestAnimationFrame(anim);
             else rudderResetting = false;
         };
@@ -973,6 +1035,7 @@ document.addEventListener('DOMContentLoaded', () => {
             send({ type: 'gear_command', state: gearIsDown ? 'DOWN' : 'UP' });
         });
     }
+    loadLvarSnapshot();
 
     if (idleBtn) {
         updateIdleButtonState();
@@ -0,0 +1,62 @@
+import random
+
+import pytest
+from bench_dispatch import legacy_chain
+
+from backend.command_table import CommandContext, compile_profile, execute, execute_batch
+from profiles import PROFILES
+
+AXIS_TYPES = ("throttle", "rudder", "brakes", "spoilers", "flaps_axis")
+
+
+class RecordingDevice:
+
+    def __init__(self):
+        self.writes = []
+
+    def set_axis(self, AxisID, AxisValue):
+        self.writes.append((AxisID, AxisValue))
+        return True
+
+    def set_button(self, buttonID, state):
+        self.writes.append(("button", buttonID, state))
+        return True
+
+    def pulse_button(self, buttonID, hold):
+        return True
+
+
+def payloads():
+    rng = random.Random(8)
+    values = [0.0, 0.3, 0.5, 0.7, 1.0] + [rng.random() for _ in range(500)]
+    for value in values:
+        for command_type in AXIS_TYPES:
+            yield {"type": command_type, "value": value, "reverse": False}
+        yield {"type": "flight_controls", "val_x": value, "val_y": 1 - value}
+
+
+def legacy_writes(data, profile_name):
+    device = RecordingDevice()
+    legacy_chain(data, profile_name, device)
+    return device.writes
+
+
+@pytest.mark.parametrize("profile_name", sorted(PROFILES))
+def test_unshaped_axes_match_the_legacy_mapping(profile_name):
+    table = compile_profile(PROFILES[profile_name], CommandContext())
+    commands = list(payloads())
+    single = RecordingDevice()
+    for data in commands:
+        execute(table, data, single, single)
+    batch = RecordingDevice()
+    execute_batch(table, commands, batch, batch)
+    expected = [write for data in commands for write in legacy_writes(data, profile_name)]
+    assert single.writes == expected
+    assert batch.writes == expected
+
+
+def test_flaps_axis_keeps_the_unquantized_value():
+    table = compile_profile(PROFILES["fenix_a320"], CommandContext())
+    device = RecordingDevice()
+    execute(table, {"type": "flaps_axis", "value": 0.3}, device, device)
+    assert device.writes[0][1] == 22936
@@ -0,0 +1,24 @@
+import pytest
+from fakes import load_app
+
+
+@pytest.fixture
+def app_module():
+    app_module = load_app()
+    yield app_module
+    # socketio.test_client() patches the server's packet senders; undo it so
+    # later tests that talk to a real server still get their packets.
+    for name in ("_send_packet", "_send_eio_packet"):
+        app_module.socketio.server.__dict__.pop(name, None)
+
+
+@pytest.mark.parametrize("auth", ["1234", "abc", 1234, ["1234"]])
+def test_non_dict_auth_is_rejected(app_module, auth):
+    client = app_module.socketio.test_client(app_module.app, auth=auth)
+    assert not client.is_connected()
+
+
+def test_pin_auth_connects(app_module):
+    client = app_module.socketio.test_client(app_module.app, auth={"pin": app_module.PIN, "profile": "fenix_a320"})
+    assert client.is_connected()
+    client.disconnect()
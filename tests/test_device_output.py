@@ -0,0 +1,126 @@
+import threading
+import time
+
+from backend.device_output import DeviceWriter
+
+BUTTON = 5
+HOLD = 0.05
+TOLERANCE = 0.03
+
+
+class RecordingDevice:
+
+    def __init__(self):
+        self.writer = None
+        self.events = []
+        self.on_set_axis = None
+
+    def set_axis(self, AxisID, AxisValue):
+        if self.on_set_axis is not None:
+            self.on_set_axis()
+        return True
+
+    def set_button(self, buttonID, state):
+        self.events.append((self.writer.flushes_started, buttonID, state, time.perf_counter()))
+        return True
+
+
+def make_writer(rate_hz=200):
+    device = RecordingDevice()
+    writer = DeviceWriter({1: device}, rate_hz=rate_hz)
+    device.writer = writer
+    return writer, device
+
+
+def presses(device):
+    return [(flush, state) for flush, button, state, written in device.events if button == BUTTON]
+
+
+def test_pulse_holds_for_requested_time():
+    writer, device = make_writer()
+    writer.start()
+    try:
+        writer.pulse(1, BUTTON, HOLD)
+        deadline = time.perf_counter() + 1.0
+        while len(device.events) < 2 and time.perf_counter() < deadline:
+            time.sleep(0.005)
+    finally:
+        writer.stop()
+    assert [state for flush, state in presses(device)] == [1, 0]
+    held = device.events[1][3] - device.events[0][3]
+    assert HOLD - 0.005 <= held <= HOLD + TOLERANCE
+
+
+def test_release_waits_for_flush_that_wrote_press():
+    writer, device = make_writer()
+    writer.pulse(1, BUTTON, 0.0)
+    assert writer.release_due() == 0
+    writer.flush()
+    assert writer.release_due() == 1
+    writer.flush()
+    assert presses(device) == [(1, 1), (2, 0)]
+
+
+def test_pulse_posted_during_flush_releases_in_a_later_flush():
+    writer, device = make_writer()
+    device.on_set_axis = lambda: writer.pulse(1, BUTTON, 0.0)
+    writer.post_axis(1, 0x30, 100)
+    writer.flush()
+    device.on_set_axis = None
+    for _ in range(3):
+        writer.release_due()
+        writer.flush()
+    (press_flush, press), (release_flush, release) = presses(device)
+    assert (press, release) == (1, 0)
+    assert release_flush > press_flush
+
+
+def test_overlapping_pulses_collapse_into_one_press_and_release():
+    writer, device = make_writer()
+    writer.pulse(1, BUTTON, 1.0)
+    writer.pulse(1, BUTTON, 0.0)
+    writer.pulse(1, BUTTON, 2.0)
+    writer.flush()
+    now = time.perf_counter()
+    assert writer.release_due(now + 1.5) == 0
+    assert writer.release_due(now + 2.5) == 1
+    writer.flush()
+    assert writer.release_due(now + 5.0) == 0
+    assert [state for flush, state in presses(device)] == [1, 0]
+    assert writer.stats["pulses"] == 3
+    assert writer.stats["pulses_collapsed"] == 2
+    assert writer.pulse_release == {}
+
+
+def test_waiters_registered_during_flush_run_after_the_next_one():
+    writer, device = make_writer()
+    called = []
+    device.on_set_axis = lambda: writer.after_next_flush(lambda written: called.append(writer.flushes_started))
+    writer.post_axis(1, 0x30, 100)
+    writer.flush()
+    device.on_set_axis = None
+    assert called == []
+    writer.flush()
+    assert called == [2]
+
+
+def test_no_waiter_is_lost_while_the_writer_runs():
+    writer, device = make_writer(rate_hz=2000)
+    called = []
+    writer.start()
+    try:
+        def register():
+            for _ in range(500):
+                writer.after_next_flush(called.append)
+
+        threads = [threading.Thread(target=register) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        deadline = time.perf_counter() + 1.0
+        while len(called) < 2000 and time.perf_counter() < deadline:
+            time.sleep(0.005)
+    finally:
+        writer.stop()
+    assert len(called) == 2000
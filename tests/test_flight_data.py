@@ -0,0 +1,192 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from backend.flight_data import MAX_REDIRECTS, FlightDataService, HttpPool, OfpPdfCache, UpstreamError
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        server = self.server
+        parts = urlsplit(self.path)
+        with server.lock:
+            server.requests.append((parts.path, parse_qs(parts.query), self.client_address[1]))
+        time.sleep(server.latency)
+        status = 200
+        if parts.path.startswith("/redirect/"):
+            # /redirect/<n>/<target>: n more hops before <target> on this host
+            # (or on the host given by ?to=).
+            hops, target = parts.path[len("/redirect/"):].split("/", 1)
+            hops = int(hops)
+            location = "/redirect/%d/%s" % (hops - 1, target) if hops > 1 else "/" + target
+            base = parse_qs(parts.query).get("to", [""])[0]
+            self.send_response(302)
+            self.send_header("Location", base + location)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if parts.path.endswith(".pdf"):
+            payload = b"%PDF-1.4\n" + parts.path.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/pdf")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+            return
+        if parts.path == "/metar":
+            ids = parse_qs(parts.query).get("ids", [""])[0].split(",")
+            body = [{"icaoId": icao, "rawOb": "METAR %s 181250Z 24008KT" % icao} for icao in ids]
+        elif parts.path == "/simbrief":
+            body = {
+                "params": {"request_id": "1", "time_generated": "1760790000"},
+                "files": {"directory": "http://%s/ofp/" % self.headers["Host"], "pdf": {"link": "EGLLLFPG.pdf"}},
+                "origin": {"icao_code": "EGLL"},
+                "destination": {"icao_code": "LFPG"},
+            }
+        else:
+            status, body = 404, {"error": "not_found"}
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def upstream():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    server.daemon_threads = True
+    server.requests = []
+    server.lock = threading.Lock()
+    server.latency = 0.0
+    server.base = "http://127.0.0.1:%d" % server.server_address[1]
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_service(upstream, **kwargs):
+    return FlightDataService(upstream.base + "/simbrief", upstream.base + "/metar?ids={ids}", **kwargs)
+
+
+def paths(upstream, path):
+    return [request for request in upstream.requests if request[0] == path]
+
+
+def test_simbrief_is_cached_until_ttl_expires(upstream):
+    service = make_service(upstream, ofp_ttl=0.2)
+    first = service.simbrief()
+    assert service.simbrief() == first
+    assert len(paths(upstream, "/simbrief")) == 1
+    time.sleep(0.25)
+    service.simbrief()
+    assert len(paths(upstream, "/simbrief")) == 2
+    service.simbrief(refresh=True)
+    assert len(paths(upstream, "/simbrief")) == 3
+    assert service.snapshot()["hits"] == 1
+
+
+def test_concurrent_callers_share_one_upstream_request(upstream):
+    upstream.latency = 0.2
+    service = make_service(upstream)
+    start = threading.Barrier(10)
+    results = []
+
+    def load():
+        start.wait()
+        results.append(service.simbrief())
+    threads = [threading.Thread(target=load) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(results) == 10
+    assert all(result == results[0] for result in results)
+    assert len(paths(upstream, "/simbrief")) == 1
+    stats = service.snapshot()
+    assert stats["misses"] == 1
+    assert stats["shared"] == 9
+
+
+def test_airport_metars_use_one_multi_station_request(upstream):
+    service = make_service(upstream)
+    metars = service.airport_metars("egll", "LFPG")
+    assert metars == {"origin": "METAR EGLL 181250Z 24008KT", "destination": "METAR LFPG 181250Z 24008KT"}
+    (request,) = paths(upstream, "/metar")
+    assert request[1]["ids"] == ["EGLL,LFPG"]
+    assert service.metars(["LFPG", "EGLL", "egll"]) == {"EGLL": metars["origin"], "LFPG": metars["destination"]}
+    assert len(paths(upstream, "/metar")) == 1
+
+
+def test_metar_failure_returns_empty(upstream):
+    service = FlightDataService(upstream.base + "/simbrief", upstream.base + "/missing?ids={ids}")
+    assert service.airport_metars("EGLL", "LFPG") == {"origin": "", "destination": ""}
+
+
+def test_requests_reuse_one_keep_alive_connection(upstream):
+    service = make_service(upstream)
+    for _ in range(3):
+        service.simbrief(refresh=True)
+        service.metars(["EGLL", "LFPG"], refresh=True)
+    stats = service.snapshot()
+    assert stats["requests"] == 6
+    assert stats["connections_opened"] == 1
+    assert stats["connections_reused"] == 5
+    assert len({request[2] for request in upstream.requests}) == 1
+
+
+def test_pool_raises_on_error_status_and_keeps_connection(upstream):
+    pool = HttpPool()
+    with pytest.raises(UpstreamError):
+        pool.get(upstream.base + "/missing")
+    pool.get(upstream.base + "/simbrief")
+    assert pool.stats["connections_opened"] == 1
+    assert pool.stats["connections_reused"] == 1
+
+
+def test_pool_follows_redirects_on_the_same_connection(upstream):
+    pool = HttpPool()
+    body = json.loads(pool.get(upstream.base + "/redirect/2/simbrief"))
+    assert body["origin"]["icao_code"] == "EGLL"
+    assert [request[0] for request in upstream.requests] == ["/redirect/2/simbrief", "/redirect/1/simbrief", "/simbrief"]
+    assert pool.stats["connections_opened"] == 1
+
+
+def test_pool_follows_cross_host_redirects(upstream):
+    pool = HttpPool()
+    other = upstream.base.replace("127.0.0.1", "localhost")
+    body = json.loads(pool.get(upstream.base + "/redirect/1/simbrief?to=" + other))
+    assert body["destination"]["icao_code"] == "LFPG"
+    assert pool.stats["connections_opened"] == 2
+    assert set(pool.idle) == {("http", "127.0.0.1", upstream.server_address[1]), ("http", "localhost", upstream.server_address[1])}
+
+
+def test_pool_gives_up_after_max_redirects(upstream):
+    pool = HttpPool()
+    with pytest.raises(UpstreamError):
+        pool.get(upstream.base + "/redirect/%d/simbrief" % (MAX_REDIRECTS + 1))
+    assert len(upstream.requests) == MAX_REDIRECTS + 1
+
+
+def test_pdf_downloads_are_not_kept_in_the_cache(upstream, tmp_path):
+    service = make_service(upstream)
+    pdfs = OfpPdfCache(service, directory=str(tmp_path))
+    path, plan_id = pdfs.current()
+    with open(path, "rb") as f:
+        assert f.read().startswith(b"%PDF")
+    assert ("pdf", plan_id) not in service.cache.values
+    assert pdfs.current() == (path, plan_id)
+    assert pdfs.stats["downloads"] == 1
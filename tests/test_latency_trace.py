@@ -0,0 +1,44 @@
+import pytest
+from fakes import load_app
+
+from backend.latency_trace import LatencyTracer
+
+
+@pytest.fixture
+def client():
+    app_module = load_app()
+    app_module.latency_tracer = LatencyTracer(sample_every=1)
+    client = app_module.app.test_client()
+    client.post("/session", json={"pin": app_module.PIN, "profile": "fenix_a320"})
+    yield app_module, client
+
+
+def stamped(seq, page):
+    return {"type": "rudder", "value": 0.5, "reverse": False, "ts": 1.0, "seq": seq, "page": page}
+
+
+def test_pages_sharing_an_address_keep_their_own_sequence(client):
+    app_module, client = client
+    for seq in (1, 2, 3):
+        client.post("/update_sim", json=stamped(seq, "page-a"))
+        client.post("/update_sim", json=stamped(seq, "page-b"))
+    stats = app_module.latency_tracer.stats
+    assert stats["stamped"] == 6
+    assert stats["seq_reordered"] == 0
+    assert stats["seq_gaps"] == 0
+
+
+def test_gaps_and_reordering_are_counted_per_page(client):
+    app_module, client = client
+    for seq in (1, 4, 3):
+        client.post("/update_sim", json=stamped(seq, "page-a"))
+    stats = app_module.latency_tracer.stats
+    assert stats["seq_gaps"] == 2
+    assert stats["seq_reordered"] == 1
+
+
+def test_oldest_pages_are_forgotten():
+    tracer = LatencyTracer(max_clients=2)
+    for page in ("a", "b", "c"):
+        tracer.begin({"ts": 1.0, "seq": 1}, page)
+    assert list(tracer.last_seq) == ["b", "c"]
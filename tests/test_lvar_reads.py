@@ -0,0 +1,102 @@
+import threading
+import time
+
+import pytest
+from fakes import FakeMobiFlightSim
+
+from backend.mobiflight_variable_requests import MobiFlightBulkVariableRequests, MobiFlightVariableRequests
+
+LATENCY = 0.05
+WAKE_TOLERANCE = 0.02
+VARIABLE = "(L:S_FCU_AP1)"
+
+
+@pytest.fixture(params=["per_variable", "bulk"])
+def make_requests(request):
+    bulk = request.param == "bulk"
+    cls = MobiFlightBulkVariableRequests if bulk else MobiFlightVariableRequests
+
+    def make(latency=0.0, values=None):
+        sim = FakeMobiFlightSim(latency=latency, values=values, bulk=bulk)
+        return sim, cls(sim)
+    return make
+
+
+def adds(sim, name=VARIABLE):
+    return sim.commands.count("MF.SimVars.Add." + name)
+
+
+def test_reader_wakes_when_value_arrives(make_requests):
+    sim, vr = make_requests(latency=LATENCY, values={VARIABLE: 3.0})
+    arrived = []
+    vr.add_listener(lambda name, value: arrived.append(time.perf_counter()))
+    value = vr.get(VARIABLE, timeout=1.0)
+    returned = time.perf_counter()
+    assert value == 3.0
+    assert returned - arrived[0] < WAKE_TOLERANCE
+
+
+def test_changed_value_is_seen_without_waiting(make_requests):
+    sim, vr = make_requests(values={VARIABLE: 1.0})
+    assert vr.get(VARIABLE) == 1.0
+    vr.set("7 (>L:S_FCU_AP1)")
+    started = time.perf_counter()
+    assert vr.get(VARIABLE) == 7.0
+    assert time.perf_counter() - started < WAKE_TOLERANCE
+    value, age = vr.get_cached(VARIABLE)
+    assert value == 7.0
+    assert 0.0 <= age < 1.0
+
+
+def test_get_gives_up_after_timeout(make_requests):
+    sim, vr = make_requests(latency=0.5)
+    started = time.perf_counter()
+    assert vr.get(VARIABLE, timeout=0.05) is None
+    assert time.perf_counter() - started < 0.3
+    assert vr.get_cached(VARIABLE) == (None, None)
+
+
+def test_get_cached_does_not_register(make_requests):
+    sim, vr = make_requests()
+    assert vr.get_cached(VARIABLE) == (None, None)
+    assert adds(sim) == 0
+
+
+def test_repeated_reads_reuse_registration(make_requests):
+    sim, vr = make_requests()
+    for _ in range(5):
+        assert vr.get(VARIABLE) == 1.0
+    assert adds(sim) == 1
+
+
+def test_concurrent_first_reads_register_once(make_requests):
+    sim, vr = make_requests(latency=LATENCY)
+    start = threading.Barrier(8)
+    results = []
+
+    def read():
+        start.wait()
+        results.append(vr.get(VARIABLE, timeout=1.0))
+    threads = [threading.Thread(target=read) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [1.0] * 8
+    assert adds(sim) == 1
+
+
+def test_profile_reads_reuse_cached_mapping_and_registrations(monkeypatch):
+    import backend.fsuipc_wapi_reader as reader
+    sim = FakeMobiFlightSim()
+    monkeypatch.setattr(reader, "SimConnectMobiFlight", lambda **kwargs: sim)
+    monkeypatch.setattr(reader, "_mf", None)
+    monkeypatch.setattr(reader, "_vr", None)
+    first = reader.read_lvars_payload("fenix_a320")
+    assert "error" not in first
+    mapping = reader._get_mapping("fenix_a320")
+    added = [command for command in sim.commands if command.startswith("MF.SimVars.Add.")]
+    assert len(added) == len(set(added)) == len({target.expr for target in mapping.values() if target.readable})
+    assert reader.read_lvars_payload("fenix_a320") == first
+    assert reader._get_mapping("fenix_a320") is mapping
+    assert [command for command in sim.commands if command.startswith("MF.SimVars.Add.")] == added
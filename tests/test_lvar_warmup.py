@@ -0,0 +1,37 @@
+import logging
+
+import backend.fsuipc_wapi_reader as reader
+
+
+def failing_sim(**kwargs):
+    raise ConnectionError("sim not running")
+
+
+def warm_up(profile_name):
+    warmup = reader.start_lvar_warmup(profile_name)
+    if warmup.thread is not None:
+        warmup.thread.join(1.0)
+    return warmup
+
+
+def test_failed_warmup_backs_off_and_logs_once(monkeypatch, caplog):
+    monkeypatch.setattr(reader, "SimConnectMobiFlight", failing_sim)
+    monkeypatch.setattr(reader, "_mf", None)
+    monkeypatch.setattr(reader, "_vr", None)
+    monkeypatch.setattr(reader, "_warmups", {})
+    caplog.set_level(logging.DEBUG)
+
+    first = warm_up("fenix_a320")
+    assert first.state == "failed"
+    assert first.failures == 1
+    for _ in range(5):
+        assert warm_up("fenix_a320") is first
+
+    monkeypatch.setattr(reader, "LVAR_WARMUP_RETRY", 0.0)
+    second = warm_up("fenix_a320")
+    assert second is not first
+    assert second.state == "failed"
+    assert second.snapshot()["failures"] == 2
+
+    failures = [record for record in caplog.records if "LVar warm-up" in record.getMessage()]
+    assert [record.levelno for record in failures] == [logging.WARNING, logging.DEBUG]
@@ -0,0 +1,120 @@
+import sys
+import threading
+
+import pytest
+from fakes import FakeMobiFlightSim
+
+from backend.fsuipc_wapi_reader import LvarTarget
+from backend.lvar_writer import LvarWriter
+from backend.mobiflight_variable_requests import MobiFlightVariableRequests
+
+THREADS = 8
+WRITES = 500
+
+
+class RecordingRequests:
+
+    def __init__(self):
+        self.expressions = []
+
+    def get_cached(self, expr):
+        return None, None
+
+    def set_many(self, expressions):
+        self.expressions.extend(expressions)
+        return 1, len(expressions)
+
+
+@pytest.fixture
+def busy_switching():
+    # Switch threads as often as possible so an unlocked key would collide.
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+def test_concurrent_expression_steps_are_not_coalesced(busy_switching):
+    vr = RecordingRequests()
+    writer = LvarWriter(lambda: vr, window=0)
+    target = LvarTarget("ap_engage", "(L:S_FCU_AP1) ++ (>L:S_FCU_AP1)")
+    start = threading.Barrier(THREADS)
+
+    def step():
+        start.wait()
+        for _ in range(WRITES):
+            writer.step(target, 1)
+    threads = [threading.Thread(target=step) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    writer.flush()
+    assert len(vr.expressions) == THREADS * WRITES
+    assert writer.stats["coalesced"] == 0
+    assert writer.stats["sent"] == THREADS * WRITES
+
+
+class FlakyCommandRequests(MobiFlightVariableRequests):
+
+    def __init__(self, sim, fail_frames=()):
+        self.fail_frames = set(fail_frames)
+        self.frames_seen = 0
+        super().__init__(sim)
+
+    def send_command(self, command):
+        if command.startswith("MF.SimVars.Set."):
+            self.frames_seen += 1
+            if self.frames_seen in self.fail_frames:
+                raise OSError("SetClientData failed")
+        super().send_command(command)
+
+
+def queue_sets(writer, count):
+    for i in range(count):
+        writer.set(LvarTarget("key_%d" % i, "L:A_LONG_VARIABLE_NAME_%03d" % i), i + 1)
+
+
+def test_batch_split_across_frames_counts_nothing_dropped():
+    sim = FakeMobiFlightSim()
+    vr = MobiFlightVariableRequests(sim)
+    writer = LvarWriter(lambda: vr, window=0)
+    queue_sets(writer, 40)
+    assert writer.flush() == 40
+    stats = writer.snapshot()
+    assert stats["frames"] > 1
+    assert stats["sent"] == 40
+    assert stats["dropped"] == 0
+    assert sim.values["(L:A_LONG_VARIABLE_NAME_039)"] == 40.0
+
+
+def test_failed_frame_drops_only_its_own_expressions():
+    sim = FakeMobiFlightSim()
+    vr = FlakyCommandRequests(sim, fail_frames={2})
+    writer = LvarWriter(lambda: vr, window=0)
+    queue_sets(writer, 40)
+    sent = writer.flush()
+    stats = writer.snapshot()
+    assert 0 < sent < 40
+    assert stats["sent"] == sent
+    assert stats["dropped"] == 40 - sent
+    assert stats["frames"] == vr.frames_seen - 1
+
+
+def test_oversized_expression_is_the_only_one_dropped():
+    vr = MobiFlightVariableRequests(FakeMobiFlightSim())
+    frames, sent = vr.set_many(["1 (>L:A)", "2 (>L:%s)" % ("X" * 300), "3 (>L:B)"])
+    assert (frames, sent) == (1, 2)
+
+
+def test_coalesced_write_moves_behind_later_expression_step():
+    vr = RecordingRequests()
+    writer = LvarWriter(lambda: vr, window=0)
+    value = LvarTarget("ap_state", "L:S_FCU_AP1")
+    toggle = LvarTarget("ap_engage", "(L:S_FCU_AP1) ++ (>L:S_FCU_AP1)")
+    writer.set(value, 0)
+    writer.step(toggle, 1)
+    writer.set(value, 1)
+    writer.flush()
+    assert vr.expressions == [toggle.step_command(None), value.set_command(1.0)]
+    assert writer.stats["coalesced"] == 1
@@ -0,0 +1,33 @@
+import pytest
+from fakes import load_app
+
+
+@pytest.fixture
+def app_module(monkeypatch):
+    app_module = load_app()
+    monkeypatch.setattr(app_module, "METRICS_PUBLIC", False)
+    return app_module
+
+
+def test_metrics_need_a_pin(app_module):
+    client = app_module.app.test_client()
+    response = client.get("/metrics")
+    assert response.status_code == 401
+    assert response.get_json() == {"error": "unauthorized"}
+    assert client.get("/metrics", headers={"Authorization": "Bearer 0000"}).status_code == 401
+
+
+def test_metrics_accept_bearer_pin_or_session(app_module):
+    client = app_module.app.test_client()
+    response = client.get("/metrics", headers={"Authorization": "Bearer " + app_module.PIN})
+    assert response.status_code == 200
+    assert b"# TYPE vc_http_request_duration_seconds histogram" in response.data
+    client.post("/session", json={"pin": app_module.PIN, "profile": "fenix_a320"})
+    assert client.get("/metrics").status_code == 200
+
+
+def test_public_metrics_opt_out(app_module, monkeypatch):
+    monkeypatch.setattr(app_module, "METRICS_PUBLIC", True)
+    assert app_module.app.test_client().get("/metrics").status_code == 200
+    assert app_module.parse_args(["--public-metrics"]).public_metrics is True
+    assert app_module.parse_args([]).public_metrics is False
@@ -0,0 +1,60 @@
+import http.client
+import json
+import threading
+
+import pytest
+import simple_websocket
+from fakes import load_app
+
+pytest.importorskip("cheroot")
+
+
+@pytest.fixture
+def production():
+    app_module = load_app()
+    server = app_module.make_production_server(app_module.app, "127.0.0.1", 0, threads=2)
+    server.prepare()
+    threading.Thread(target=server.serve, daemon=True).start()
+    written = threading.Event()
+    app_module.device_1.on_write = lambda axis, value: written.set()
+    yield app_module, server.bind_addr[:2], written
+    app_module.device_1.on_write = None
+    server.stop()
+
+
+def request(address, method, path, body=None):
+    conn = http.client.HTTPConnection(*address, timeout=5)
+    conn.request(method, path, body, {"Content-Type": "text/plain;charset=UTF-8"} if body else {})
+    response = conn.getresponse()
+    data = response.read()
+    conn.close()
+    return response.status, data
+
+
+def test_socketio_polling_offers_websocket_upgrade_in_production(production):
+    app_module, address, written = production
+    status, body = request(address, "GET", "/socket.io/?EIO=4&transport=polling")
+    assert status == 200
+    handshake = json.loads(body[1:])
+    assert handshake["upgrades"] == ["websocket"]
+    path = "/socket.io/?EIO=4&transport=polling&sid=" + handshake["sid"]
+    assert request(address, "POST", path, "40" + json.dumps({"pin": app_module.PIN, "profile": "fenix_a320"}))[0] == 200
+    assert request(address, "GET", path)[1].startswith(b"40")
+    assert request(address, "POST", path, "42" + json.dumps(["control", {"type": "rudder", "value": 0.25}]))[0] == 200
+    assert written.wait(1.0)
+
+
+def test_socketio_control_works_over_websocket_in_production(production):
+    app_module, address, written = production
+    # More sessions than worker threads: a closed websocket must give its
+    # worker back to the pool.
+    for i in range(4):
+        ws = simple_websocket.Client.connect("ws://%s:%d/socket.io/?EIO=4&transport=websocket" % address)
+        assert ws.receive(2).startswith("0")
+        ws.send("40" + json.dumps({"pin": app_module.PIN, "profile": "fenix_a320"}))
+        assert ws.receive(2).startswith("40")
+        written.clear()
+        ws.send("42" + json.dumps(["control", {"type": "rudder", "value": 0.1 + 0.1 * i}]))
+        assert written.wait(1.0)
+        ws.close()
+    assert request(address, "GET", "/")[0] == 200
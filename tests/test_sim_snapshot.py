@@ -0,0 +1,46 @@
+import time
+
+from backend.sim_snapshot import SimSnapshot
+from profiles import PROFILES
+
+
+class CountingRequests:
+
+    def __init__(self):
+        self.reads = []
+
+    def get(self, name):
+        self.reads.append(name)
+        return 1.0
+
+
+def test_profiles_without_sim_vars_do_not_start_polling():
+    aq = CountingRequests()
+    snapshot = SimSnapshot(aq).start()
+    for name, profile in PROFILES.items():
+        snapshot.activate(name, profile["backend"].get("sim_vars", []))
+    time.sleep(0.05)
+    assert snapshot.thread is None
+    assert aq.reads == []
+    assert snapshot.get("SIM_ON_GROUND") == 1.0
+    assert aq.reads == ["SIM_ON_GROUND"]
+
+
+def test_polling_starts_with_the_first_declared_group_and_idles_without_one():
+    aq = CountingRequests()
+    snapshot = SimSnapshot(aq).start()
+    snapshot.activate("fenix_a320", [{"hz": 50, "vars": ["GEAR_HANDLE_POSITION"]}])
+    try:
+        assert snapshot.thread is not None
+        deadline = time.monotonic() + 1.0
+        while snapshot.stats["polls"] < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert set(aq.reads) == {"GEAR_HANDLE_POSITION"}
+        snapshot.activate("fenix_a320", [])
+        assert snapshot.groups == []
+        time.sleep(0.05)
+        polls = snapshot.stats["polls"]
+        time.sleep(0.1)
+        assert snapshot.stats["polls"] == polls
+    finally:
+        snapshot.stop()
@@ -0,0 +1,52 @@
+import pytest
+from fakes import load_app
+
+from backend.udp_input import UdpControlListener, pack_frame
+
+ADDR = ("192.0.2.10", 40000)
+
+
+@pytest.fixture
+def udp():
+    app_module = load_app()
+    client = app_module.app.test_client()
+    response = client.post("/session", json={"pin": app_module.PIN, "profile": "fenix_a320"})
+    token = bytes.fromhex(response.get_json()["udp_token"])
+    applied = []
+    listener = UdpControlListener(lambda payload, profile: applied.append((payload["value"], profile)), app_module.udp_clients.get)
+    yield app_module, client, token, listener, applied
+
+
+def rudder(token, seq, value, restart=False):
+    return pack_frame(token, 2, seq, axes=(value,), restart=restart)
+
+
+def test_token_is_stable_for_the_session_and_follows_the_profile(udp):
+    app_module, client, token, listener, applied = udp
+    response = client.post("/session", json={"pin": app_module.PIN, "profile": "pmdg_737"})
+    assert bytes.fromhex(response.get_json()["udp_token"]) == token
+    listener.handle_datagram(rudder(token, 1, 0.25), ADDR)
+    assert applied == [(0.25, "pmdg_737")]
+
+
+def test_frames_without_a_session_token_are_dropped(udp):
+    app_module, client, token, listener, applied = udp
+    listener.handle_datagram(rudder(b"\0" * len(token), 1, 0.25), ADDR)
+    assert applied == []
+    assert listener.stats["dropped_unauthorized"] == 1
+    other = app_module.app.test_client()
+    other_token = bytes.fromhex(other.post("/verify_pin", json={"pin": app_module.PIN}).get_json()["udp_token"])
+    assert other_token != token
+    listener.handle_datagram(rudder(other_token, 1, 0.5), ADDR)
+    assert applied == [(0.5, "pmdg_777")]
+
+
+def test_old_sequence_numbers_need_the_restart_flag(udp):
+    app_module, client, token, listener, applied = udp
+    for seq, value in ((10, 0.125), (11, 0.25), (10, 0.125), (5, 0.875)):
+        listener.handle_datagram(rudder(token, seq, value), ADDR)
+    assert [value for value, profile in applied] == [0.125, 0.25]
+    assert listener.stats["dropped_stale"] == 2
+    listener.handle_datagram(rudder(token, 1, 0.375, restart=True), ADDR)
+    listener.handle_datagram(rudder(token, 2, 0.5), ADDR)
+    assert [value for value, profile in applied] == [0.125, 0.25, 0.375, 0.5]